@@ -5,3 +5,11 @@
 #define APP_ADV_INT_MIN_MS    100
 #define APP_ADV_INT_MAX_MS    150
 #define APP_NOTIFY_MTU        180   // keep <= negotiated MTU-3
+
+/* Packed IMU streaming (opcode 0x11, see shared/docs/protocol.md) */
+#define APP_STREAM_RATE_HZ    200
+#define APP_STREAM_RATE_MIN_HZ 16   // 0x02 rates are clamped: dt_us = 1e6 / rate must fit a u16
+#define APP_STREAM_RATE_MAX_HZ 1000
+#define APP_PACKED_HDR_LEN    10    // op, seq u16, n u8, t0_us u32, dt_us u16
+#define APP_IMU_SAMPLE_LEN    12
+#define APP_PACKED_MAX_SAMPLES ((APP_NOTIFY_MTU - APP_PACKED_HDR_LEN) / APP_IMU_SAMPLE_LEN)
@@ -1,4 +1,5 @@
 #pragma once
+#include <stdbool.h>
 #include <stddef.h>
 #include <stdint.h>
 
@@ -6,3 +7,9 @@ typedef void (*rx_handler_t)(const uint8_t *data, size_t len);
 
 int gatt_service_init(rx_handler_t on_rx);
 int gatt_send_notify(const uint8_t *data, size_t len);
+
+/* Packed IMU stream (opcode 0x11): samples are buffered and sent once a packet is full.
+ * set_period drops any unsent samples; flush first to keep them. */
+void gatt_stream_set_period(uint16_t dt_us, bool reset_seq);
+int gatt_stream_push(const int16_t sample[6], uint32_t t_us);
+int gatt_stream_flush(void);
@@ -1,6 +1,7 @@
 #include <zephyr/kernel.h>
 #include <zephyr/bluetooth/bluetooth.h>
 #include <zephyr/bluetooth/gatt.h>
+#include "app_config.h"
 #include "gatt_uuids.h"
 #include "gatt_service.h"
 
@@ -58,6 +59,50 @@ int gatt_service_init(rx_handler_t on_rx)
 int gatt_send_notify(const uint8_t *data, size_t len)
 {
   if (!notify_enabled) return -EACCES;
+  if (len > APP_NOTIFY_MTU) return -EMSGSIZE;
   struct bt_gatt_attr *val = (struct bt_gatt_attr *)&nrf_svc.attrs[1]; // TX value attr
   return bt_gatt_notify(NULL, val, data, len);
 }
+
+/* ---- Packed IMU stream (0x11): fill each notification up to APP_NOTIFY_MTU ---- */
+
+static uint8_t pack_buf[APP_NOTIFY_MTU];
+static uint8_t pack_n;
+static uint16_t pack_seq;
+static uint16_t pack_dt_us;
+
+static void put_u16(uint8_t *p, uint16_t v) { p[0] = v & 0xFF; p[1] = v >> 8; }
+static void put_u32(uint8_t *p, uint32_t v) { put_u16(p, v & 0xFFFF); put_u16(p + 2, v >> 16); }
+
+void gatt_stream_set_period(uint16_t dt_us, bool reset_seq)
+{
+  pack_n = 0;
+  if (reset_seq) pack_seq = 0;
+  pack_dt_us = dt_us;
+}
+
+int gatt_stream_flush(void)
+{
+  if (pack_n == 0) return 0;
+  pack_buf[0] = 0x11;
+  put_u16(&pack_buf[1], pack_seq);
+  pack_buf[3] = pack_n;
+  put_u16(&pack_buf[8], pack_dt_us);
+  size_t len = APP_PACKED_HDR_LEN + (size_t)pack_n * APP_IMU_SAMPLE_LEN;
+  pack_n = 0;
+  pack_seq++;   /* advance even if the send fails: the host sees the gap */
+  return gatt_send_notify(pack_buf, len);
+}
+
+int gatt_stream_push(const int16_t sample[6], uint32_t t_us)
+{
+  if (pack_n == 0) {
+    put_u32(&pack_buf[4], t_us);   /* base timestamp = first sample */
+  }
+  uint8_t *p = &pack_buf[APP_PACKED_HDR_LEN + (size_t)pack_n * APP_IMU_SAMPLE_LEN];
+  for (int i = 0; i < 6; ++i) {
+    put_u16(p + 2 * i, (uint16_t)sample[i]);
+  }
+  if (++pack_n < APP_PACKED_MAX_SAMPLES) return 0;
+  return gatt_stream_flush();
+}
@@ -6,8 +6,77 @@
 #include "gatt_service.h"
 #include "imu_lsm6dsv32x.h"
 
+/* ---- Continuous packed streaming (0x02 start [rate_hz u16], 0x03 stop) ----
+ * All packer calls run on the system workqueue, so they never race each other. */
+
+static void stream_work_fn(struct k_work *work);
+static void stream_ctl_fn(struct k_work *work);
+static void stream_timer_fn(struct k_timer *timer);
+K_WORK_DEFINE(stream_work, stream_work_fn);
+K_WORK_DEFINE(stream_ctl_work, stream_ctl_fn);
+K_TIMER_DEFINE(stream_timer, stream_timer_fn, NULL);
+static volatile bool streaming;
+static volatile bool stream_restart;   /* fresh session: reset seq */
+static volatile uint32_t stream_period_us;
+
+static void stream_work_fn(struct k_work *work)
+{
+  ARG_UNUSED(work);
+  int16_t s[6];
+  if (!streaming) return;
+  uint32_t t_us = (uint32_t)k_ticks_to_us_floor64(k_uptime_ticks());
+  if (imu_read_raw(&s[0], &s[1], &s[2], &s[3], &s[4], &s[5]) == 0) {
+    gatt_stream_push(s, t_us);
+  }
+}
+
+static void stream_ctl_fn(struct k_work *work)
+{
+  ARG_UNUSED(work);
+  /* send the partial packet (stop, or a rate change: dt_us is per packet) */
+  gatt_stream_flush();
+  if (streaming) {
+    gatt_stream_set_period((uint16_t)stream_period_us, stream_restart);   /* <= 62500 */
+    stream_restart = false;
+    k_timer_start(&stream_timer, K_USEC(stream_period_us), K_USEC(stream_period_us));
+  }
+}
+
+static void stream_timer_fn(struct k_timer *timer)
+{
+  ARG_UNUSED(timer);
+  k_work_submit(&stream_work);   /* I2C read happens in thread context */
+}
+
+static void stream_start(uint16_t rate_hz)
+{
+  if (rate_hz == 0) rate_hz = APP_STREAM_RATE_HZ;
+  rate_hz = CLAMP(rate_hz, APP_STREAM_RATE_MIN_HZ, APP_STREAM_RATE_MAX_HZ);
+  k_timer_stop(&stream_timer);
+  stream_period_us = 1000000U / rate_hz;
+  stream_restart = !streaming;
+  streaming = true;
+  k_work_submit(&stream_ctl_work);
+}
+
+static void stream_stop(void)
+{
+  k_timer_stop(&stream_timer);
+  streaming = false;
+  k_work_submit(&stream_ctl_work);
+}
+
 static void on_rx(const uint8_t *data, size_t len)
 {
+  if (len >= 1 && data[0] == 0x02) {
+    stream_start(len >= 3 ? (uint16_t)(data[1] | (data[2] << 8)) : 0);
+    return;
+  }
+  if (len >= 1 && data[0] == 0x03) {
+    stream_stop();
+    return;
+  }
+
   /* Example: echo command 0x01 -> send one IMU sample */
   if (len >= 1 && data[0] == 0x01) {
     int16_t ax, ay, az, gx, gy, gz;
@@ -0,0 +1,252 @@
+# bench_pipeline.py
+"""
+Host pipeline benchmarks on fixed, seeded synthetic batches.
+
+    python benchmarks/bench_pipeline.py                      # run + print
+    python benchmarks/bench_pipeline.py --save base.json     # store a baseline
+    python benchmarks/bench_pipeline.py --compare base.json  # diff against it
+
+Each stage is timed per batch (p50/p99 latency, samples/s) and then run once more
+under tracemalloc for peak memory. "end_to_end" drives run_insoles against the
+simulated peripheral (sim.py) as fast as possible.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from nrf_metrics import insole, metrics                                   # noqa: E402
+from nrf_metrics.json_writer import JSONLinesWriter                       # noqa: E402
+from nrf_metrics.sim import SimPeripheral, simulate, synth_ball, synth_insole  # noqa: E402
+from nrf_metrics.spin import SpinAnalyzer                                 # noqa: E402
+
+REGRESSION_TOLERANCE = 0.10  # flag stages >10% slower than baseline
+
+class NullWriter:
+    def append(self, obj):
+        pass
+
+# =========================== Fixtures ===========================
+
+def make_batches(n_batches: int, batch: int, rate_hz: float, seed: int) -> List[np.ndarray]:
+    frames = synth_insole(0, n_batches * batch, rate_hz, seed=seed)
+    return [frames[i * batch:(i + 1) * batch].copy() for i in range(n_batches)]
+
+def make_notifications(batches: List[np.ndarray], mtu: int) -> List[List[bytearray]]:
+    step = mtu - 3
+    out = []
+    for b in batches:
+        payload = b.tobytes()
+        pkts = [bytearray(f"BIN10:{len(b)}".encode())]
+        pkts += [bytearray(payload[o:o + step]) for o in range(0, len(payload), step)]
+        pkts.append(bytearray(b"BATCH_DONE"))
+        out.append(pkts)
+    return out
+
+# =========================== Timing ===========================
+
+def time_stage(fn: Callable[[int], None], n_items: int, samples_per_item: int) -> Dict[str, float]:
+    lat = np.empty(n_items)
+    t_all = time.perf_counter()
+    for i in range(n_items):
+        t0 = time.perf_counter()
+        fn(i)
+        lat[i] = time.perf_counter() - t0
+    total = time.perf_counter() - t_all
+    return {
+        "items": n_items,
+        "samples": n_items * samples_per_item,
+        "total_s": total,
+        "samples_per_s": n_items * samples_per_item / total if total > 0 else 0.0,
+        "p50_ms": float(np.percentile(lat, 50) * 1e3),
+        "p99_ms": float(np.percentile(lat, 99) * 1e3),
+    }
+
+def peak_memory(fn: Callable[[int], None], n_items: int) -> int:
+    tracemalloc.start()
+    try:
+        for i in range(n_items):
+            fn(i)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+# =========================== Stages ===========================
+
+def build_stages(batches: List[np.ndarray], mtu: int, tmpdir: str):
+    batch = len(batches[0])
+    raw = [b.tobytes() for b in batches]
+    notes = make_notifications(batches, mtu)
+
+    # precomputed analysis series for the metrics stages
+    st = insole.DeviceState("left_insole")
+    for b in batches:
+        insole.emit_batch_json(NullWriter(), "left_insole", b, st)
+    times_s, forces = st.times_s, st.forces_by_label
+    events = metrics.detect_events(times_s, forces)
+
+    def reassembly():
+        state = insole.DeviceState("left_insole")
+        handler = insole.make_notify_handler(state)
+        def run(i):
+            for pkt in notes[i]:
+                handler(None, pkt)
+        return run
+
+    def parse(i):
+        insole.parse_samples_array(raw[i], batch)
+
+    def parse_tuples(i):
+        insole.parse_samples(raw[i], batch)
+
+    def calibrate(i):
+        prof = insole.get_active_profile()
+        ch = batches[i]["ch"]
+        prof.force(ch); prof.pressure(ch); prof.resistance(ch)
+
+    def sample_objects(i):
+        for vals in batches[i]["ch"].tolist():
+            insole.sample_to_insole_object(vals)
+
+    def emit():
+        state = insole.DeviceState("left_insole")
+        w = NullWriter()
+        return lambda i: insole.emit_batch_json(w, "left_insole", batches[i], state)
+
+    def writer_append():
+        w = JSONLinesWriter(os.path.join(tmpdir, "bench.jsonl"), durability="none")
+        rec = {"timestamp": 0.0, "left_insole": insole.sample_to_insole_object(batches[0]["ch"][0].tolist()),
+               "right_insole": None}
+        def run(i):
+            for _ in range(batch):
+                w.append(rec)
+            if i == len(batches) - 1:
+                w.close()
+        return run
+
+    ball = synth_ball(0, len(batches) * batch, 1000.0)
+    ball_batches = [ball[i * batch:(i + 1) * batch] for i in range(len(batches))]
+
+    def spin():
+        sa = SpinAnalyzer()
+        def run(i):
+            sa.add(ball_batches[i])
+            if i == len(batches) - 1:
+                sa.summary(0, len(ball))
+        return run
+
+    n_series = len(times_s)
+    return [
+        # name, factory (fresh fn per pass), items, samples per item
+        ("notify_reassembly", reassembly, len(batches), batch),
+        ("parse_samples_array", lambda: parse, len(batches), batch),
+        ("parse_samples", lambda: parse_tuples, len(batches), batch),
+        ("calibrate_batch", lambda: calibrate, len(batches), batch),
+        ("sample_to_insole_object", lambda: sample_objects, len(batches), batch),
+        ("emit_batch_json", emit, len(batches), batch),
+        ("json_writer_append", writer_append, len(batches), batch),
+        ("ball_spin", spin, len(batches), batch),
+        ("detect_events", lambda: (lambda i: metrics.detect_events(times_s, forces)), 3, n_series),
+        ("temporal_metrics", lambda: (lambda i: metrics.temporal_metrics(
+            times_s, events["HS"], events["TO"], events["stance"])), 3, n_series),
+    ]
+
+def bench_end_to_end(duration_s: float, rate_hz: float, tmpdir: str) -> Dict[str, float]:
+    async def run():
+        stop = asyncio.Event()
+        p = SimPeripheral(insole.LEFT_NAME, "insole", speed=None, rate_hz=rate_hz, duration_s=duration_s)
+        with simulate(p), JSONLinesWriter(os.path.join(tmpdir, "e2e.jsonl"), durability="none") as w:
+            t0 = time.perf_counter()
+            stop.set()   # everything is buffered at start_r; stop straight away and drain
+            res = await insole.run_insoles(w, stop)
+            total = time.perf_counter() - t0
+        n = len(res["left"]["t"])
+        return {"items": p.pulls, "samples": n, "total_s": total,
+                "samples_per_s": n / total if total > 0 else 0.0}
+    return asyncio.run(run())
+
+# =========================== Reporting ===========================
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict]) -> int:
+    worse = 0
+    print(f"\n{'stage':28s} {'base/s':>12s} {'now/s':>12s} {'ratio':>7s}")
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b or not b.get("samples_per_s"):
+            continue
+        ratio = r["samples_per_s"] / b["samples_per_s"]
+        flag = "  REGRESSION" if ratio < 1.0 - REGRESSION_TOLERANCE else ""
+        worse += bool(flag)
+        print(f"{name:28s} {b['samples_per_s']:12.0f} {r['samples_per_s']:12.0f} {ratio:7.2f}{flag}")
+    return worse
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark host pipeline stages")
+    ap.add_argument("--batches", type=int, default=2000)
+    ap.add_argument("--batch", type=int, default=10, help="frames per pulled batch")
+    ap.add_argument("--rate", type=float, default=200.0, help="synthetic sample rate (Hz)")
+    ap.add_argument("--mtu", type=int, default=247)
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--only", nargs="*", help="run only these stages")
+    ap.add_argument("--no-e2e", action="store_true", help="skip the simulated end-to-end run")
+    ap.add_argument("--save", help="write results JSON (baseline)")
+    ap.add_argument("--compare", help="baseline JSON to compare against")
+    args = ap.parse_args(argv)
+
+    batches = make_batches(args.batches, args.batch, args.rate, args.seed)
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, factory, n_items, per_item in build_stages(batches, args.mtu, tmpdir):
+            if args.only and name not in args.only:
+                continue
+            r = time_stage(factory(), n_items, per_item)
+            r["peak_bytes"] = peak_memory(factory(), n_items)
+            results[name] = r
+            print(f"{name:28s} {r['samples_per_s']:12.0f} samples/s  p50 {r['p50_ms']:8.3f} ms"
+                  f"  p99 {r['p99_ms']:8.3f} ms  peak {r['peak_bytes'] / 1024:9.1f} KiB")
+        if not args.no_e2e and (not args.only or "end_to_end" in args.only):
+            r = bench_end_to_end(args.batches * args.batch / args.rate, args.rate, tmpdir)
+            results["end_to_end"] = r
+            print(f"{'end_to_end':28s} {r['samples_per_s']:12.0f} samples/s  ({r['samples']} samples)")
+
+    doc = {
+        "meta": {
+            "commit": _git_rev(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "created": time.time(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(doc, f, indent=2)
+        print(f"\nSaved {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        return 1 if compare(results, base.get("results", {})) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+# analyze.py
+"""
+Offline batch analysis of recorded sessions.
+
+    python -m nrf_metrics.analyze recordings/ "archive/2024-*/*.jsonl.gz" -o summary.csv -j 8
+
+Inputs are directories (searched recursively), globs or files:
+  - JSONL logs in either schema (plain, .gz/.xz/.zz, or segmented via their manifest)
+  - binary session files (session_file.py, detected by their magic)
+
+Each session runs in its own worker process: records are streamed (one segment /
+line at a time, see schema.iter_jsonl) into per-stream numpy series, insole forces
+go through detect_events_array / temporal_metrics_array and ball frames through
+SpinAnalyzer. One summary row per session is written to a CSV or JSONL table
+(by the output suffix), in input order; progress and per-file timing are printed
+as sessions finish.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .frames import BALL_FIELDS
+from .segments import MANIFEST_SUFFIX, read_manifest
+
+LOG_SUFFIXES = (".jsonl", ".jsonl.gz", ".jsonl.xz", ".jsonl.zz")
+SESSION_SUFFIX = ".nrfs"
+SIDES = ("left_insole", "right_insole")
+
+# Summary table columns (CSV order); JSONL rows carry the same keys
+COLUMNS = (
+    ["path", "kind", "records", "parse_s", "metrics_s", "wall_s", "error"]
+    + [f"{side.split('_')[0]}_{k}" for side in SIDES
+       for k in ("samples", "duration_s", "steps", "stride_freq_hz", "ct_mean_s", "ct_std_s",
+                 "ft_mean_s", "stride_mean_s", "peak_force_n", "threshold_n")]
+    + ["ball_samples", "ball_duration_s", "ball_avg_rps", "ball_total_revolutions",
+       "ball_spin_rpm_peak", "ball_spin_rps_p95"]
+)
+
+# =========================== Discovery ===========================
+
+def _is_session_file(path: str) -> bool:
+    from .session_file import MAGIC
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def _segment_names(manifest: str) -> set:
+    man = read_manifest(manifest) or {"segments": []}
+    names = set()
+    for seg in man["segments"]:
+        names.update(n for n in (seg.get("file"), seg.get("plain")) if n)
+    return names
+
+def find_sessions(inputs: Sequence[str]) -> List[str]:
+    """
+    Session paths for directories / globs / files, sorted per input. Segmented logs
+    are returned once, as their base path; their segment files are skipped.
+    """
+    out: List[str] = []
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            files = glob.glob(os.path.join(item, "**", "*"), recursive=True)
+        else:
+            files = glob.glob(item, recursive=True) or [item]
+        files = sorted(f for f in files if os.path.isfile(f))
+        segments = set()
+        for f in files:
+            if f.endswith(MANIFEST_SUFFIX):
+                root = os.path.dirname(f)
+                segments.update(os.path.join(root, n) for n in _segment_names(f))
+        for f in files:
+            if f in segments:
+                continue
+            if f.endswith(MANIFEST_SUFFIX):
+                path = f[:-len(MANIFEST_SUFFIX)]
+            elif f.endswith(LOG_SUFFIXES) or f.endswith(SESSION_SUFFIX) or _is_session_file(f):
+                path = f
+            else:
+                continue
+            if path not in seen:
+                seen.add(path)
+                out.append(path)
+    return out
+
+# =========================== Reconstruction ===========================
+
+def spread_batches(t: np.ndarray) -> np.ndarray:
+    """
+    Per-sample times for sample-schema insole logs, where every sample of a pulled batch
+    carries the batch's host time: each run of equal times is spread evenly over the gap
+    since the previous run (the first run uses the next run's sample spacing).
+    """
+    t = np.asarray(t, dtype=np.float64)
+    if len(t) < 2:
+        return t
+    starts = np.flatnonzero(np.r_[True, t[1:] != t[:-1]])
+    if len(starts) < 2:
+        return t
+    counts = np.diff(np.r_[starts, len(t)])
+    run_t = t[starts]
+    prev = np.r_[run_t[0] - (run_t[1] - run_t[0]) * counts[0] / counts[1], run_t[:-1]]
+    k = np.arange(len(t)) - np.repeat(starts, counts)                 # position inside run
+    n = np.repeat(counts, counts)
+    return np.repeat(prev, counts) + (np.repeat(run_t, counts) - np.repeat(prev, counts)) * (k + 1) / n
+
+def _jsonl_streams(path: str) -> Dict[str, Any]:
+    from .logindex import extract_series
+    from .schema import iter_jsonl
+    records = 0
+    summary = None
+
+    def counted():
+        nonlocal records, summary
+        for rec in iter_jsonl(path):
+            records += 1
+            if "ball_summary" in rec:
+                summary = rec["ball_summary"]
+            yield rec
+
+    series = extract_series(counted())
+    out: Dict[str, Any] = {"records": records}
+    for side in SIDES:
+        if side in series:
+            s = series[side]
+            t, force = s["t"], s["force"]
+            if "dev_t" in s and np.isfinite(s["dev_t"]).all():
+                # batch schema: device time orders samples exactly (host times of
+                # successive batches can overlap)
+                order = np.argsort(s["dev_t"], kind="stable")
+                t, force = s["dev_t"][order], force[order]
+            elif len(t) > 1 and np.any(t[1:] == t[:-1]):
+                t = spread_batches(t)
+            out[side] = {"t": t, "force": force, "labels": s.get("labels")}
+    if "ball" in series:
+        b = series["ball"]
+        frames = np.stack([b[f] for f in BALL_FIELDS], axis=1)
+        start_ms = end_ms = None
+        if summary and summary.get("t_start_ms") is not None:
+            start_ms, end_ms = summary["t_start_ms"], summary["t_end_ms"]
+        elif len(b["t"]) > 1:
+            start_ms, end_ms = 0, int(round((b["t"][-1] - b["t"][0]) * 1000))
+        out["ball"] = {"frames": frames, "start_ms": start_ms, "end_ms": end_ms}
+    return out
+
+def _session_streams(path: str) -> Dict[str, Any]:
+    from .frames import insole_columns
+    from .schema import _insole_profile
+    from .session_file import SessionReader
+    out: Dict[str, Any] = {}
+    with SessionReader(path) as r:
+        out["records"] = r.n_frames
+        if r.kind == "ball":
+            out["ball"] = {"frames": np.array(r.frames, dtype=np.float64),
+                           "start_ms": r.meta.get("t_start_ms"), "end_ms": r.meta.get("t_end_ms")}
+        else:
+            ts, ch = insole_columns(np.array(r.frames))
+            prof = _insole_profile(r.header)
+            units = r.header.get("units_per_s")
+            if not units:
+                from .config import DEV_TS_UNITS_PER_S as units
+            side = r.header.get("device") or "left_insole"
+            out[side if side in SIDES else "left_insole"] = {
+                "t": ts / float(units), "force": prof.force(ch.astype(np.intp)),
+                "labels": list(prof.labels)}
+    return out
+
+# =========================== Metrics ===========================
+
+def _mean(a) -> Optional[float]:
+    return float(np.mean(a)) if len(a) else None
+
+def _std(a) -> Optional[float]:
+    return float(np.std(a)) if len(a) else None
+
+def gait_row(prefix: str, t: np.ndarray, F: np.ndarray, labels: Optional[Sequence[str]],
+             body_weight_N: Any = "config") -> Dict[str, Any]:
+    from .metrics import detect_events_array, temporal_metrics_array
+    if not labels:
+        from .config import CHANNEL_LABELS as labels
+    kw = {} if body_weight_N == "config" else {"body_weight_N": body_weight_N}
+    ev = detect_events_array(t, F, labels, **kw)
+    tm = temporal_metrics_array(t, ev["HS"], ev["TO"], ev["stance"])
+    return {
+        f"{prefix}_samples": len(t),
+        f"{prefix}_duration_s": float(t[-1] - t[0]) if len(t) else 0.0,
+        f"{prefix}_steps": len(ev["HS"]),
+        f"{prefix}_stride_freq_hz": tm["stride_freq"],
+        f"{prefix}_ct_mean_s": _mean(tm["CT"]),
+        f"{prefix}_ct_std_s": _std(tm["CT"]),
+        f"{prefix}_ft_mean_s": _mean(tm["FT"]),
+        f"{prefix}_stride_mean_s": _mean(tm["stride"]),
+        f"{prefix}_peak_force_n": float(ev["Ft"].max()) if len(ev["Ft"]) else None,
+        f"{prefix}_threshold_n": ev["threshold"],
+    }
+
+def ball_row(frames: np.ndarray, start_ms: Optional[int], end_ms: Optional[int]) -> Dict[str, Any]:
+    from .spin import SpinAnalyzer
+    spin = SpinAnalyzer()
+    spin.add(frames)
+    s = spin.summary(start_ms, end_ms)
+    return {
+        "ball_samples": s["samples"], "ball_duration_s": s["duration_s"],
+        "ball_avg_rps": s["avg_rev_per_sec"], "ball_total_revolutions": s["total_revolutions"],
+        "ball_spin_rpm_peak": s["spin_rpm_peak"], "ball_spin_rps_p95": s["spin_rps_p95"],
+    }
+
+def analyze_session(path: str, body_weight_N: Any = "config") -> Dict[str, Any]:
+    """
+    One summary row for one session (runs in a worker process). Errors are reported in
+    the row's "error" column instead of raised, so one bad file does not stop a batch.
+    `body_weight_N`: "config" (config.BODY_WEIGHT_N), a weight in N, or None (auto threshold).
+    """
+    t0 = time.perf_counter()
+    row: Dict[str, Any] = {"path": path, "error": None}
+    try:
+        is_session = _is_session_file(path)
+        row["kind"] = "session" if is_session else "jsonl"
+        streams = _session_streams(path) if is_session else _jsonl_streams(path)
+        t1 = time.perf_counter()
+        row["records"] = streams["records"]
+        for side in SIDES:
+            s = streams.get(side)
+            if s is not None and len(s["t"]):
+                row.update(gait_row(side.split("_")[0], s["t"], s["force"], s["labels"], body_weight_N))
+        if streams.get("ball") is not None:
+            b = streams["ball"]
+            row.update(ball_row(b["frames"], b["start_ms"], b["end_ms"]))
+        row["parse_s"] = t1 - t0
+        row["metrics_s"] = time.perf_counter() - t1
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["wall_s"] = time.perf_counter() - t0
+    return row
+
+# =========================== Batch ===========================
+
+def write_summary(rows: Iterable[Dict[str, Any]], out_path: str) -> None:
+    """CSV (COLUMNS order, blanks for missing values) or JSONL for *.jsonl."""
+    rows = list(rows)
+    if out_path.endswith(".jsonl"):
+        with open(out_path, "w", encoding="utf-8") as f:
+            for r in rows:
+                f.write(json.dumps(r, separators=(",", ":")) + "\n")
+        return
+    extra = sorted({k for r in rows for k in r} - set(COLUMNS))
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(COLUMNS) + extra, restval="")
+        w.writeheader()
+        for r in rows:
+            w.writerow({k: ("" if v is None else v) for k, v in r.items()})
+
+def analyze_many(paths: Sequence[str], out_path: Optional[str] = None, workers: Optional[int] = None,
+                 body_weight_N: Any = "config", progress: bool = True) -> List[Dict[str, Any]]:
+    """
+    Analyze sessions in a process pool (one session per task); rows come back in input
+    order and are written to `out_path` if given. workers=1 runs in this process.
+    """
+    t0 = time.perf_counter()
+    rows: List[Optional[Dict[str, Any]]] = [None] * len(paths)
+
+    def report(done, row):
+        if progress:
+            status = "ok" if row["error"] is None else f"ERROR {row['error']}"
+            print(f"[ANALYZE] {done}/{len(paths)}  {row['wall_s']:6.2f} s  {row['path']}  {status}",
+                  flush=True)
+
+    if workers == 1 or len(paths) <= 1:
+        for i, p in enumerate(paths):
+            rows[i] = analyze_session(p, body_weight_N)
+            report(i + 1, rows[i])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(analyze_session, p, body_weight_N): i for i, p in enumerate(paths)}
+            for done, fut in enumerate(as_completed(futures), 1):
+                i = futures[fut]
+                rows[i] = fut.result()
+                report(done, rows[i])
+    if out_path:
+        write_summary(rows, out_path)
+    if progress:
+        errors = sum(r["error"] is not None for r in rows)
+        busy = sum(r["wall_s"] for r in rows)
+        print(f"[ANALYZE] {len(rows)} sessions in {time.perf_counter() - t0:.2f} s "
+              f"({busy:.2f} s of work, {errors} errors)" + (f" -> {out_path}" if out_path else ""))
+    return rows
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Gait / ball summary for many recorded sessions")
+    p.add_argument("inputs", nargs="+", help="Directories, globs or session files")
+    p.add_argument("-o", "--out", default="summary.csv", help="Summary table (.csv or .jsonl)")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPUs)")
+    p.add_argument("--body-weight", type=float, default=None, metavar="N",
+                   help="Body weight in newtons for the contact threshold (0 = auto threshold)")
+    args = p.parse_args(argv)
+    paths = find_sessions(args.inputs)
+    if not paths:
+        print("[ANALYZE] no sessions found", file=sys.stderr)
+        return 1
+    bw = "config" if args.body_weight is None else (args.body_weight or None)
+    rows = analyze_many(paths, args.out, args.jobs, bw)
+    return 1 if any(r["error"] for r in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,24 @@
 from .json_writer import JSONLinesWriter
 from .metrics import compute_metrics
 from .uuids import BALL_CMD_CHAR, BALL_DATA_CHAR
-import asyncio, time, struct, math
+from .frames import BALL_FIELDS, BALL_FRAME_SIZE, decode_ball
+from .framing import BatchReassembler, BATCH, DONE, TIMING
+from .schema import SCHEMA_SAMPLE, SCHEMA_BATCH, BALL_DEVICE, session_header, ball_batch_record
+from .pull import PullPipeline, format_stats
+from .spin import SpinAnalyzer
+from .registry import connect_cached, disconnect_quietly, get_registry
+from . import telemetry
+import asyncio, time, struct
+import numpy as np
 from bleak import BleakScanner, BleakClient
 
 # UUIDs must match Arduino sketch
 SERVICE_UUID = "19B10000-E8F2-537E-4F6C-D104768A1214"
 CHAR_UUID    = "19B10001-E8F2-537E-4F6C-D104768A1214"  # notify + write
 
+# Advertised name (substring)
+BALL_NAME = "SmartBall"
+
 # Commands
 CMD_START = b"start_r"
 CMD_STOP  = b"stop_r"
@@ -16,70 +27,116 @@ CMD_PULL  = b"get_data10_bin"
 
 class BallState:
     def __init__(self):
-        self.recv = bytearray()
-        self.expected_bytes = 0
-        self.batch = []
+        # BIN10 framing + the 8-byte <II timing packet sent while no batch is open
+        self.framer = BatchReassembler(BALL_FRAME_SIZE, decode_ball, timing_len=8)
+        self.batch = np.empty((0, 6), dtype="<i2")  # (N, 6): ax, ay, az, gx, gy, gz
         self.batch_ready = asyncio.Event()
         self.done = asyncio.Event()
         self.start_ms = None
         self.end_ms = None
-        # metrics
-        self.sample_count = 0
-        self.sum_rev_per_sec = 0.0
-        self.peak_omega_deg_s = 0.0
+        self.pipeline = None  # pull.PullPipeline fed with batches/Done
+        # metrics (fed by the pull consumer, not the notify path)
+        self.spin = SpinAnalyzer()
+        self._tm = telemetry.device("ball")
 
     def notify(self, _sender, data: bytearray):
-        # timing packet
-        if len(data) == 8 and self.expected_bytes == 0:
-            self.start_ms, self.end_ms = struct.unpack_from("<II", data, 0)
-            return
+        if self._tm is not None:
+            self._tm.notify(len(data))
+        ev = self.framer.feed(data)
+        if ev == TIMING:
+            self.start_ms, self.end_ms = struct.unpack_from("<II", self.framer.timing, 0)
+        elif ev == BATCH:
+            res = self.framer.last
+            if not res.ok:
+                if self._tm is not None:
+                    self._tm.batch_errors.value += 1
+                print(f"⚠️ ball: {res.status} batch ({res.received_bytes}/{res.expected * BALL_FRAME_SIZE} bytes)")
+            out = res.frames
+            self.batch = out
+            self.batch_ready.set()
+            if self.pipeline is not None:
+                self.pipeline.deliver(BATCH, out)
+        elif ev == DONE:
+            self.done.set()
+            self.batch_ready.set()
+            if self.pipeline is not None:
+                self.pipeline.deliver(DONE)
+
+
+def make_ball_consumer(writer: JSONLinesWriter, schema: str = SCHEMA_SAMPLE, raw_sink=None,
+                       spin: SpinAnalyzer | None = None):
+    """
+    Consumer for the ball's PullPipeline (timestamps=True): spin analytics, tee to
+    raw_sink and write one line per batch, stamped with the batch's receive time.
+    """
+    header_written = False
+
+    def consume(frames, host_ts=None):
+        host_ts = time.time() if host_ts is None else host_ts
+        nonlocal header_written
+        if spin is not None:
+            spin.add(frames)
+        if raw_sink is not None:
+            raw_sink.append(frames)
+        if schema == SCHEMA_BATCH:
+            if not header_written:
+                writer.append(session_header(BALL_DEVICE, BALL_FIELDS))
+                header_written = True
+            writer.append(ball_batch_record(host_ts, frames))
+        else:
+            # append raw records
+            writer.append({
+                "timestamp": host_ts,
+                "ball": {
+                    "records": [dict(zip(BALL_FIELDS, r)) for r in frames.tolist()]
+                }
+            })
+    return consume
+
+
+def ball_summary(st: BallState, analysis: dict | None = None) -> dict:
+    """Build the {"timestamp", "ball_summary": {...}} record from a finished BallState."""
+    return {
+        "timestamp": time.time(),
+        "ball_summary": st.spin.summary(st.start_ms, st.end_ms, analysis),
+    }
+
+
+def spin_series(analysis: dict) -> dict:
+    """Rolling spin-rate series per window: {"<w>s": {"t": [...], "rps": [...]}}."""
+    return {f"{w:g}s": {"t": v["t"].tolist(), "rps": v["rps"].tolist()}
+            for w, v in analysis["windows"].items()}
+
+
+async def run_ball(writer: JSONLinesWriter, stop_event: asyncio.Event | None = None,
+                   schema: str = SCHEMA_SAMPLE, raw_sink=None):
+    # schema: SCHEMA_SAMPLE -> list of {ax..gz} dicts per batch; SCHEMA_BATCH -> header + frame arrays
+    # raw_sink: optional session_file.SessionWriter that also receives the raw <6h frames
+    async def scan():
+        print("🔍 Scanning for SmartBall...")
+        dev = await BleakScanner.find_device_by_filter(lambda d, ad: d.name and BALL_NAME in d.name)
+        if dev:
+            print(f"✅ Found SmartBall at {dev.address}")
+        return dev
+
+    async def connect(dev):
+        c = BleakClient(dev)
         try:
-            txt = data.decode("utf-8")
-            if txt.startswith("BIN10:"):
-                n = int(txt.split(":", 1)[1])
-                self.expected_bytes = n * 12
-                self.recv.clear()
-                self.batch.clear()
-                return
-            if txt == "BATCH_DONE":
-                if self.expected_bytes and len(self.recv) >= self.expected_bytes:
-                    out, off = [], 0
-                    for _ in range(self.expected_bytes // 12):
-                        ax, ay, az, gx, gy, gz = struct.unpack_from("<6h", self.recv, off)
-                        out.append((ax, ay, az, gx, gy, gz))
-                        off += 12
-                    self.batch = out
-                    # accumulate metrics
-                    for _ax, _ay, _az, gx, gy, gz in out:
-                        omega = math.sqrt(gx*gx + gy*gy + gz*gz)
-                        self.peak_omega_deg_s = max(self.peak_omega_deg_s, omega)
-                        self.sum_rev_per_sec += omega / 360.0
-                        self.sample_count += 1
-                self.batch_ready.set()
-                return
-            if txt == "Done":
-                self.done.set()
-                self.batch_ready.set()
-                return
-        except UnicodeDecodeError:
-            pass
-        # binary chunk
-        self.recv.extend(data)
-
-
-async def run_ball(writer: JSONLinesWriter, stop_event: asyncio.Event | None = None):
-    print("🔍 Scanning for SmartBall...")
-    dev = await BleakScanner.find_device_by_filter(lambda d, ad: d.name and "SmartBall" in d.name)
-    if not dev:
-        raise RuntimeError("❌ SmartBall not found")
-    print(f"✅ Found SmartBall at {dev.address}")
+            await c.connect()
+        except BaseException:        # failed, or cancelled by the cached-connect timeout
+            await disconnect_quietly(c)
+            raise
+        return c
 
+    # cached address first, scan only if that fails (registry.py)
     st = BallState()
-    async with BleakClient(dev) as client:
+    client = await connect_cached(get_registry(), BALL_NAME, "ball", connect, scan)
+    try:
         print("🔗 Connected")
         await client.start_notify(CHAR_UUID, st.notify)
 
         # start
+        host_start_ts = time.time()
         await client.write_gatt_char(CHAR_UUID, CMD_START)
 
         # Wait for external stop, or fall back to input if none given
@@ -88,62 +145,31 @@ async def run_ball(writer: JSONLinesWriter, stop_event: asyncio.Event | None = N
         else:
             input("[ball] Recording... press ENTER to STOP\n")
 
+        host_stop_ts = time.time()
         await client.write_gatt_char(CHAR_UUID, CMD_STOP)
         await asyncio.sleep(0.3)
 
-        # pull loop
-        while not st.done.is_set():
-            st.batch_ready.clear()
-            await client.write_gatt_char(CHAR_UUID, CMD_PULL)
-            try:
-                await asyncio.wait_for(st.batch_ready.wait(), 5.0)
-            except asyncio.TimeoutError:
-                continue
-
-            if st.batch:
-                # append raw records
-                writer.append({
-                    "timestamp": time.time(),
-                    "ball": {
-                        "records": [
-                            {"ax": r[0], "ay": r[1], "az": r[2], "gx": r[3], "gy": r[4], "gz": r[5]}
-                            for r in st.batch
-                        ]
-                    }
-                })
+        # pull pipeline: next pull goes out while the previous batch is written
+        st.pipeline = PullPipeline("ball", client, CHAR_UUID, CMD_PULL,
+                                   make_ball_consumer(writer, schema, raw_sink, st.spin),
+                                   timestamps=True).start()
+        await st.pipeline.join()
+        print(format_stats(st.pipeline.stats()))
 
         await client.stop_notify(CHAR_UUID)
+    finally:
+        await client.disconnect()
 
-    # ---- summary ----
-    duration_s = 0.0
-    if st.start_ms is not None and st.end_ms is not None and st.end_ms >= st.start_ms:
-        duration_s = (st.end_ms - st.start_ms) / 1000.0
-
-    if st.sample_count > 0 and duration_s > 0.0:
-        avg_rev_per_sec = st.sum_rev_per_sec / st.sample_count
-        total_revolutions = avg_rev_per_sec * duration_s
-    else:
-        avg_rev_per_sec = 0.0
-        total_revolutions = 0.0
-
-    summary = {
-        "timestamp": time.time(),
-        "ball_summary": {
-            "t_start_ms": int(st.start_ms) if st.start_ms is not None else None,
-            "t_end_ms":   int(st.end_ms) if st.end_ms is not None else None,
-            "duration_s": duration_s,
-            "samples": st.sample_count,
-            "avg_rev_per_sec": avg_rev_per_sec,
-            "avg_spin_rpm": avg_rev_per_sec * 60.0,
-            "total_revolutions": total_revolutions,
-            "omega_deg_s_peak": st.peak_omega_deg_s,
-            "spin_rps_peak": st.peak_omega_deg_s / 360.0,
-            "spin_rpm_peak": (st.peak_omega_deg_s / 360.0) * 60.0
-        }
-    }
+    analysis = st.spin.finish(st.start_ms, st.end_ms)
+    summary = ball_summary(st, analysis)
 
     # append to file
     writer.append(summary)
+    if raw_sink is not None:
+        raw_sink.meta.update(t_start_ms=summary["ball_summary"]["t_start_ms"],
+                             t_end_ms=summary["ball_summary"]["t_end_ms"],
+                             host_start_ts=host_start_ts, host_stop_ts=host_stop_ts)
+
+    # return for main() (with the windowed spin-rate series, not written to the log)
+    return {**summary, "spin_series": spin_series(analysis)}
 
-    # return for main()
-    return summary
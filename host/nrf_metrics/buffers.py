@@ -0,0 +1,205 @@
+# buffers.py
+"""
+Columnar per-session sample buffers.
+
+A recording keeps every insole sample for the end-of-session analysis. Holding
+them as Python floats and per-sample dicts costs hundreds of bytes a sample; here
+each quantity is one growable typed column instead (uint32 device timestamp,
+float64 seconds, 8 x uint16 ADC, 8 x float64 force: ~100 bytes a sample).
+
+    buf = InsoleBuffer(labels, spill_bytes=256 << 20)
+    buf.append(ts, t, adc, force)          # one call per batch
+    buf.t, buf.force                       # (N,) / (N, 8) views, zero-copy
+
+Columns grow by doubling in memory. Once the buffer's columns together pass
+`spill_bytes`, each column moves to an anonymous temporary file and is memory
+mapped from then on, so a multi-hour session is bounded by disk rather than RAM
+(the page cache keeps the recent part hot). The files are unlinked from the start
+and go away with the last view of them.
+
+ForcesView / SensorsView present the columns in the legacy list-of-dicts shape
+(one dict per sample, built on access) for code that still indexes samples.
+"""
+import tempfile
+from collections import abc
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_SPILL_MB = 256.0
+
+# =========================== Column ===========================
+
+class Column:
+    """Growable array of rows shaped `shape`; in memory until spill(), then memory mapped."""
+    def __init__(self, dtype, shape: Tuple[int, ...] = (), capacity: int = 1024,
+                 spill_dir: Optional[str] = None):
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.spill_dir = spill_dir
+        self.n = 0
+        self._data = np.empty((capacity,) + self.shape, dtype=self.dtype)
+        self._file = None
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes reserved (capacity, not just the filled rows)."""
+        return self._data.nbytes
+
+    def __len__(self) -> int:
+        return self.n
+
+    def extend(self, rows) -> None:
+        rows = np.asarray(rows, dtype=self.dtype).reshape((-1,) + self.shape)
+        end = self.n + len(rows)
+        if end > len(self._data):
+            self._resize(max(end, 2 * len(self._data)))
+        self._data[self.n:end] = rows
+        self.n = end
+
+    def view(self) -> np.ndarray:
+        """The filled rows. Zero-copy; stays valid (but stops growing) after later appends."""
+        return self._data[:self.n]
+
+    def spill(self) -> None:
+        """Move the column to a temporary file and memory map it from now on."""
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(prefix="nrfcol-", dir=self.spill_dir)
+            self._resize(len(self._data))
+
+    def _resize(self, capacity: int) -> None:
+        old = self._data[:self.n]
+        if self._file is None:
+            new = np.empty((capacity,) + self.shape, dtype=self.dtype)
+            new[:self.n] = old
+        else:
+            row = self.dtype.itemsize * int(np.prod(self.shape, dtype=np.int64))
+            if isinstance(self._data, np.memmap):
+                self._data.flush()
+                old = None                     # already in the file
+            self._file.truncate(capacity * row)
+            new = np.memmap(self._file, dtype=self.dtype, mode="r+", shape=(capacity,) + self.shape)
+            if old is not None:
+                new[:self.n] = old
+        self._data = new
+
+    def close(self) -> None:
+        """Release the file; existing views keep the mapping (and the data) alive."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+# =========================== Insole Buffer ===========================
+
+class InsoleBuffer:
+    """Per-insole analysis columns: dev_ts (raw), t (s), adc (N, C) and force (N, C, newtons)."""
+    def __init__(self, labels: Sequence[str], spill_bytes: Optional[int] = int(DEFAULT_SPILL_MB * (1 << 20)),
+                 spill_dir: Optional[str] = None):
+        self.labels = list(labels)
+        c = (len(self.labels),)
+        self.spill_bytes = spill_bytes
+        self._dev_ts = Column(np.uint32, spill_dir=spill_dir)
+        self._t = Column(np.float64, spill_dir=spill_dir)
+        self._adc = Column(np.uint16, c, spill_dir=spill_dir)
+        self._force = Column(np.float64, c, spill_dir=spill_dir)
+        self.columns = (self._dev_ts, self._t, self._adc, self._force)
+
+    def __len__(self) -> int:
+        return self._t.n
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in self.columns)
+
+    @property
+    def spilled(self) -> bool:
+        return self._t.spilled
+
+    def append(self, dev_ts, t, adc, force) -> None:
+        """Append one batch (arrays or lists, all the same length)."""
+        for col, rows in zip(self.columns, (dev_ts, t, adc, force)):
+            col.extend(rows)
+        if not self.spilled and self.spill_bytes is not None and self.nbytes > self.spill_bytes:
+            for col in self.columns:
+                col.spill()
+
+    @property
+    def dev_ts(self) -> np.ndarray:
+        return self._dev_ts.view()
+
+    @property
+    def t(self) -> np.ndarray:
+        return self._t.view()
+
+    @property
+    def adc(self) -> np.ndarray:
+        return self._adc.view()
+
+    @property
+    def force(self) -> np.ndarray:
+        return self._force.view()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"samples": len(self), "bytes": self.nbytes, "spilled": self.spilled}
+
+    def close(self) -> None:
+        for col in self.columns:
+            col.close()
+
+# =========================== Legacy Views ===========================
+
+class _RowView(abc.Sequence):
+    def __init__(self, n: int):
+        self._n = n
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._row(k) for k in range(*i.indices(self._n))]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return self._row(i)
+
+class ForcesView(_RowView):
+    """(N, C) force matrix seen as a list of {label: force} dicts; `.matrix` is the array itself."""
+    def __init__(self, force: np.ndarray, labels: Sequence[str]):
+        super().__init__(len(force))
+        self.matrix = force
+        self.labels = list(labels)
+
+    def _row(self, i: int) -> Dict[str, float]:
+        return dict(zip(self.labels, self.matrix[i].tolist()))
+
+class SensorsView(_RowView):
+    """
+    Per-sample {"t", "sensors": [{label, analog, resistance, force, pressure}]} built on
+    access; resistance/pressure come from `profile` (a calibration.CalibrationProfile).
+    """
+    def __init__(self, buf: InsoleBuffer, profile: Any):
+        super().__init__(len(buf))
+        self.t, self.adc, self.force, self.labels = buf.t, buf.adc, buf.force, buf.labels
+        self.profile = profile
+
+    def _row(self, i: int) -> Dict[str, Any]:
+        adc = self.adc[i].astype(np.intp)
+        cols = zip(self.labels, adc.tolist(), self.profile.resistance(adc).tolist(),
+                   self.force[i].tolist(), self.profile.pressure(adc).tolist())
+        return {"t": float(self.t[i]),
+                "sensors": [{"label": l, "analog": a, "resistance": r, "force": f, "pressure": p}
+                            for l, a, r, f, p in cols]}
+
+def force_rows(forces: Any, labels: Optional[Sequence[str]] = None) -> Optional[Tuple[np.ndarray, List[str]]]:
+    """(matrix, labels) when `forces` is already columnar (ForcesView / 2-D array), else None."""
+    if isinstance(forces, ForcesView) and (labels is None or list(labels) == forces.labels):
+        return forces.matrix, forces.labels
+    if isinstance(forces, np.ndarray) and forces.ndim == 2 and labels is not None:
+        return forces, list(labels)
+    return None
@@ -0,0 +1,183 @@
+# calibration.py
+import json
+import os
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .config import CHANNEL_LABELS, AREA_CM2
+from .frames import INSOLE_DTYPE
+
+ADC_MAX = 4095              # 12-bit ADC full scale
+ADC_LEVELS = ADC_MAX + 1    # table size per channel
+DEFAULT_AREA_CM2 = 6.5
+N_CHANNELS = INSOLE_DTYPE["ch"].shape[0]    # channels per insole frame
+
+# Directory searched by load_profile(); override with NRF_CALIBRATION_DIR
+CALIBRATION_DIR = os.environ.get(
+    "NRF_CALIBRATION_DIR", os.path.join(os.path.expanduser("~"), ".nrf_metrics", "calibration")
+)
+
+# =========================== Per-channel Curve ===========================
+
+@dataclass
+class ChannelCurve:
+    """
+    ADC -> resistance -> force mapping for one FSR channel:
+      resistance = adc / (ADC_MAX - adc) * r_scale
+      force      = clamp(a * resistance ** b, f_min, f_max)
+    Defaults reproduce the original placeholder R-curve.
+    """
+    a: float = 156.6869
+    b: float = -1.839
+    r_scale: float = 3.3
+    f_min: float = 0.0
+    f_max: float = 30.0
+    area_cm2: float = DEFAULT_AREA_CM2
+
+    def tables(self):
+        """Return (resistance, force, pressure) tables indexed by ADC code."""
+        adc = np.arange(ADC_LEVELS, dtype=np.float64)
+        valid = (adc > 0) & (adc < ADC_MAX)
+        resistance = np.zeros(ADC_LEVELS)
+        force = np.zeros(ADC_LEVELS)
+        resistance[valid] = (adc[valid] / (ADC_MAX - adc[valid])) * self.r_scale
+        # scalar pow keeps the tables bit-identical to the per-sample formula (built once)
+        a, b = self.a, self.b
+        force[valid] = np.clip([a * (r ** b) for r in resistance[valid].tolist()], self.f_min, self.f_max)
+        area_m2 = self.area_cm2 * 1e-4
+        pressure = force / area_m2 if area_m2 > 0 else np.zeros(ADC_LEVELS)
+        return resistance, force, pressure
+
+# =========================== Profile (lookup tables) ===========================
+
+class CalibrationProfile:
+    """
+    Precomputed per-channel lookup tables: resistance (ohm), force (N) and pressure (Pa)
+    for every 12-bit ADC code. Each table has shape (n_channels, 4096).
+
+    Lookups accept a scalar ADC code plus a channel index, or an (..., n_channels)
+    integer array (e.g. the (N, 8) "ch" column of an insole batch), in which case
+    every column is mapped through its own channel table in one index operation.
+    """
+    def __init__(self, labels: Sequence[str], curves: Sequence[ChannelCurve],
+                 serial: Optional[str] = None):
+        if len(labels) != len(curves):
+            raise ValueError("labels and curves must have the same length")
+        self.labels: List[str] = list(labels)
+        self.curves: List[ChannelCurve] = list(curves)
+        self.serial = serial
+        tabs = [c.tables() for c in self.curves]
+        self.resistance_lut = np.stack([t[0] for t in tabs])
+        self.force_lut = np.stack([t[1] for t in tabs])
+        self.pressure_lut = np.stack([t[2] for t in tabs])
+        self._ch_index = np.arange(len(self.labels))
+
+    # ---- construction ----
+
+    @classmethod
+    def default(cls, labels: Sequence[str] = CHANNEL_LABELS,
+                areas_cm2: Optional[Dict[str, float]] = None) -> "CalibrationProfile":
+        """Profile built from the default curve and AREA_CM2 for each label."""
+        areas = AREA_CM2 if areas_cm2 is None else areas_cm2
+        return cls(labels, [ChannelCurve(area_cm2=areas.get(l, DEFAULT_AREA_CM2)) for l in labels])
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "CalibrationProfile":
+        """
+        Build from {"serial": str, "channels": {label: {a, b, r_scale, f_min, f_max, area_cm2}}}.
+        Labels follow CHANNEL_LABELS order; missing fields fall back to the defaults.
+        Raises ValueError unless there is one label per frame channel (N_CHANNELS).
+        """
+        channels = d.get("channels", {})
+        labels = d.get("labels", list(CHANNEL_LABELS))
+        if len(labels) != N_CHANNELS:
+            raise ValueError(f"calibration profile {d.get('serial')!r} has {len(labels)} labels; "
+                             f"insole frames have {N_CHANNELS} channels")
+        curves = []
+        for label in labels:
+            params = dict(channels.get(label, {}))
+            params.setdefault("area_cm2", AREA_CM2.get(label, DEFAULT_AREA_CM2))
+            curves.append(ChannelCurve(**params))
+        return cls(labels, curves, serial=d.get("serial"))
+
+    def to_dict(self) -> dict:
+        return {
+            "serial": self.serial,
+            "labels": self.labels,
+            "channels": {l: asdict(c) for l, c in zip(self.labels, self.curves)},
+        }
+
+    # ---- lookups ----
+
+    def _lookup(self, lut: np.ndarray, adc, channel: Optional[int]):
+        idx = np.minimum(adc, ADC_MAX)
+        if channel is not None:
+            return lut[channel, idx]
+        return lut[self._ch_index, idx]
+
+    def resistance(self, adc, channel: Optional[int] = None):
+        return self._lookup(self.resistance_lut, adc, channel)
+
+    def force(self, adc, channel: Optional[int] = None):
+        return self._lookup(self.force_lut, adc, channel)
+
+    def pressure(self, adc, channel: Optional[int] = None):
+        return self._lookup(self.pressure_lut, adc, channel)
+
+# =========================== Loading & Active Profile ===========================
+
+def load_profile(serial: str, directory: Optional[str] = None) -> CalibrationProfile:
+    """
+    Load `<directory>/<serial>.json` (default CALIBRATION_DIR).
+    Raises FileNotFoundError if the insole has no stored profile.
+    """
+    path = os.path.join(directory or CALIBRATION_DIR, f"{serial}.json")
+    with open(path, "r") as f:
+        d = json.load(f)
+    d.setdefault("serial", serial)
+    return CalibrationProfile.from_dict(d)
+
+def save_profile(profile: CalibrationProfile, directory: Optional[str] = None) -> str:
+    if not profile.serial:
+        raise ValueError("profile has no serial")
+    directory = directory or CALIBRATION_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{profile.serial}.json")
+    with open(path, "w") as f:
+        json.dump(profile.to_dict(), f, indent=2)
+    return path
+
+def resolve_profile(spec: Union[None, str, CalibrationProfile],
+                    directory: Optional[str] = None) -> Optional[CalibrationProfile]:
+    """
+    Per-device calibration from an argument: a CalibrationProfile as is, an insole
+    serial (load_profile), or a path to a profile JSON file. None stays None
+    (the device then follows the active profile).
+    """
+    if spec is None or isinstance(spec, CalibrationProfile):
+        return spec
+    if spec.endswith(".json") and os.path.isfile(spec):
+        with open(spec, "r") as f:
+            return CalibrationProfile.from_dict(json.load(f))
+    return load_profile(spec, directory)
+
+_active_lock = threading.Lock()
+_active: Optional[CalibrationProfile] = None
+
+def get_active_profile() -> CalibrationProfile:
+    """Profile used when a device has none of its own (built on first use)."""
+    global _active
+    if _active is None:
+        with _active_lock:
+            if _active is None:
+                _active = CalibrationProfile.default()
+    return _active
+
+def set_active_profile(profile: CalibrationProfile) -> None:
+    """Swap the process-wide profile; takes effect from the next batch."""
+    global _active
+    with _active_lock:
+        _active = profile
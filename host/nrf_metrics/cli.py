@@ -1,11 +1,261 @@
+# cli.py
+"""
+nrf-ble command line.
+
+    nrf-ble scan [--timeout 10] [--name Insole] [--watch]
+    nrf-ble log --name NRF-BLE-DEMO --save out.jsonl      (default: `nrf-ble --save out.jsonl`)
+    nrf-ble record insoles|ball|all -o session.jsonl [--duration 60] [--raw-dir DIR]
+    nrf-ble analyze recordings/ -o summary.csv -j 8
+    nrf-ble replay day.jsonl --start 600 --end 660 --speed 2
+
+Only argparse is imported up front. bleak, rich, numpy and the recording stack are
+imported inside the subcommand that needs them, so `--help` and the offline
+commands (analyze, replay) start without loading the BLE stack.
+"""
 import argparse
-from .client import connect_and_log
-
-def main():
-    p = argparse.ArgumentParser()
-    p.add_argument("--name", help="BLE name", default="NRF-BLE-DEMO")
-    p.add_argument("--address", help="BLE MAC/address")
-    p.add_argument("--save", help="JSONL output file")
-    p.add_argument("--once", action="store_true", help="Exit after first exchange")
-    args = p.parse_args()
-    connect_and_log(args.name, args.address, args.save, args.once)
+import sys
+from typing import List, Optional, Sequence
+
+COMMANDS = ("scan", "log", "record", "analyze", "replay")
+
+# =========================== Shared Options ===========================
+
+def _add_log_args(p: argparse.ArgumentParser, what: str) -> None:
+    p.add_argument("--rotate-mb", type=float, default=None, metavar="MB",
+                   help=f"Start a new {what} segment every MB megabytes")
+    p.add_argument("--rotate-min", type=float, default=None, metavar="MIN",
+                   help=f"Start a new {what} segment every MIN minutes")
+    p.add_argument("--compress", choices=("gzip", "lzma", "zlib"), default=None,
+                   help=f"Compress finished {what} segments in the background")
+
+def _log_opts(args) -> dict:
+    return {
+        "max_bytes": int(args.rotate_mb * 1024 * 1024) if args.rotate_mb else None,
+        "max_seconds": args.rotate_min * 60 if args.rotate_min else None,
+        "compression": args.compress,
+    }
+
+def _add_metrics_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--metrics-port", type=int, default=None, metavar="PORT",
+                   help="Serve live metrics at http://127.0.0.1:PORT/metrics (Prometheus text)")
+    p.add_argument("--metrics-jsonl", default=None, metavar="FILE",
+                   help="Append a metrics snapshot + rates to FILE every 5 s")
+
+def _start_metrics(args):
+    """Enable telemetry if asked; returns the JSONLDumper to close (or None)."""
+    if args.metrics_port is None and not args.metrics_jsonl:
+        return None
+    from . import telemetry
+    telemetry.enable()
+    if args.metrics_port is not None:
+        telemetry.serve(args.metrics_port)
+    return telemetry.JSONLDumper(args.metrics_jsonl) if args.metrics_jsonl else None
+
+def _calibration_arg(spec: str) -> str:
+    role, sep, value = spec.partition("=")
+    if not sep or role not in ("left", "right") or not value:
+        raise argparse.ArgumentTypeError(f"expected left=SERIAL or right=SERIAL, got {spec!r}")
+    return spec
+
+def _run(coro):
+    import asyncio
+    if sys.platform.startswith("win"):
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    return asyncio.run(coro)
+
+# =========================== Subcommands ===========================
+
+def cmd_scan(args) -> int:
+    from . import scanner
+    if args.watch:
+        try:
+            _run(scanner.watch(args.name))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    _run(scanner.main(args.timeout, args.name))
+    return 0
+
+def cmd_log(args) -> int:
+    from .client import connect_and_log
+    dumper = _start_metrics(args)
+    try:
+        connect_and_log(args.name, args.address, args.save, args.once, args.verbose, args.stream_rate,
+                        _log_opts(args))
+    finally:
+        if dumper is not None:
+            dumper.close()
+    return 0
+
+async def _record(args, writer, sinks):
+    import asyncio
+    from .schema import SCHEMA_BATCH, SCHEMA_SAMPLE
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    if args.duration is not None:
+        loop.call_later(args.duration, stop.set)
+    else:
+        # read ENTER off the loop so pulls keep running while we wait
+        loop.run_in_executor(None, input, "Recording. Press ENTER to stop.\n").add_done_callback(
+            lambda _f: stop.set())
+    schema = SCHEMA_BATCH if args.schema == "batch" else SCHEMA_SAMPLE
+    buffers = {"spill_mb": args.spill_mb if args.spill_mb > 0 else None}
+    calibration = dict(spec.split("=", 1) for spec in args.calibration)
+    if args.target == "ball":
+        from .ball import run_ball
+        return {"ball": await run_ball(writer, stop, schema, raw_sink=sinks.get("ball"))}
+    if args.target == "insoles":
+        from .insole import run_insoles
+        return await run_insoles(writer, stop, schema, raw_sinks=sinks, live_gait=args.live_gait,
+                                 worker_log=args.worker_log, calibration=calibration, **buffers)
+    from .session import run_session
+    return await run_session(writer, stop, schema=schema, raw_sinks=sinks, live_gait=args.live_gait,
+                             worker_log=args.worker_log, calibration=calibration, **buffers)
+
+def cmd_record(args) -> int:
+    import os
+    from .segments import open_writer
+    from .session_file import SessionWriter
+
+    roles = {"ball": ["ball"], "insoles": ["left"], "all": ["left", "right", "ball"]}[args.target]
+    sinks = {}
+    if args.raw_dir:
+        from .config import DEV_TS_UNITS_PER_S
+        os.makedirs(args.raw_dir, exist_ok=True)
+        for role in roles:
+            kind = "ball" if role == "ball" else f"{role}_insole"
+            sinks[role] = SessionWriter(os.path.join(args.raw_dir, f"{kind}.nrfs"), kind,
+                                        **({} if role == "ball" else {"units_per_s": DEV_TS_UNITS_PER_S}))
+    dumper = _start_metrics(args)
+    try:
+        with open_writer(args.out, **_log_opts(args)) as writer:
+            res = _run(_record(args, writer, sinks))
+    finally:
+        for s in sinks.values():
+            s.close()
+        if dumper is not None:
+            dumper.close()
+    for role, r in res.items():
+        if isinstance(r, dict) and "t" in r:
+            extra = f", {len(r['gait']['events']['HS'])} steps" if "gait" in r else ""
+            print(f"[RECORD] {role}: {len(r['t'])} samples{extra}")
+        elif isinstance(r, dict) and "ball_summary" in r:
+            b = r["ball_summary"]
+            print(f"[RECORD] ball: {b.get('samples')} samples, "
+                  f"{b.get('total_revolutions', 0):.1f} revolutions")
+    return 0
+
+def cmd_analyze(argv: List[str]) -> int:
+    from .analyze import main as analyze_main
+    return analyze_main(argv)
+
+def cmd_replay(args) -> int:
+    import json
+    import time
+    from .logindex import LogIndex
+    from .segments import open_writer
+
+    idx = LogIndex.open(args.log, cache=not args.no_cache)
+    t_first = idx.t_min if len(idx) else 0.0
+    t0 = None if args.start is None else t_first + args.start
+    t1 = None if args.end is None else t_first + args.end
+    times = idx.t[idx.select(t0, t1)].tolist()
+    out = open_writer(args.out, durability="none") if args.out else None
+    wall0 = rec0 = None
+    n = 0
+    try:
+        for t, line in zip(times, idx.lines(t0, t1)):
+            if args.speed > 0 and t == t:          # header lines carry no time (NaN)
+                if wall0 is None:
+                    wall0, rec0 = time.monotonic(), t
+                delay = (t - rec0) / args.speed - (time.monotonic() - wall0)
+                if delay > 0:
+                    time.sleep(delay)
+            if out is not None:
+                out.append(json.loads(line))
+            else:
+                sys.stdout.write(line.decode("utf-8", "replace"))
+            n += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out is not None:
+            out.close()
+    print(f"[REPLAY] {n} records", file=sys.stderr)
+    return 0
+
+# =========================== Parser ===========================
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="nrf-ble", description="BLE host tools for nRF devices")
+    sub = p.add_subparsers(dest="command", metavar="COMMAND")
+
+    s = sub.add_parser("scan", help="List advertising BLE devices")
+    s.add_argument("--timeout", type=float, default=10.0, help="Scan time in seconds")
+    s.add_argument("--name", default=None, help="Only names containing this")
+    s.add_argument("--watch", action="store_true",
+                   help="Keep scanning in the background and refresh the device cache until Ctrl+C")
+    s.set_defaults(func=cmd_scan)
+
+    s = sub.add_parser("log", help="Connect to an NRF-BLE-DEMO board and log its notifications")
+    s.add_argument("--name", help="BLE name", default="NRF-BLE-DEMO")
+    s.add_argument("--address", help="BLE MAC/address")
+    s.add_argument("--save", help="JSONL output file")
+    s.add_argument("--once", action="store_true", help="Exit after first exchange")
+    s.add_argument("--verbose", action="store_true",
+                   help="Echo every packet (default: batched streaming with a periodic summary)")
+    s.add_argument("--stream-rate", type=int, default=None, metavar="HZ",
+                   help="Request continuous packed IMU samples (0x02) at HZ (16-1000) "
+                        "instead of one 0x01 sample")
+    _add_log_args(s, "--save")
+    _add_metrics_args(s)
+    s.set_defaults(func=cmd_log)
+
+    s = sub.add_parser("record", help="Record insoles, the SmartBall or everything")
+    s.add_argument("target", choices=("insoles", "ball", "all"))
+    s.add_argument("-o", "--out", default="session.jsonl", help="JSONL output file")
+    s.add_argument("--schema", choices=("sample", "batch"), default="sample",
+                   help="Line per sample, or header + columnar line per batch")
+    s.add_argument("--duration", type=float, default=None, metavar="S",
+                   help="Stop after S seconds (default: on ENTER)")
+    s.add_argument("--raw-dir", default=None, metavar="DIR",
+                   help="Also write raw frames to DIR/<device>.nrfs session files")
+    s.add_argument("--live-gait", action="store_true", help="Detect gait events while recording")
+    s.add_argument("--spill-mb", type=float, default=256.0, metavar="MB",
+                   help="Move insole analysis buffers to memory-mapped files past MB (0 = never)")
+    s.add_argument("--worker-log", default=None, metavar="FILE",
+                   help="Calibrate/serialize insole data in a worker process writing FILE")
+    s.add_argument("--calibration", action="append", default=[], metavar="ROLE=SERIAL",
+                   type=_calibration_arg,
+                   help="Calibrate an insole (left/right) with its profile: a serial under the "
+                        "calibration dir or a profile .json (repeatable)")
+    _add_log_args(s, "--out")
+    _add_metrics_args(s)
+    s.set_defaults(func=cmd_record)
+
+    # handled by analyze.main (see main()); listed here for --help
+    sub.add_parser("analyze", help="Summarize recorded sessions (see `nrf-ble analyze -h`)",
+                   add_help=False)
+
+    s = sub.add_parser("replay", help="Print (or rewrite) a recorded log at its recorded pace")
+    s.add_argument("log", help="JSONL log (plain, compressed or segmented)")
+    s.add_argument("--start", type=float, default=None, metavar="S", help="Seconds from the first record")
+    s.add_argument("--end", type=float, default=None, metavar="S", help="Seconds from the first record")
+    s.add_argument("--speed", type=float, default=1.0, help="Playback speed (0 = as fast as possible)")
+    s.add_argument("-o", "--out", default=None, help="Write the records to this log instead of stdout")
+    s.add_argument("--no-cache", action="store_true", help="Don't read/write the .tindex.npz index")
+    s.set_defaults(func=cmd_replay)
+    return p
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in COMMANDS + ("-h", "--help"):
+        argv = ["log"] + argv              # `nrf-ble --name ... --save ...` as before
+    if argv[0] == "analyze":
+        return cmd_analyze(argv[1:])
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
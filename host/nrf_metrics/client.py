@@ -1,49 +1,222 @@
 import asyncio, json, sys, time
-from typing import Optional
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
 from bleak import BleakClient, BleakScanner
-from . import uuids
-from .parser import parse_packet, to_json
+from . import telemetry, uuids
+from .json_writer import JSONLinesWriter
+from .segments import open_writer
+from .registry import connect_cached, disconnect_quietly, get_registry
+from .parser import parse_packet, to_json, parse_batch, batch_to_json, IMU_FIELDS
 from rich.console import Console
+from rich.live import Live
 
 console = Console()
 
-async def _find_device(name: Optional[str], address: Optional[str]):
-    if address:
-        return address
+async def _find_device(name: Optional[str]):
     console.log("[bold]Scanning...[/bold]")
     devs = await BleakScanner.discover(timeout=5.0)
     for d in devs:
         if name and d.name == name:
-            return d.address
+            return d
     raise RuntimeError("Device not found")
 
-async def run(name: Optional[str], address: Optional[str], save: Optional[str], once: bool):
-    addr = await _find_device(name, address)
-    console.log(f"Connecting to [cyan]{addr}[/cyan] ...")
-    async with BleakClient(addr) as client:
+async def _connect(name: Optional[str], address: Optional[str]) -> BleakClient:
+    """Connected client: `address` if given, else the cached address for `name`, else a scan."""
+    async def connect(dev):
+        console.log(f"Connecting to [cyan]{getattr(dev, 'address', dev)}[/cyan] ...")
+        client = BleakClient(dev)
+        try:
+            await client.connect()
+        except BaseException:        # failed, or cancelled by the cached-connect timeout
+            await disconnect_quietly(client)
+            raise
+        return client
+
+    if address:
+        client = await connect(address)
+        await asyncio.to_thread(get_registry().connected, name, address, "demo")
+        return client
+    return await connect_cached(get_registry(), name, "demo", connect, lambda: _find_device(name))
+
+# =========================== Streaming Mode ===========================
+
+class NotifyStream:
+    """
+    High-rate notify path: on_notify only stamps and queues the raw bytes; flush()
+    decodes everything queued in one parse_batch() and hands the records to a
+    buffered sink (JSONLinesWriter). Counters feed the periodic console summary.
+
+    drops = notifications refused because `max_pending` were already queued, plus
+    gaps in the heartbeat counter (0x20) and in the packed-sample sequence (0x11).
+    """
+    def __init__(self, sink: Optional[JSONLinesWriter] = None, max_pending: int = 100_000):
+        self.sink = sink
+        self.max_pending = max_pending
+        self._pending: List[Tuple[float, bytes]] = []
+        self.packets = 0
+        self.bytes = 0
+        self.overflow = 0
+        self.heartbeat_gaps = 0
+        self.seq_gaps = 0
+        self.samples = 0
+        self.last_sample: Optional[Dict[str, Any]] = None
+        self._last_hb: Optional[int] = None
+        self._last_seq: Optional[int] = None
+        self._rate_t = time.monotonic()
+        self._rate_packets = 0
+        self._rate_bytes = 0
+        self._tm = telemetry.device("nrf")
+
+    @property
+    def drops(self) -> int:
+        return self.overflow + self.heartbeat_gaps + self.seq_gaps
+
+    @staticmethod
+    def _gaps(counter: np.ndarray, last: Optional[int], modulo: int) -> int:
+        c = counter.astype(np.int64)
+        prev = c[0] - 1 if last is None else last
+        steps = np.diff(np.concatenate(([prev], c))) % modulo
+        return int(np.maximum(steps - 1, 0).sum())
+
+    def on_notify(self, _sender, data: bytearray):
+        if self._tm is not None:
+            self._tm.notify(len(data))
+        if len(self._pending) >= self.max_pending:
+            self.overflow += 1
+            return
+        self._pending.append((time.time(), bytes(data)))
+
+    def flush(self) -> int:
+        """Decode and write everything queued so far; returns the packet count."""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        batch = parse_batch([d for _, d in pending])
+        self.packets += len(pending)
+        self.bytes += sum(len(d) for _, d in pending)
+        if len(batch.heartbeat):
+            self.heartbeat_gaps += self._gaps(batch.heartbeat, self._last_hb, 256)
+            self._last_hb = int(batch.heartbeat[-1])
+        if len(batch.packed_seq):
+            self.seq_gaps += self._gaps(batch.packed_seq, self._last_seq, 1 << 16)
+            self._last_seq = int(batch.packed_seq[-1])
+        self.samples += len(batch.imu)
+        if len(batch.imu):
+            self.last_sample = dict(zip(IMU_FIELDS, batch.imu[-1].tolist()))
+        if self.sink is not None:
+            for (ts, _), obj in zip(pending, batch_to_json(batch)):
+                if obj is not None:
+                    self.sink.append({"ts": ts, **obj})
+        return len(pending)
+
+    def rates(self) -> Tuple[float, float]:
+        """(packets/s, bytes/s) since the previous call."""
+        now = time.monotonic()
+        dt = max(now - self._rate_t, 1e-9)
+        pps = (self.packets - self._rate_packets) / dt
+        bps = (self.bytes - self._rate_bytes) / dt
+        self._rate_t, self._rate_packets, self._rate_bytes = now, self.packets, self.bytes
+        return pps, bps
+
+    def status_line(self) -> str:
+        pps, bps = self.rates()
+        last = " ".join(f"{k}={v}" for k, v in self.last_sample.items()) if self.last_sample else "-"
+        return (f"[bold]{pps:8.0f}[/bold] pkt/s  [bold]{bps / 1024:8.1f}[/bold] KiB/s  "
+                f"packets {self.packets}  samples {self.samples}  drops [red]{self.drops}[/red]  "
+                f"last {last}")
+
+async def _request_samples(client: BleakClient, stream_rate: Optional[int]):
+    if stream_rate:
+        # continuous 0x11 packed samples until 0x03
+        await client.write_gatt_char(uuids.NRF_RX_CHAR, bytes([0x02]) + stream_rate.to_bytes(2, "little"),
+                                     response=False)
+    else:
+        # send one command to get a sample
+        await client.write_gatt_char(uuids.NRF_RX_CHAR, bytes([0x01]), response=False)
+
+async def _stop_samples(client: BleakClient):
+    try:
+        await client.write_gatt_char(uuids.NRF_RX_CHAR, bytes([0x03]), response=False)
+    except Exception as e:
+        console.log(f"[yellow]stop streaming failed: {e}[/yellow]")
+
+async def _stream(client: BleakClient, save: Optional[str], once: bool,
+                  flush_s: float = 0.1, refresh_s: float = 1.0, stream_rate: Optional[int] = None,
+                  log_opts: Optional[Dict[str, Any]] = None):
+    sink = open_writer(save, **(log_opts or {})) if save else None
+    stream = NotifyStream(sink)
+    await client.start_notify(uuids.NRF_TX_CHAR, stream.on_notify)
+
+    await _request_samples(client, stream_rate)
+    t_end = time.monotonic() + 2.0 if once else None
+    next_refresh = time.monotonic() + refresh_s
+    try:
+        with Live(stream.status_line(), console=console, refresh_per_second=4) as live:
+            try:
+                while t_end is None or time.monotonic() < t_end:
+                    await asyncio.sleep(flush_s)
+                    stream.flush()
+                    if time.monotonic() >= next_refresh:
+                        live.update(stream.status_line())
+                        next_refresh += refresh_s
+            finally:
+                if stream_rate:
+                    await _stop_samples(client)
+                    await asyncio.sleep(flush_s)     # the partial packet sent on stop
+                stream.flush()
+                live.update(stream.status_line())
+    finally:
+        if sink:
+            sink.close()
+    return stream
+
+async def run(name: Optional[str], address: Optional[str], save: Optional[str], once: bool,
+              verbose: bool = False, stream_rate: Optional[int] = None,
+              log_opts: Optional[Dict[str, Any]] = None):
+    """
+    verbose: log every notification to the console (one write per line);
+    otherwise stream (NotifyStream) with a periodically refreshed summary.
+    stream_rate: ask for continuous packed samples (0x02) at this rate instead of one 0x01.
+    log_opts: segments.open_writer() options for `save` (max_bytes, max_seconds, compression).
+    """
+    client = await _connect(name, address)
+    try:
         await client.start_notify(uuids.NRF_TX_CHAR, lambda h, data: None)  # prime
-        logf = open(save, "a", buffering=1) if save else None
+        if not verbose:
+            return await _stream(client, save, once, stream_rate=stream_rate, log_opts=log_opts)
+        sink = open_writer(save, **log_opts) if save and log_opts and any(log_opts.values()) else None
+        logf = open(save, "a", buffering=1) if save and sink is None else None
 
         def on_notify(_, data: bytes):
             pkt = parse_packet(data)
             if not pkt: return
             obj = to_json(pkt)
-            line = json.dumps({"ts": time.time(), **obj})
+            rec = {"ts": time.time(), **obj}
+            line = json.dumps(rec)
             console.log(line)
             if logf: print(line, file=logf)
+            if sink: sink.append(rec)
 
         await client.start_notify(uuids.NRF_TX_CHAR, on_notify)
 
-        # send one command to get a sample
-        await client.write_gatt_char(uuids.NRF_RX_CHAR, bytes([0x01]), response=False)
-        if once:
-            await asyncio.sleep(2.0)
-        else:
-            while True:
-                await asyncio.sleep(1.0)
+        await _request_samples(client, stream_rate)
+        try:
+            if once:
+                await asyncio.sleep(2.0)
+            else:
+                while True:
+                    await asyncio.sleep(1.0)
+        finally:
+            if stream_rate:
+                await _stop_samples(client)
+            if sink:
+                sink.close()
 
         if logf:
             logf.close()
+    finally:
+        await client.disconnect()
 
-def connect_and_log(name=None, address=None, save=None, once=False):
-    asyncio.run(run(name, address, save, once))
+def connect_and_log(name=None, address=None, save=None, once=False, verbose=False, stream_rate=None,
+                    log_opts=None):
+    asyncio.run(run(name, address, save, once, verbose, stream_rate, log_opts))
@@ -0,0 +1,58 @@
+# frames.py
+from typing import List, Tuple
+
+import numpy as np
+
+# =========================== Frame Layouts ===========================
+
+# Insole frame: <I8H = uint32 device timestamp + 8 * uint16 ADC channels (20 B)
+INSOLE_DTYPE = np.dtype([("ts", "<u4"), ("ch", "<u2", (8,))])
+INSOLE_FRAME_SIZE = INSOLE_DTYPE.itemsize  # 20
+
+# Ball frame: <6h = ax, ay, az, gx, gy, gz as int16 (12 B)
+BALL_FIELDS = ("ax", "ay", "az", "gx", "gy", "gz")
+BALL_DTYPE = np.dtype([(name, "<i2") for name in BALL_FIELDS])
+BALL_FRAME_SIZE = BALL_DTYPE.itemsize  # 12
+
+# =========================== Batch Decoding ===========================
+
+def decode_insole(buf, count: int = -1) -> np.ndarray:
+    """
+    Decode a whole batch of <I8H frames with a single np.frombuffer call.
+    `count` frames are read (-1 = as many whole frames as `buf` holds).
+    Returns a structured array with fields "ts" (N,) and "ch" (N, 8).
+    The result is a read-only view over `buf`; copy it if `buf` is reused.
+    """
+    if count < 0:
+        count = len(buf) // INSOLE_FRAME_SIZE
+    return np.frombuffer(buf, dtype=INSOLE_DTYPE, count=count)
+
+def decode_ball(buf, count: int = -1) -> np.ndarray:
+    """
+    Decode a whole batch of <6h frames with a single np.frombuffer call.
+    Returns an (N, 6) int16 array with columns ax, ay, az, gx, gy, gz.
+    """
+    if count < 0:
+        count = len(buf) // BALL_FRAME_SIZE
+    return np.frombuffer(buf, dtype="<i2", count=count * 6).reshape(count, 6)
+
+def insole_columns(frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split a decoded insole batch into column arrays: (dev_ts (N,), channels (N, 8)).
+    """
+    return frames["ts"], frames["ch"]
+
+# =========================== Compatibility Views ===========================
+
+def insole_tuples(frames: np.ndarray) -> List[Tuple[int, Tuple[int, ...]]]:
+    """
+    Tuple view used by the original API: list of (dev_ts, (v0..v7)).
+    """
+    ts, ch = insole_columns(frames)
+    return list(zip(ts.tolist(), map(tuple, ch.tolist())))
+
+def ball_tuples(frames: np.ndarray) -> List[Tuple[int, ...]]:
+    """
+    Tuple view used by the original API: list of (ax, ay, az, gx, gy, gz).
+    """
+    return list(map(tuple, frames.tolist()))
@@ -0,0 +1,137 @@
+# framing.py
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+
+# Control markers sent by the peripherals (raw bytes, never decoded as text)
+HDR_PREFIX = b"BIN10:"
+MARK_BATCH_DONE = b"BATCH_DONE"
+MARK_DONE = b"Done"
+
+# feed() results
+BATCH = "batch"      # a batch closed (see .last)
+DONE = "done"        # end of session
+TIMING = "timing"    # fixed-length timing packet (see .timing)
+
+# BatchResult.status
+OK = "ok"
+SHORT = "short"      # BATCH_DONE before all announced bytes arrived (chunks lost)
+OVERRUN = "overrun"  # more bytes than announced; extra bytes discarded
+ORPHAN = "orphan"    # BATCH_DONE without a BIN10 header
+
+@dataclass
+class BatchResult:
+    frames: np.ndarray     # decoded frames (empty unless status is OK or OVERRUN)
+    expected: int          # frames announced by BIN10:<n>
+    received_bytes: int    # payload bytes received (including any overrun)
+    status: str
+
+    @property
+    def ok(self) -> bool:
+        return self.status == OK
+
+class BatchReassembler:
+    """
+    Framing state machine for the BIN10 pull protocol, shared by insoles and the ball:
+
+      "BIN10:<n>"  -> preallocate exactly n * frame_size bytes
+      binary chunk -> copied once into the buffer through a memoryview
+      "BATCH_DONE" -> decode the buffer in place (np.frombuffer) -> BATCH
+      "Done"       -> DONE
+
+    Markers are recognized by length/prefix on the raw bytes; binary payloads are never
+    decoded as UTF-8. With `timing_len`, a packet of that length arriving while no batch
+    is open (and not a marker) is reported as TIMING (the ball's <II start/end ms).
+    Short and overrun batches are reported via BatchResult.status and the counters.
+    """
+    def __init__(self, frame_size: int, decode: Callable[[bytes, int], np.ndarray],
+                 timing_len: Optional[int] = None):
+        self.frame_size = frame_size
+        self.decode = decode
+        self.timing_len = timing_len
+        self._empty = decode(b"", 0)
+        self._buf: Optional[bytearray] = None
+        self._view: Optional[memoryview] = None
+        self._pos = 0
+        self._expected = 0
+        self._overrun = 0
+        self.last = BatchResult(self._empty, 0, 0, OK)
+        self.timing: Optional[bytes] = None
+        # counters
+        self.batches = 0
+        self.short_batches = 0
+        self.overrun_batches = 0
+        self.orphan_bytes = 0
+        self.lost_bytes = 0
+
+    @property
+    def in_batch(self) -> bool:
+        return self._buf is not None
+
+    @staticmethod
+    def _header_count(data) -> Optional[int]:
+        if len(data) <= len(HDR_PREFIX) or bytes(data[:len(HDR_PREFIX)]) != HDR_PREFIX:
+            return None
+        digits = bytes(data[len(HDR_PREFIX):])
+        return int(digits) if digits.isdigit() else None
+
+    def feed(self, data) -> Optional[str]:
+        n = len(data)
+        if n == len(MARK_BATCH_DONE) and data == MARK_BATCH_DONE:
+            self._close()
+            return BATCH
+        if n == len(MARK_DONE) and data == MARK_DONE:
+            self._reset()
+            return DONE
+        count = self._header_count(data) if n <= 16 else None
+        if count is not None:
+            self._open(count)
+            return None
+        if self._buf is None:
+            if self.timing_len is not None and n == self.timing_len:
+                self.timing = bytes(data)
+                return TIMING
+            self.orphan_bytes += n
+            return None
+        # binary chunk: one copy into the preallocated buffer
+        room = len(self._buf) - self._pos
+        take = min(room, n)
+        if take:
+            self._view[self._pos:self._pos + take] = data[:take] if take < n else data
+            self._pos += take
+        self._overrun += n - take
+        return None
+
+    def _open(self, count: int) -> None:
+        self._expected = count
+        self._buf = bytearray(count * self.frame_size)
+        self._view = memoryview(self._buf)
+        self._pos = 0
+        self._overrun = 0
+
+    def _reset(self) -> None:
+        if self._view is not None:
+            self._view.release()
+        self._buf = self._view = None
+        self._pos = self._expected = self._overrun = 0
+
+    def _close(self) -> None:
+        if self._buf is None:
+            self.last = BatchResult(self._empty, 0, 0, ORPHAN)
+            return
+        received = self._pos + self._overrun
+        if self._pos < len(self._buf):
+            status, frames = SHORT, self._empty
+            self.short_batches += 1
+            self.lost_bytes += len(self._buf) - self._pos
+        else:
+            status = OVERRUN if self._overrun else OK
+            self.overrun_batches += bool(self._overrun)
+            self._view.release()
+            # the decoded array views this batch's own buffer; the next batch gets a new one
+            frames = self.decode(self._buf, self._expected)
+            self._view = None
+        self.batches += 1
+        self.last = BatchResult(frames, self._expected, received, status)
+        self._reset()
@@ -0,0 +1,198 @@
+# gait_stream.py
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .config import BODY_WEIGHT_N, FORCE_THRESHOLD_RATIO, SENSOR_POS_M, CHANNEL_LABELS
+
+# =========================== Streaming Quantile ===========================
+
+class P2Quantile:
+    """
+    P-square streaming quantile estimate (Jain & Chlamtac, 1985): O(1) memory and
+    work per sample. Exact for the first 5 samples.
+    """
+    def __init__(self, p: float):
+        self.p = p
+        self.n = 0
+        self.q: List[float] = []
+        self.pos = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.des = [1.0, 1.0 + 2 * p, 1.0 + 4 * p, 3.0 + 2 * p, 5.0]
+        self.inc = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float) -> None:
+        q, pos = self.q, self.pos
+        if self.n < 5:
+            q.append(x)
+            q.sort()
+            self.n += 1
+            return
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while k < 3 and x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            pos[i] += 1
+        for i in range(5):
+            self.des[i] += self.inc[i]
+        for i in (1, 2, 3):
+            d = self.des[i] - pos[i]
+            if (d >= 1 and pos[i + 1] - pos[i] > 1) or (d <= -1 and pos[i - 1] - pos[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (pos[i + 1] - pos[i - 1]) * (
+                    (pos[i] - pos[i - 1] + d) * (q[i + 1] - q[i]) / (pos[i + 1] - pos[i]) +
+                    (pos[i + 1] - pos[i] - d) * (q[i] - q[i - 1]) / (pos[i] - pos[i - 1]))
+                if not (q[i - 1] < qp < q[i + 1]):
+                    qp = q[i] + d * (q[i + d] - q[i]) / (pos[i + d] - pos[i])
+                q[i] = qp
+                pos[i] += d
+        self.n += 1
+
+    def value(self) -> float:
+        if self.n == 0:
+            return 0.0
+        if self.n < 5:
+            return self.q[min(self.n - 1, int(self.p * self.n))]
+        return self.q[2]
+
+# =========================== Incremental Detector ===========================
+
+class StreamingGaitDetector:
+    """
+    Incremental version of metrics.detect_events + metrics.temporal_metrics.
+
+    Feed samples in time order (update / update_batch); every sample costs O(1):
+    total force, COP, threshold-crossing state machine and stride bookkeeping.
+    Events are returned as they are detected and accumulated for result()/temporal().
+
+    Threshold: thr_ratio * body_weight_N when body weight is set (or an explicit
+    `threshold`), otherwise thr_ratio * (streaming ~0.95 quantile of total force), the
+    online counterpart of detect_events' "median of the top decile". With a fixed
+    threshold the output is identical to the batch functions; with the auto threshold
+    it converges to them once the estimate settles.
+
+    The per-sample COP trace grows with the session, so it is only kept with
+    `keep_cop=True`; otherwise result()["COP"] stays empty.
+    """
+    def __init__(self, body_weight_N: Optional[float] = BODY_WEIGHT_N,
+                 thr_ratio: float = FORCE_THRESHOLD_RATIO, threshold: Optional[float] = None,
+                 labels: Sequence[str] = CHANNEL_LABELS, keep_cop: bool = False):
+        self.labels = list(labels)
+        self.thr_ratio = thr_ratio
+        if threshold is not None:
+            self.fixed_threshold: Optional[float] = threshold
+        elif body_weight_N and body_weight_N > 0:
+            self.fixed_threshold = thr_ratio * body_weight_N
+        else:
+            self.fixed_threshold = None
+        self._quantile = P2Quantile(0.95)
+        # (channel index, x, y) in SENSOR_POS_M order, matching metrics.cop_array's summation
+        self._cop_terms = [(self.labels.index(l), x, y) for l, (x, y) in SENSOR_POS_M.items()
+                           if l in self.labels]
+        self.keep_cop = keep_cop
+
+        self.n = 0
+        self.threshold = self.fixed_threshold or 0.0
+        self._prev_ft: Optional[float] = None
+        self._above = False
+        self._t_prev_to: Optional[float] = None
+        self._t_prev_hs: Optional[float] = None
+        self._last_hs: Optional[int] = None
+        self._last_to: Optional[int] = None
+
+        self.HS: List[int] = []
+        self.TO: List[int] = []
+        self.stance: List[Tuple[int, int]] = []
+        self.swing: List[Tuple[int, int]] = []
+        self.COP: List[Dict[str, float]] = []
+        self.CT: List[float] = []
+        self.FT: List[float] = []
+        self.stride: List[float] = []
+        self._stride_sum = 0.0
+
+    # ---- per-sample ----
+
+    def _cop(self, forces: Sequence[float], total: float) -> Tuple[float, float]:
+        if total <= 0.0:
+            return (0.0, 0.0)
+        sx = sum(forces[c] * x for c, x, _ in self._cop_terms)
+        sy = sum(forces[c] * y for c, _, y in self._cop_terms)
+        return (sx / total, sy / total)
+
+    def update(self, t: float, forces) -> List[Tuple[Any, ...]]:
+        """
+        Consume one sample. `forces` is a {label: N} dict or a sequence in `labels` order.
+        Returns the events it completed:
+          ("HS", i, t) | ("TO", i, t) | ("stance", hs, to, CT) | ("swing", to, hs, FT, stride)
+        """
+        if isinstance(forces, dict):
+            forces = [forces.get(l, 0.0) for l in self.labels]
+        i = self.n
+        self.n += 1
+        ft = sum(forces)
+
+        if self.fixed_threshold is None:
+            self._quantile.add(ft)
+            self.threshold = self.thr_ratio * self._quantile.value()
+        thr = self.threshold
+
+        if self.keep_cop:
+            x, y = self._cop(forces, ft)
+            self.COP.append({"t": t, "x": x, "y": y})
+
+        events: List[Tuple[Any, ...]] = []
+        prev = self._prev_ft
+        self._prev_ft = ft
+        if prev is None:
+            return events
+
+        if not self._above and prev < thr <= ft:
+            self._above = True
+            self.HS.append(i)
+            events.append(("HS", i, t))
+            if self._last_to is not None:
+                # previous TO -> this HS closes a swing (and the flight time)
+                ft_s = t - self._t_prev_to
+                self.swing.append((self._last_to, i))
+                self.FT.append(ft_s)
+                stride = t - self._t_prev_hs
+                self.stride.append(stride)
+                self._stride_sum += stride
+                events.append(("swing", self._last_to, i, ft_s, stride))
+            self._last_hs, self._t_prev_hs = i, t
+        elif self._above and prev >= thr > ft:
+            self._above = False
+            self.TO.append(i)
+            events.append(("TO", i, t))
+            ct = t - self._t_prev_hs
+            self.stance.append((self._last_hs, i))
+            self.CT.append(ct)
+            events.append(("stance", self._last_hs, i, ct))
+            self._last_to, self._t_prev_to = i, t
+        return events
+
+    def update_batch(self, times: Sequence[float], forces: Sequence) -> List[Tuple[Any, ...]]:
+        """update() over a batch; `forces` rows are dicts or sequences in `labels` order."""
+        events: List[Tuple[Any, ...]] = []
+        for t, f in zip(times, forces):
+            ev = self.update(t, f)
+            if ev:
+                events.extend(ev)
+        return events
+
+    # ---- results ----
+
+    def result(self) -> Dict[str, Any]:
+        """Same shape as metrics.detect_events()."""
+        return {"HS": list(self.HS), "TO": list(self.TO), "stance": list(self.stance),
+                "swing": list(self.swing), "COP": list(self.COP), "threshold": self.threshold}
+
+    def temporal(self) -> Dict[str, Any]:
+        """Same shape as metrics.temporal_metrics()."""
+        stride_freq = (1.0 / (self._stride_sum / len(self.stride))) if self.stride else 0.0
+        return {"CT": list(self.CT), "FT": list(self.FT), "stride": list(self.stride),
+                "stride_freq": stride_freq}
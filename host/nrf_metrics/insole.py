@@ -1,15 +1,24 @@
 from .json_writer import JSONLinesWriter
 from .metrics import compute_metrics
 from .uuids import BALL_CMD_CHAR, BALL_DATA_CHAR
+from .frames import INSOLE_DTYPE, INSOLE_FRAME_SIZE, decode_insole, insole_columns, insole_tuples
+from .calibration import CalibrationProfile, get_active_profile, resolve_profile
+from .framing import BatchReassembler, BATCH, DONE
+from .gait_stream import StreamingGaitDetector
+from .schema import SCHEMA_SAMPLE, SCHEMA_BATCH, session_header, insole_batch_record
+from .pull import PullPipeline, format_stats
+from .offload import InsoleWorker, worker_result
+from .buffers import DEFAULT_SPILL_MB, ForcesView, InsoleBuffer, SensorsView
+from .registry import DeviceRegistry, connect_cached, disconnect_quietly, get_registry
+from . import telemetry
 
 # insole.py
 import asyncio
 import time
-import struct
-import threading
 from dataclasses import dataclass, field
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional, Union
 
+import numpy as np
 from bleak import BleakClient, BleakScanner
 
 from .config import (
@@ -24,34 +33,56 @@ from .config import (
 @dataclass
 class DeviceState:
     side: str
-    expected_bytes: int = 0
-    recv_buf: bytearray = field(default_factory=bytearray)
-    last_batch: List[Tuple[int, Tuple[int, ...]]] = field(default_factory=list)
-    batch_ready: threading.Event = field(default_factory=threading.Event)
-    done_event: threading.Event = field(default_factory=threading.Event)
-    # Analytics buffers (per side)
-    times_s: List[float] = field(default_factory=list)                 # device time (s)
-    forces_by_label: List[Dict[str, float]] = field(default_factory=list)  # {"label": force_N, ...}
-    # NEW: per-sample sensor objects (time-aligned)
-    # each item: {"t": float, "sensors": [{"label","analog","resistance","force","pressure"}, ...]}
-    sensors: List[Dict[str, Any]] = field(default_factory=list)
+    framer: BatchReassembler = field(
+        default_factory=lambda: BatchReassembler(INSOLE_FRAME_SIZE, decode_insole))
+    # Analytics buffers (per side): typed columns dev_ts / t / adc / force, spilling to
+    # memory-mapped files past their limit (see buffers.py)
+    buffer: InsoleBuffer = field(default_factory=lambda: InsoleBuffer(CHANNEL_LABELS))
+    # Calibration for this insole (None -> calibration.get_active_profile()); swap at any time
+    calibration: Optional[CalibrationProfile] = None
+    # Log layout: SCHEMA_SAMPLE (line per sample) or SCHEMA_BATCH (header + line per batch)
+    schema: str = SCHEMA_SAMPLE
+    derived: bool = True            # SCHEMA_BATCH: also write resistance/force/pressure columns
+    header_written: bool = False
+    # Optional session_file.SessionWriter receiving every batch's raw <I8H frames
+    raw_sink: Optional[Any] = None
+    # Optional live gait detector fed with every emitted batch
+    gait: Optional[StreamingGaitDetector] = None
+    # pull.PullPipeline driving this device; the notify handler reports batches/Done to it
+    pipeline: Optional[PullPipeline] = None
+    # Optional timeline.Timeline aligning this device's clock and merging it with others
+    timeline: Optional[Any] = None
+
+    @property
+    def times_s(self) -> np.ndarray:
+        """Device time (s) of every sample so far (view)."""
+        return self.buffer.t
+
+    @property
+    def forces_by_label(self) -> ForcesView:
+        """Per-sample {"label": force_N, ...}; metrics functions take the matrix directly."""
+        return ForcesView(self.buffer.force, CHANNEL_LABELS)
+
+    @property
+    def sensors(self) -> SensorsView:
+        """Per-sample {"t", "sensors": [{"label","analog","resistance","force","pressure"}, ...]}."""
+        return SensorsView(self.buffer, _profile(self))
 
 # =========================== Calibration & Math ===========================
 
-def calibrate(analog_val: int):
+def _profile(state: Optional[DeviceState] = None) -> CalibrationProfile:
+    """Per-device calibration if one is set, otherwise the process-wide active profile."""
+    if state is not None and state.calibration is not None:
+        return state.calibration
+    return get_active_profile()
+
+def calibrate(analog_val: int, channel: int = 0):
     """
     Convert raw ADC to (resistance_ohm, force_newtons). Clamp force to [0, 30].
-    NOTE: Uses the same formula you shared; tweak if you later re-calibrate.
+    Table lookup into the active CalibrationProfile (see calibration.py).
     """
-    if analog_val >= 4095 or analog_val == 0:
-        return 0.0, 0.0
-    try:
-        # Example mapping (placeholder R-curve): adjust to your divider exactly if needed.
-        resistance = (analog_val / (4095 - analog_val)) * 3.3
-        force = 156.6869 * (resistance ** -1.839)
-        return resistance, min(max(force, 0.0), 30.0)
-    except Exception:
-        return 0.0, 0.0
+    prof = get_active_profile()
+    return float(prof.resistance(analog_val, channel)), float(prof.force(analog_val, channel))
 
 def force_to_pressure(force_newtons: float, label: str) -> float:
     """
@@ -62,246 +93,323 @@ def force_to_pressure(force_newtons: float, label: str) -> float:
 
 # =========================== Parsing & Accumulation ===========================
 
+def parse_samples_array(buf: bytes, count: int) -> np.ndarray:
+    """
+    Decode count <I8H> frames in one np.frombuffer call.
+    Returns a structured array with fields "ts" (N,) and "ch" (N, 8).
+    """
+    return decode_insole(buf, count)
+
 def parse_samples(buf: bytes, count: int) -> List[Tuple[int, Tuple[int, ...]]]:
     """
     Parse count samples of little-endian frames: <I8H> = (uint32 timestamp, 8*uint16 channels).
     Each frame is 20 bytes.
     Returns: list of (dev_ts, (v0..v7))
+    Compatibility view over parse_samples_array().
     """
-    out, off = [], 0
-    for _ in range(count):
-        ts, *vals = struct.unpack_from("<I8H", buf, off)  # 4B + 8*2B = 20B
-        out.append((ts, tuple(vals)))
-        off += 20
-    return out
-
-def sample_to_insole_object(vals: Tuple[int, ...]) -> dict:
+    return insole_tuples(parse_samples_array(buf, count))
+
+def _sensor_dicts(analog, resistance, force, pressure) -> List[Dict[str, Any]]:
+    return [
+        {"label": label, "analog": a, "resistance": r, "force": f, "pressure": p}
+        for label, a, r, f, p in zip(CHANNEL_LABELS, analog, resistance, force, pressure)
+    ]
+
+def sample_to_insole_object(vals: Tuple[int, ...],
+                            profile: Optional[CalibrationProfile] = None) -> dict:
     """
     Build per-sample JSON-friendly structure with derived metrics per sensor channel.
     Returns: {"sensors": [ {label, analog, resistance, force, pressure}, ... ]}
     """
-    sensors = []
-    for i, label in enumerate(CHANNEL_LABELS):
-        analog = int(vals[i])
-        resistance, force = calibrate(analog)
-        pressure = force_to_pressure(force, label) if force > 0 else 0.0
-        sensors.append({
-            "label": label,
-            "analog": analog,
-            "resistance": resistance,
-            "force": force,
-            "pressure": pressure
-        })
-    return {"sensors": sensors}
-
-def _accumulate_for_analysis(state: DeviceState, dev_ts: int, vals: Tuple[int, ...]):
-    """
-    Append lightweight arrays for plotting/analysis (time series & force-by-label).
-    """
-    t_s = dev_ts / DEV_TS_UNITS_PER_S
-    by_label: Dict[str, float] = {}
-    for i, label in enumerate(CHANNEL_LABELS):
-        _, f = calibrate(int(vals[i]))
-        by_label[label] = f  # in Newtons
-    state.times_s.append(t_s)
-    state.forces_by_label.append(by_label)
+    prof = profile or get_active_profile()
+    adc = np.asarray(vals, dtype=np.intp)
+    return {"sensors": _sensor_dicts(
+        adc.tolist(),
+        prof.resistance(adc).tolist(),
+        prof.force(adc).tolist(),
+        prof.pressure(adc).tolist(),
+    )}
 
 def emit_batch_json(writer: JSONLinesWriter, side: str,
-                    batch: List[Tuple[int, Tuple[int, ...]]],
-                    state: DeviceState):
+                    batch: Union[np.ndarray, List[Tuple[int, Tuple[int, ...]]]],
+                    state: DeviceState, host_ts: Optional[float] = None):
     """
+    `batch` is a structured <I8H> array (see parse_samples_array) or the legacy
+    list of (dev_ts, (v0..v7)) tuples. `host_ts` is the receive time (PullPipeline
+    stamps it in deliver(); default: now).
+    Calibration runs once for the whole batch (one table lookup per derived value).
     For each parsed sample in the batch:
-      - stream a JSON line to writer
-      - update analysis buffers (times_s, forces_by_label)
-      - NEW: store full per-sample sensors object (with time) into state.sensors
+      - stream a JSON line to writer (state.schema == SCHEMA_SAMPLE; with SCHEMA_BATCH
+        one columnar line is written for the whole batch instead)
+      - append the batch to the analysis columns (state.buffer: dev_ts, t, adc, force)
     """
-    host_ts = time.time()
+    host_ts = time.time() if host_ts is None else host_ts
     side_key = "left_insole" if side.startswith("left") else "right_insole"
 
-    for dev_ts, vals in batch:
-        # Build per-sample object
-        ins = sample_to_insole_object(vals)
-
-        # Stream JSON line
-        rec = {"timestamp": host_ts, "left_insole": None, "right_insole": None}
-        rec[side_key] = ins
-        writer.append(rec)
-
-        # Accumulate analytics
-        _accumulate_for_analysis(state, dev_ts, vals)
-
-        # Keep the detailed sensors object with device time
-        t_s = dev_ts / DEV_TS_UNITS_PER_S
-        state.sensors.append({"t": t_s, "sensors": ins["sensors"]})
+    if not isinstance(batch, np.ndarray):
+        batch = np.array(list(batch), dtype=INSOLE_DTYPE)
+    if not len(batch):
+        return
+    if state.raw_sink is not None:
+        state.raw_sink.append(batch)
+    ts, ch = insole_columns(batch)
+
+    prof = _profile(state)
+    adc = ch.astype(np.intp)
+    analog = adc.tolist()
+    resistance = prof.resistance(adc).tolist()
+    force_arr = prof.force(adc)
+    force = force_arr.tolist()
+    pressure = prof.pressure(adc).tolist()
+    t_arr = ts / DEV_TS_UNITS_PER_S
+    times = t_arr.tolist()
+
+    per_sample = state.schema != SCHEMA_BATCH
+    if not per_sample:
+        if not state.header_written:
+            derived = ("resistance", "force", "pressure") if state.derived else ()
+            writer.append(session_header(side_key, CHANNEL_LABELS, DEV_TS_UNITS_PER_S,
+                                         derived, prof.to_dict(), host_ts))
+            state.header_written = True
+        if state.derived:
+            writer.append(insole_batch_record(side_key, host_ts, ts, analog, resistance=resistance,
+                                              force=force, pressure=pressure))
+        else:
+            writer.append(insole_batch_record(side_key, host_ts, ts, analog))
+
+    if per_sample:
+        for i in range(len(times)):
+            rec = {"timestamp": host_ts, "left_insole": None, "right_insole": None}
+            rec[side_key] = {"sensors": _sensor_dicts(analog[i], resistance[i], force[i], pressure[i])}
+            writer.append(rec)
+
+    # Accumulate analytics (one typed append per batch)
+    state.buffer.append(ts, t_arr, ch, force_arr)
+
+    if state.gait is not None:
+        state.gait.update_batch(times, force)
+    if state.timeline is not None:
+        state.timeline.add_insole(side_key, times, host_ts, analog)
 
 # =========================== Notification Handler ===========================
 
 def make_notify_handler(state: DeviceState):
     """
-    Handles three textual control markers sent by peripheral:
+    Handles three control markers sent by peripheral (see framing.BatchReassembler):
       - "BIN10:<n>" -> expect n*20 bytes of binary payload (<I8H frames)
-      - "BATCH_DONE" -> parse accumulated bytes into frames
+      - "BATCH_DONE" -> decode the reassembled bytes into frames
       - "Done" -> end of session
     Otherwise treats incoming data as raw binary belonging to the current batch.
+    Short/overrun batches are reported and counted on state.framer.
     """
+    tm = telemetry.device(state.side)
+
     def handler(_sender, data: bytearray):
-        try:
-            text = data.decode("utf-8")
-            if text.startswith("BIN10:"):
-                n = int(text.split(":", 1)[1])
-                state.expected_bytes = n * 20
-                state.recv_buf.clear()
-                state.last_batch = []
-                return
-            if text == "BATCH_DONE":
-                if state.expected_bytes and len(state.recv_buf) >= state.expected_bytes:
-                    cnt = state.expected_bytes // 20
-                    state.last_batch = parse_samples(state.recv_buf[:state.expected_bytes], cnt)
-                state.batch_ready.set()
-                return
-            if text == "Done":
-                state.done_event.set()
-                state.batch_ready.set()
-                return
-        except UnicodeDecodeError:
-            # binary chunk
-            pass
-        # Append raw binary to the receive buffer
-        state.recv_buf.extend(data)
+        if tm is not None:
+            tm.notify(len(data))
+        ev = state.framer.feed(data)
+        if ev == BATCH:
+            res = state.framer.last
+            if not res.ok:
+                if tm is not None:
+                    tm.batch_errors.value += 1
+                print(f"[WARN] {state.side}: {res.status} batch "
+                      f"({res.received_bytes}/{res.expected * INSOLE_FRAME_SIZE} bytes)")
+            if state.pipeline is not None:
+                state.pipeline.deliver(BATCH, res.frames)
+        elif ev == DONE:
+            if state.pipeline is not None:
+                state.pipeline.deliver(DONE)
     return handler
 
-# =========================== Pull Worker (host-driven pulls) ===========================
+# =========================== Pull Pipeline (host-driven pulls) ===========================
 
-class PullWorker(threading.Thread):
+def start_pull_pipeline(side: str, client: BleakClient, state: DeviceState,
+                        writer: JSONLinesWriter, queue_size: int = 8,
+                        worker: Optional[Any] = None) -> PullPipeline:
     """
-    Background thread that periodically sends CMD_PULL to fetch the next batch.
-    It waits on state.batch_ready which is signaled by the notify handler when a batch completes.
+    Attach a PullPipeline to `state` and start it: the next CMD_PULL goes out as soon
+    as a batch is reassembled, while emit_batch_json runs in a consumer task
+    (worker thread) fed through a bounded queue. With an offload.InsoleWorker the
+    consumer only hands the raw frames to the worker process (and state.raw_sink).
+    Host timestamps are the batch's receive time, not the time it was consumed.
     """
-    def __init__(self, side: str, client: BleakClient, loop: asyncio.AbstractEventLoop,
-                 state: DeviceState, writer: JSONLinesWriter):
-        super().__init__(daemon=True)
-        self.side = side
-        self.client = client
-        self.loop = loop
-        self.state = state
-        self.writer = writer
-
-    def run(self):
-        while not self.state.done_event.is_set():
-            self.state.batch_ready.clear()
-
-            # Ask the peripheral to send the next batch
-            fut = asyncio.run_coroutine_threadsafe(
-                self.client.write_gatt_char(CMD_CHAR_UUID, CMD_PULL),
-                self.loop
-            )
-            try:
-                fut.result(timeout=2.0)
-            except Exception:
-                time.sleep(0.05)
-                continue
-
-            # Wait until we either got the batch, or timeout to try again
-            if not self.state.batch_ready.wait(timeout=5.0):
-                continue
-
-            if self.state.done_event.is_set():
-                break
-
-            if self.state.last_batch:
-                emit_batch_json(self.writer, self.side, self.state.last_batch, self.state)
+    if worker is not None:
+        consume = worker.consumer(side, state.raw_sink)
+    else:
+        consume = lambda frames, host_ts: emit_batch_json(writer, side, frames, state, host_ts=host_ts)
+    state.pipeline = PullPipeline(
+        side, client, CMD_CHAR_UUID, CMD_PULL,
+        consume=consume,
+        queue_size=queue_size,
+        timestamps=True,
+    )
+    return state.pipeline.start()
 
 # =========================== BLE Helpers ===========================
 
-async def find_and_connect(name_substr: str, state: DeviceState) -> BleakClient:
+async def connect_device(dev, state: DeviceState, label: str) -> BleakClient:
     """
-    Scan for a device whose name contains `name_substr`, connect, and enable notifications.
+    Connect to an already discovered device and enable notifications. A failed or
+    cancelled attempt (e.g. a cached-address timeout) disconnects again.
     """
-    print(f"[SCAN] Looking for '{name_substr}'...")
-    dev = await BleakScanner.find_device_by_filter(
-        lambda d, ad: (d.name is not None) and (name_substr in d.name)
-    )
-    if not dev:
-        raise RuntimeError(f"Device '{name_substr}' not found")
-    print(f"[SCAN] Found: {dev.name} ({dev.address})")
-
     client = BleakClient(dev)
-    await client.connect()
-    print(f"[BLE] Connected to {name_substr}")
-
-    await client.start_notify(DATA_CHAR_UUID, make_notify_handler(state))
-    print(f"[BLE] Notifications enabled for {name_substr}")
+    try:
+        await client.connect()
+        print(f"[BLE] Connected to {label}")
+
+        await client.start_notify(DATA_CHAR_UUID, make_notify_handler(state))
+        print(f"[BLE] Notifications enabled for {label}")
+    except BaseException:
+        await disconnect_quietly(client)
+        raise
     return client
 
+async def find_and_connect(name_substr: str, state: DeviceState, role: Optional[str] = None,
+                           registry: Optional[DeviceRegistry] = None) -> BleakClient:
+    """
+    Connect to the device whose name contains `name_substr` and enable notifications:
+    its cached address first (see registry.py), a scan only if that fails.
+    """
+    async def scan():
+        print(f"[SCAN] Looking for '{name_substr}'...")
+        dev = await BleakScanner.find_device_by_filter(
+            lambda d, ad: (d.name is not None) and (name_substr in d.name)
+        )
+        if dev:
+            print(f"[SCAN] Found: {dev.name} ({dev.address})")
+        return dev
+
+    return await connect_cached(registry or get_registry(), name_substr, role,
+                                lambda dev: connect_device(dev, state, name_substr), scan)
+
 # =========================== Orchestration ===========================
 
-async def run_insoles(writer: JSONLinesWriter, stop_event: asyncio.Event | None = None):
+async def run_insoles(writer: JSONLinesWriter, stop_event: asyncio.Event | None = None,
+                      schema: str = SCHEMA_SAMPLE, derived: bool = True,
+                      raw_sinks: Optional[Dict[str, Any]] = None, live_gait: bool = False,
+                      spill_mb: Optional[float] = DEFAULT_SPILL_MB, spill_dir: Optional[str] = None,
+                      worker_log: Optional[str] = None,
+                      calibration: Optional[Dict[str, Any]] = None):
     """
-    Connect to left insole, start pull worker, start/stop recording, wait for 'Done',
+    Connect to left insole, start the pull pipeline, start/stop recording, wait for 'Done',
     clean up, and return analysis buffers + full per-sample sensor objects.
+    `schema`/`derived` select the log layout (see schema.py); `raw_sinks` maps
+    "left"/"right" to a SessionWriter that also receives the raw frames.
+    `live_gait` runs StreamingGaitDetector during recording and adds its
+    events/temporal metrics under "gait".
+    Analysis columns move to memory-mapped files in `spill_dir` (default: the temp
+    dir) once they pass `spill_mb` (None: never spill).
+    With `worker_log`, calibration, JSON and analytics run in an offload.InsoleWorker
+    process writing insole records to that path (not `writer`); the result then also
+    carries the worker's gait "summary".
+    `calibration` maps "left"/"right" to a CalibrationProfile, an insole serial or a
+    profile JSON path (see calibration.resolve_profile); others use the active profile.
     """
+    raw_sinks = raw_sinks or {}
+    calibration = calibration or {}
     # Connect (sequence)
-    left_state = DeviceState("left_insole")
+    left_state = DeviceState("left_insole", schema=schema, derived=derived,
+                             raw_sink=raw_sinks.get("left"),
+                             gait=StreamingGaitDetector() if live_gait else None,
+                             buffer=make_buffer(spill_mb, spill_dir),
+                             calibration=resolve_profile(calibration.get("left")))
     # right_state = DeviceState("right_insole")  # enable when you wire the right foot
-    left_client = await find_and_connect(LEFT_NAME, left_state)
-    # right_client = await find_and_connect(RIGHT_NAME, right_state)
-
-    loop = asyncio.get_running_loop()
-
-    # Start pullers (parallel)
-    left_worker = PullWorker("left_insole", left_client, loop, left_state, writer)
-    # right_worker = PullWorker("right_insole", right_client, loop, right_state, writer)
-    left_worker.start()
-    # right_worker.start()
+    left_client = await find_and_connect(LEFT_NAME, left_state, "left")
+    # right_client = await find_and_connect(RIGHT_NAME, right_state, "right")
 
-    # Start/Stop (sequence)
-    print("[ACTION] start_r left")
-    await left_client.write_gatt_char(CMD_CHAR_UUID, CMD_START)
-    await asyncio.sleep(0.1)
+    worker = None
+    left_pull = None
+    try:
+        if worker_log is not None:
+            worker = InsoleWorker(worker_log, ["left_insole"], schema=schema, derived=derived,
+                                  live_gait=live_gait, calibration={"left_insole": left_state.calibration},
+                                  spill_mb=spill_mb, spill_dir=spill_dir)
+
+        # Start pullers (parallel)
+        left_pull = start_pull_pipeline("left_insole", left_client, left_state, writer, worker=worker)
+        # right_pull = start_pull_pipeline("right_insole", right_client, right_state, writer)
+
+        # Start/Stop (sequence)
+        print("[ACTION] start_r left")
+        await left_client.write_gatt_char(CMD_CHAR_UUID, CMD_START)
+        await asyncio.sleep(0.1)
 
-    # print("[ACTION] start_r right")
-    # await right_client.write_gatt_char(CMD_CHAR_UUID, CMD_START)
+        # print("[ACTION] start_r right")
+        # await right_client.write_gatt_char(CMD_CHAR_UUID, CMD_START)
 
-    # Wait for external stop, or fall back to input if none given
-    if stop_event is not None:
-        await stop_event.wait()
-    else:
-        input("Recording (insoles). Press ENTER here to stop insoles.\n")
+        # Wait for external stop, or fall back to input if none given
+        if stop_event is not None:
+            await stop_event.wait()
+        else:
+            input("Recording (insoles). Press ENTER here to stop insoles.\n")
 
-    print("[ACTION] stop_r left")
-    await left_client.write_gatt_char(CMD_CHAR_UUID, CMD_STOP)
-    await asyncio.sleep(0.2)
+        print("[ACTION] stop_r left")
+        await left_client.write_gatt_char(CMD_CHAR_UUID, CMD_STOP)
+        await asyncio.sleep(0.2)
 
-    # print("[ACTION] stop_r right")
-    # await right_client.write_gatt_char(CMD_CHAR_UUID, CMD_STOP)
+        # print("[ACTION] stop_r right")
+        # await right_client.write_gatt_char(CMD_CHAR_UUID, CMD_STOP)
 
-    # Wait & cleanup
-    print("[WAIT] Waiting for 'Done' from both insoles...")
-    t0 = time.time()
-    while not left_state.done_event.is_set():
-        await asyncio.sleep(0.1)
-        if time.time() - t0 > 120:
+        # Wait & cleanup
+        print("[WAIT] Waiting for 'Done' from both insoles...")
+        try:
+            # 'Done' received and every queued batch emitted
+            await asyncio.wait_for(left_pull.join(), 120)
+        except asyncio.TimeoutError:
             print("[WARN] Timeout waiting; proceeding.")
-            break
-
-    try:
-        await left_client.stop_notify(DATA_CHAR_UUID)
-        # await right_client.stop_notify(DATA_CHAR_UUID)
+            await left_pull.cancel()
+        print(format_stats(left_pull.stats()))
+    except BaseException:
+        if worker is not None:
+            await asyncio.to_thread(worker.abort)
+        raise
     finally:
-        await left_client.disconnect()
-        # await right_client.disconnect()
+        if left_pull is not None:
+            await left_pull.cancel()        # no-op once joined; stops pulls on any error
+        try:
+            await left_client.stop_notify(DATA_CHAR_UUID)
+            # await right_client.stop_notify(DATA_CHAR_UUID)
+        finally:
+            await left_client.disconnect()
+            # await right_client.disconnect()
+
+    if worker is not None:
+        done = await asyncio.to_thread(worker.close)
+        print(f"[OFFLOAD] {done['worker']}")
+        return {"left": worker_result(done["left_insole"], left_pull)}
 
     # Return analysis buffers + per-sample sensors for each foot (left only for now)
     return {
-        "left": {
-            "t": left_state.times_s,
-            "forces_by_label": left_state.forces_by_label,
-            # list of {"t": float, "sensors":[{"label","analog","resistance","force","pressure"}]}
-            "sensors": left_state.sensors
-        }
-        # "right": {
-        #     "t": right_state.times_s,
-        #     "forces_by_label": right_state.forces_by_label,
-        #     "sensors": right_state.sensors
-        # }
+        "left": insole_result(left_state, left_pull)
+        # "right": insole_result(right_state, right_pull)
+    }
+
+def make_buffer(spill_mb: Optional[float] = DEFAULT_SPILL_MB,
+                spill_dir: Optional[str] = None) -> InsoleBuffer:
+    spill_bytes = int(spill_mb * (1 << 20)) if spill_mb is not None else None
+    return InsoleBuffer(CHANNEL_LABELS, spill_bytes, spill_dir)
+
+def insole_result(state: DeviceState, pull: Optional[PullPipeline] = None) -> Dict[str, Any]:
+    """
+    Analysis views + per-sample sensors for one foot (run_insoles' per-side result).
+    "t" / "dev_ts" / "adc" / "force" are array views over state.buffer (no copies);
+    "forces_by_label" and "sensors" are list-like views building per-sample dicts on
+    access, and metrics.detect_events(res["t"], res["forces_by_label"]) uses the
+    force matrix directly.
+    """
+    buf = state.buffer
+    return {
+        "t": buf.t,
+        "dev_ts": buf.dev_ts,
+        "adc": buf.adc,
+        "force": buf.force,
+        "labels": buf.labels,
+        "forces_by_label": state.forces_by_label,
+        # list of {"t": float, "sensors":[{"label","analog","resistance","force","pressure"}]}
+        "sensors": state.sensors,
+        "buffer": buf.stats(),
+        **({"pull": pull.stats()} if pull is not None else {}),
+        **({"gait": {"events": state.gait.result(), "temporal": state.gait.temporal()}}
+           if state.gait is not None else {})
     }
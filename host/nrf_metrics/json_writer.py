@@ -1,13 +1,199 @@
-import json, threading
+import atexit, contextlib, json, os, queue, threading, time
+from . import telemetry
+
+DURABILITY_MODES = ("none", "flush", "fsync")
+
+_FLUSH = object()
+_CLOSE = object()
 
 class JSONLinesWriter:
-    def __init__(self, path: str):
+    """
+    Long-lived JSONL writer. append() only enqueues; a dedicated thread serializes
+    records and writes them through one open file handle, so BLE notify/pull threads
+    never wait on disk I/O.
+
+    - queue_size: bound of the in-memory queue (records).
+    - on_full: "block" (lossless, append waits for room) or "drop" (count in .dropped).
+    - batch_bytes: pending output is written to the handle once it reaches this size...
+    - sync_interval_ms: ...or at least every N ms, when durability is applied:
+        "none"  -> hand data to the file object only (OS sees it when its buffer fills)
+        "flush" -> flush the file object to the OS
+        "fsync" -> flush and os.fsync()
+
+    Records must not be mutated after append(). Call close() (or use `with`) to drain.
+    """
+    def __init__(self, path: str, queue_size: int = 10000, on_full: str = "block",
+                 batch_bytes: int = 64 * 1024, sync_interval_ms: float = 200.0,
+                 durability: str = "flush"):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {DURABILITY_MODES}")
+        if on_full not in ("block", "drop"):
+            raise ValueError("on_full must be 'block' or 'drop'")
         self.path = path
         self.lock = threading.Lock()
-        open(self.path, "a").close()
+        self.on_full = on_full
+        self.batch_bytes = batch_bytes
+        self.sync_interval_s = sync_interval_ms / 1000.0
+        self.durability = durability
+        self.dropped = 0
+        self.written = 0
+        self.error = None
+        self._closed = False
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._tm = telemetry.writer(os.path.basename(path))   # None unless telemetry is enabled
+        self._file = self._open()
+        self._thread = threading.Thread(target=self._run, name="JSONLinesWriter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---- producer side ----
 
     def append(self, obj: dict):
-        line = json.dumps(obj, separators=(",", ":"))
+        if self._closed:
+            raise ValueError("append() on closed JSONLinesWriter")
+        if self.error is not None:
+            raise self.error
+        if self.on_full == "block":
+            self._put(obj)
+            return
+        try:
+            self._queue.put_nowait(obj)
+        except queue.Full:
+            self.dropped += 1
+            if self._tm is not None:
+                self._tm.dropped.value += 1
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Block until everything appended so far is written and synced per durability.
+        Returns False on timeout; raises the writer thread's error if it has died.
+        """
+        if self._closed:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = threading.Event()
+        self._put((_FLUSH, done))
+        while not done.wait(0.05 if deadline is None else min(0.05, max(0.0, deadline - time.monotonic()))):
+            self._check_alive()
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        if self.error is not None:
+            raise self.error
+        return True
+
+    def _check_alive(self):
+        if self.error is not None:
+            raise self.error
+        if not self._thread.is_alive():
+            raise RuntimeError("JSONLinesWriter thread exited")
+
+    def _put(self, item):
+        # a full queue never drains once the writer thread is gone: don't wait on it forever
+        while True:
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                self._check_alive()
+
+    def close(self):
+        """
+        Drain the queue, write, sync and close the file. Safe to call twice.
+        Raises the writer thread's error if it died.
+        """
         with self.lock:
-            with open(self.path, "a", buffering=1) as f:
-                f.write(line + "\n")
+            if self._closed:
+                return
+            self._closed = True
+        with contextlib.suppress(Exception):    # a dead thread needs no _CLOSE (and can't drain one)
+            if self._thread.is_alive():
+                self._put(_CLOSE)
+        self._thread.join()
+        atexit.unregister(self.close)
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- writer thread ----
+
+    def _open(self):
+        return open(self.path, "a", encoding="utf-8")
+
+    def _encode(self, obj) -> str:
+        return json.dumps(obj, separators=(",", ":")) + "\n"
+
+    def _write(self, pending: list):
+        if pending:
+            data = "".join(pending)
+            self._file.write(data)
+            self.written += len(pending)
+            if self._tm is not None:
+                self._tm.records.value += len(pending)
+                self._tm.bytes.value += len(data)
+            pending.clear()
+
+    def _sync(self, durability: str):
+        if durability in ("flush", "fsync"):
+            self._file.flush()
+        if durability == "fsync":
+            os.fsync(self._file.fileno())
+
+    def _flush_out(self, pending: list):
+        tm = self._tm
+        t0 = time.perf_counter() if tm is not None else 0.0
+        self._write(pending)
+        self._sync(self.durability)
+        if tm is not None:
+            tm.flush.observe(time.perf_counter() - t0)
+            tm.queue_depth.value = self._queue.qsize()
+
+    def _run(self):
+        pending, pending_bytes = [], 0
+        next_sync = time.monotonic() + self.sync_interval_s
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=max(0.0, next_sync - time.monotonic()))
+                except queue.Empty:
+                    item = None
+
+                if item is _CLOSE:
+                    break
+                if isinstance(item, tuple) and item and item[0] is _FLUSH:
+                    self._flush_out(pending); pending_bytes = 0
+                    item[1].set()
+                elif item is not None:
+                    line = self._encode(item)
+                    pending.append(line)
+                    pending_bytes += len(line)
+                    if pending_bytes >= self.batch_bytes:
+                        self._write(pending); pending_bytes = 0
+
+                now = time.monotonic()
+                if now >= next_sync:
+                    self._flush_out(pending); pending_bytes = 0
+                    next_sync = now + self.sync_interval_s
+        except Exception as e:  # surface to the producer on its next append()
+            self.error = e
+        finally:
+            try:
+                self._write(pending)
+                self._sync("fsync" if self.durability == "fsync" else "flush")
+            finally:
+                self._file.close()
+            # release anyone waiting on a flush marker that will never be processed
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, tuple) and item and item[0] is _FLUSH:
+                    item[1].set()
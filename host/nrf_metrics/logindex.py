@@ -0,0 +1,398 @@
+# logindex.py
+"""
+Time-indexed reads of JSONL logs (plain, compressed or segmented; see segments.py)
+and downsampling for plots.
+
+LogIndex maps every line of a log to (timestamp, segment, byte offset in the
+decompressed segment). It is cached next to the log as <log>.tindex.npz and reused
+while the files are unchanged; a plain segment that only grew (log still being
+written) is scanned from where the index stopped. Range reads then parse only the
+lines inside [t0, t1] (plus session headers), skipping whole segments outside it.
+
+    idx = LogIndex.open("day.jsonl")
+    series = extract_series(idx.records(idx.t_min + 60, idx.t_min + 120))
+    keep = downsample(series["imu"]["t"], series["imu"]["ax"], 2000)      # LTTB
+"""
+import json
+import math
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .frames import BALL_FIELDS
+from .schema import BALL_DEVICE, SCHEMA_BATCH, _insole_profile
+from .segments import MANIFEST_SUFFIX, open_binary, segment_files
+
+INDEX_SUFFIX = ".tindex.npz"
+INDEX_VERSION = 1
+IMU_FIELDS = ("ax", "ay", "az", "gx", "gy", "gz")
+
+# host time is the first key of every record we write ({"timestamp": ...} / {"ts": ...})
+_LEADING_TS = re.compile(rb'\{\s*"(?:timestamp|ts)"\s*:\s*(-?[0-9][0-9.eE+-]*)')
+_COMPRESSED = (".gz", ".xz", ".lzma", ".zz")
+
+def index_path(path: str) -> str:
+    base = path[:-len(MANIFEST_SUFFIX)] if path.endswith(MANIFEST_SUFFIX) else path
+    return base + INDEX_SUFFIX
+
+def _line_info(line: bytes) -> Tuple[float, bool]:
+    """(host timestamp or NaN, is session header) of one JSONL line."""
+    m = _LEADING_TS.match(line)
+    if m:
+        try:
+            return float(m.group(1)), b'"session":' in line
+        except ValueError:
+            pass
+    try:
+        obj = json.loads(line)
+    except ValueError:
+        return math.nan, False
+    if not isinstance(obj, dict):
+        return math.nan, False
+    ts = obj.get("timestamp", obj.get("ts"))
+    return (float(ts) if isinstance(ts, (int, float)) else math.nan), "session" in obj
+
+def _skip_to(f, offset: int):
+    try:
+        f.seek(offset)
+    except (OSError, ValueError):   # non-seekable stream (zlib segments): read forward
+        left = offset
+        while left > 0:
+            chunk = f.read(min(left, 1 << 20))
+            if not chunk:
+                break
+            left -= len(chunk)
+
+def _scan(path: str, start: int = 0):
+    """Index the complete lines of one file from byte `start`; returns (t, off, hdr, end)."""
+    t: List[float] = []
+    off: List[int] = []
+    hdr: List[bool] = []
+    pos = start
+    with open_binary(path) as f:
+        if start:
+            _skip_to(f, start)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break                   # partial line still being written
+            ts, is_hdr = _line_info(line)
+            t.append(ts); off.append(pos); hdr.append(is_hdr)
+            pos += len(line)
+    return t, off, hdr, pos
+
+def _signature(path: str) -> List[Any]:
+    st = os.stat(path)
+    return [os.path.basename(path), st.st_size, st.st_mtime_ns]
+
+# =========================== Index ===========================
+
+class LogIndex:
+    """
+    Per-line (t, seg, off, header) arrays for a log; `files` are the segment paths and
+    `sigs` their [name, size, mtime_ns] when indexed. Lines without a top-level
+    timestamp get t = NaN and are only read as headers.
+    """
+    def __init__(self, path: str, files: List[str], t: np.ndarray, seg: np.ndarray,
+                 off: np.ndarray, header: np.ndarray, ends: List[int], sigs: List[List[Any]]):
+        self.path = path
+        self.files = files
+        self.t = t
+        self.seg = seg
+        self.off = off
+        self.header = header
+        self.ends = ends            # decompressed bytes indexed per segment
+        self.sigs = sigs
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    @property
+    def t_min(self) -> float:
+        return float(np.nanmin(self.t)) if np.isfinite(self.t).any() else math.nan
+
+    @property
+    def t_max(self) -> float:
+        return float(np.nanmax(self.t)) if np.isfinite(self.t).any() else math.nan
+
+    @classmethod
+    def open(cls, path: str, cache: bool = True) -> "LogIndex":
+        """Load the cached index (refreshing it if the log changed) or build it."""
+        files = segment_files(path)
+        old = cls._load(path) if cache else None
+        idx = cls._build(path, files, old)
+        if cache and (old is None or idx._meta() != old._meta()):
+            idx.save()
+        return idx
+
+    @classmethod
+    def _build(cls, path: str, files: List[str], old: Optional["LogIndex"]) -> "LogIndex":
+        prev = {}
+        if old is not None:
+            for k, (name, size, mtime) in enumerate(old.sigs):
+                rows = old.seg == k
+                prev[name] = (size, mtime, old.ends[k], old.t[rows], old.off[rows], old.header[rows])
+        ts, offs, hdrs, segs, ends, sigs = [], [], [], [], [], []
+        for k, f in enumerate(files):
+            sig = _signature(f)
+            hit = prev.get(sig[0])
+            if hit and hit[:2] == tuple(sig[1:]):
+                t, off, hdr, end = hit[3], hit[4], hit[5], hit[2]
+            elif hit and not f.endswith(_COMPRESSED) and sig[1] > hit[0]:
+                # appended since last time: scan only the new tail
+                t2, off2, hdr2, end = _scan(f, hit[2])
+                t = np.concatenate([hit[3], t2]); off = np.concatenate([hit[4], off2])
+                hdr = np.concatenate([hit[5], hdr2])
+            else:
+                t, off, hdr, end = _scan(f)
+            ts.append(np.asarray(t, dtype=np.float64))
+            offs.append(np.asarray(off, dtype=np.int64))
+            hdrs.append(np.asarray(hdr, dtype=bool))
+            segs.append(np.full(len(ts[-1]), k, dtype=np.int32))
+            ends.append(int(end))
+            sigs.append(sig)
+        cat = lambda parts, dt: np.concatenate(parts) if parts else np.empty(0, dtype=dt)
+        return cls(path, files, cat(ts, np.float64), cat(segs, np.int32), cat(offs, np.int64),
+                   cat(hdrs, bool), ends, sigs)
+
+    def _meta(self) -> Dict[str, Any]:
+        return {"version": INDEX_VERSION, "files": self.sigs, "ends": self.ends}
+
+    def save(self) -> bool:
+        """Write the sidecar index (best effort: False if the directory is read-only)."""
+        dst = index_path(self.path)
+        tmp = dst + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, t=self.t, seg=self.seg, off=self.off, header=self.header,
+                         meta=np.array(json.dumps(self._meta())))
+            os.replace(tmp, dst)
+            return True
+        except OSError:
+            return False
+
+    @classmethod
+    def _load(cls, path: str) -> Optional["LogIndex"]:
+        try:
+            with np.load(index_path(path), allow_pickle=False) as z:
+                meta = json.loads(str(z["meta"]))
+                if meta.get("version") != INDEX_VERSION:
+                    return None
+                return cls(path, [], z["t"], z["seg"], z["off"], z["header"], meta["ends"],
+                           meta["files"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    # ---- range reads ----
+
+    def select(self, t0: Optional[float] = None, t1: Optional[float] = None,
+               headers: bool = True) -> np.ndarray:
+        """Row numbers of the lines in [t0, t1] (plus earlier session headers), in file order."""
+        keep = np.isfinite(self.t)
+        if t0 is not None:
+            keep &= self.t >= t0
+        if t1 is not None:
+            keep &= self.t <= t1
+        rows = np.flatnonzero(keep)
+        if headers and len(rows):
+            hdr = np.flatnonzero(self.header[:rows[-1] + 1])
+            rows = np.union1d(rows, hdr)
+        return rows
+
+    def lines(self, t0: Optional[float] = None, t1: Optional[float] = None,
+              headers: bool = True) -> Iterator[bytes]:
+        """Raw lines in [t0, t1]; each segment is read once, from its first wanted offset."""
+        rows = self.select(t0, t1, headers)
+        for k in np.unique(self.seg[rows]).tolist():
+            want = self.off[rows[self.seg[rows] == k]]
+            i, last = 0, want[-1]
+            with open_binary(self.files[k]) as f:
+                pos = int(want[0])
+                _skip_to(f, pos)
+                for line in f:
+                    if pos == want[i]:
+                        yield line
+                        i += 1
+                    if pos >= last:
+                        break
+                    pos += len(line)
+
+    def records(self, t0: Optional[float] = None, t1: Optional[float] = None,
+                headers: bool = True) -> Iterator[Dict[str, Any]]:
+        for line in self.lines(t0, t1, headers):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+# =========================== Series ===========================
+
+class _Stream:
+    def __init__(self):
+        self.t: List[np.ndarray] = []
+        self.cols: Dict[str, List[np.ndarray]] = {}
+        self.row_t: List[float] = []               # single-sample records, batched at the end
+        self.rows: Dict[str, list] = {}
+
+    def add(self, t, **cols):
+        self._flush_rows()
+        self.t.append(np.asarray(t, dtype=np.float64))
+        for k, v in cols.items():
+            self.cols.setdefault(k, []).append(np.asarray(v, dtype=np.float64))
+
+    def add_row(self, t: float, **values):
+        self.row_t.append(t)
+        for k, v in values.items():
+            self.rows.setdefault(k, []).append(v)
+
+    def _flush_rows(self):
+        if self.row_t:
+            t, rows = self.row_t, self.rows
+            self.row_t, self.rows = [], {}
+            self.add(t, **rows)
+
+    def finish(self) -> Dict[str, np.ndarray]:
+        self._flush_rows()
+        t = np.concatenate(self.t)
+        order = np.argsort(t, kind="stable")
+        out = {"t": t[order]}
+        for k, parts in self.cols.items():
+            out[k] = np.concatenate(parts)[order]
+        return out
+
+def extract_series(records: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Numeric series per stream from any mix of records we log, sorted by host time:
+      "imu"          {"t", "ax".."gz"}     client 0x10 / 0x11 records (packed samples are
+                                           placed back from the arrival time by dt_us)
+      "left_insole"  {"t", "force" (N, 8), "labels"}   sample or batch schema; batch
+                                           records add "dev_t" (device seconds)
+      "right_insole" ...
+      "ball"         {"t", "ax".."gz"}     frames spread over the gap since the previous
+                                           ball record (the ball sends no per-frame time)
+    """
+    streams: Dict[str, _Stream] = {}
+    labels: Dict[str, List[str]] = {}
+    headers: Dict[str, dict] = {}
+    profiles: Dict[str, Any] = {}
+    last_ball: Optional[float] = None
+
+    def stream(name) -> _Stream:
+        return streams.setdefault(name, _Stream())
+
+    def add_ball(ts, rows):
+        nonlocal last_ball
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+        n = len(rows)
+        if not n:
+            return
+        t0 = ts if last_ball is None or last_ball >= ts else last_ball
+        t = np.linspace(t0, ts, n + 1)[1:] if t0 < ts else np.full(n, ts)
+        stream("ball").add(t, **{f: rows[:, j] for j, f in enumerate(BALL_FIELDS)})
+        last_ball = ts
+
+    for rec in records:
+        ts = rec.get("timestamp", rec.get("ts"))
+        sess = rec.get("session")
+        if isinstance(sess, dict) and sess.get("schema") == SCHEMA_BATCH:
+            headers[sess["device"]] = sess
+            profiles.pop(sess["device"], None)
+            continue
+        if not isinstance(ts, (int, float)):
+            continue
+        op = rec.get("op")
+        if op == "imu_raw":
+            stream("imu").add_row(ts, **{f: rec[f] for f in IMU_FIELDS})
+        elif op == "imu_packed":
+            n, dt = len(rec["samples"]), (rec.get("dt_us") or 0) / 1e6
+            rows = np.array([[s[f] for f in IMU_FIELDS] for s in rec["samples"]], dtype=np.float64)
+            stream("imu").add(ts - dt * np.arange(n - 1, -1, -1),
+                              **{f: rows[:, j] for j, f in enumerate(IMU_FIELDS)})
+        elif "dev_ts" in rec and "device" in rec:                       # insole batch schema
+            dev = rec["device"]
+            hdr = headers.get(dev, {})
+            if "force" in rec:
+                force = np.asarray(rec["force"], dtype=np.float64)
+            else:
+                if dev not in profiles:
+                    profiles[dev] = _insole_profile(hdr)
+                force = profiles[dev].force(np.asarray(rec["analog"], dtype=np.intp))
+            dev_ts = np.asarray(rec["dev_ts"], dtype=np.float64)
+            units = hdr.get("units_per_s")
+            if units and len(dev_ts):
+                t, dev_t = ts - (dev_ts[-1] - dev_ts) / units, dev_ts / units
+            else:
+                t, dev_t = np.full(len(dev_ts), ts), np.full(len(dev_ts), math.nan)
+            stream(dev).add(t, force=force.reshape(len(dev_ts), -1), dev_t=dev_t)
+            if hdr.get("labels"):
+                labels[dev] = hdr["labels"]
+        elif rec.get("device") == BALL_DEVICE and "frames" in rec:      # ball batch schema
+            add_ball(ts, rec["frames"])
+        elif isinstance(rec.get("ball"), dict):                         # ball sample schema
+            add_ball(ts, [[r[f] for f in BALL_FIELDS] for r in rec["ball"].get("records", [])])
+        else:                                                           # insole sample schema
+            for dev in ("left_insole", "right_insole"):
+                ins = rec.get(dev)
+                if isinstance(ins, dict) and ins.get("sensors"):
+                    sensors = ins["sensors"]
+                    stream(dev).add_row(ts, force=[s["force"] for s in sensors])
+                    labels.setdefault(dev, [s["label"] for s in sensors])
+
+    out: Dict[str, Dict[str, Any]] = {}
+    for name, st in streams.items():
+        out[name] = st.finish()
+        if name in labels:
+            out[name]["labels"] = labels[name]
+    return out
+
+# =========================== Downsampling ===========================
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `n` points (first and last included)
+    that keep the visual shape of y(x). x must be sorted.
+    """
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)   # n - 2 inner buckets
+    out = np.empty(n, dtype=np.int64)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        if i < n - 3:
+            nlo, nhi = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+            cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (cy - ay))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+def minmax(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the min and max of y in each of n // 2 equal-count buckets (sorted, unique)."""
+    size = len(y)
+    if n >= size or n < 2:
+        return np.arange(size)
+    y = np.asarray(y)
+    edges = np.linspace(0, size, n // 2 + 1).astype(np.int64)
+    keep = [0, size - 1]
+    for lo, hi in zip(edges[:-1].tolist(), edges[1:].tolist()):
+        if hi > lo:
+            seg = y[lo:hi]
+            keep += [lo + int(np.argmin(seg)), lo + int(np.argmax(seg))]
+    return np.unique(keep)
+
+def downsample(x: np.ndarray, y: np.ndarray, n: int, method: str = "lttb") -> np.ndarray:
+    """Indices into x / y to plot: method "lttb" or "minmax"."""
+    if method == "lttb":
+        return lttb(x, y, n)
+    if method == "minmax":
+        return minmax(x, y, n)
+    raise ValueError("method must be 'lttb' or 'minmax'")
@@ -1,100 +1,154 @@
 # metrics.py
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Sequence
+import numpy as np
+from .buffers import force_rows
 from .config import BODY_WEIGHT_N, FORCE_THRESHOLD_RATIO, SENSOR_POS_M, HEEL_LABELS, TOE_LABELS, MID_LABELS, BALL_LABELS
 
-def _total_force(f_by_label: Dict[str, float]) -> float:
-    return sum(f_by_label.values())
+# =========================== Array Engine ===========================
+# t: (N,) seconds, F: (N, C) forces in newtons with columns in `labels` order.
+# Column sums are accumulated left to right (COP terms in SENSOR_POS_M order), the order
+# the old per-sample dict sums used, so the adapters below return exactly what they did.
 
-def _cop_xy(f_by_label: Dict[str, float]) -> Tuple[float, float]:
-    # Center of Pressure (x,y) in meters (weighted by force)
-    sF = _total_force(f_by_label)
-    if sF <= 0.0: return (0.0, 0.0)
-    sx = sum(f_by_label.get(lbl,0.0) * SENSOR_POS_M[lbl][0] for lbl in SENSOR_POS_M)
-    sy = sum(f_by_label.get(lbl,0.0) * SENSOR_POS_M[lbl][1] for lbl in SENSOR_POS_M)
-    return (sx/sF, sy/sF)
+REGIONS = {"heel": HEEL_LABELS, "toe": TOE_LABELS, "mid": MID_LABELS, "ball": BALL_LABELS}
 
-def _subset_force(f_by_label: Dict[str, float], subset: set) -> float:
-    return sum(v for k, v in f_by_label.items() if k in subset)
+def forces_matrix(forces_series: List[Dict[str, float]],
+                  labels: Optional[Sequence[str]] = None) -> Tuple[np.ndarray, List[str]]:
+    """
+    (N, C) matrix from a list of {label: force} dicts (labels default to the first dict's order).
+    A buffers.ForcesView (what run_insoles returns) hands over its matrix without copying.
+    """
+    cols = force_rows(forces_series, labels)
+    if cols is not None:
+        return cols
+    if labels is None:
+        labels = list(forces_series[0].keys()) if forces_series else []
+    labels = list(labels)
+    F = np.array([[f.get(l, 0.0) for l in labels] for f in forces_series], dtype=np.float64)
+    return F.reshape(len(forces_series), len(labels)), labels
+
+def _column_sum(F: np.ndarray, cols: Sequence[int], weights: Optional[Sequence[float]] = None) -> np.ndarray:
+    out = np.zeros(F.shape[0])
+    for k, c in enumerate(cols):
+        out += F[:, c] if weights is None else F[:, c] * weights[k]
+    return out
+
+def total_force_array(F: np.ndarray) -> np.ndarray:
+    return _column_sum(F, range(F.shape[1]))
+
+def subset_force_array(F: np.ndarray, labels: Sequence[str], subset: set) -> np.ndarray:
+    return _column_sum(F, [i for i, l in enumerate(labels) if l in subset])
+
+def region_forces_array(F: np.ndarray, labels: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Heel / toe / mid / ball subset forces, each (N,)."""
+    return {name: subset_force_array(F, labels, subset) for name, subset in REGIONS.items()}
+
+def cop_array(F: np.ndarray, labels: Sequence[str],
+              Ft: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Center of pressure (x, y) in meters per sample; (0, 0) where total force <= 0."""
+    if Ft is None:
+        Ft = total_force_array(F)
+    terms = [(labels.index(l), pos) for l, pos in SENSOR_POS_M.items() if l in labels]
+    sx = _column_sum(F, [c for c, _ in terms], [p[0] for _, p in terms])
+    sy = _column_sum(F, [c for c, _ in terms], [p[1] for _, p in terms])
+    loaded = Ft > 0.0
+    x = np.divide(sx, Ft, out=np.zeros_like(sx), where=loaded)
+    y = np.divide(sy, Ft, out=np.zeros_like(sy), where=loaded)
+    return x, y
+
+def auto_threshold(Ft: np.ndarray, thr_ratio: float = FORCE_THRESHOLD_RATIO) -> float:
+    """thr_ratio * median of the top decile of Ft (O(N) selection instead of a full sort)."""
+    n = len(Ft)
+    if n == 0:
+        return 0.0
+    k = max(0, int(0.9 * n))
+    idx = k + (n - k) // 2
+    return float(thr_ratio * np.partition(Ft, idx)[idx])
+
+def crossings(Ft: np.ndarray, thr: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    HS = upward crossings (Ft[i-1] < thr <= Ft[i]); TO = downward crossings after the first
+    HS (a session that starts loaded has no stance to close until a HS is seen).
+    """
+    above = Ft >= thr
+    up = np.flatnonzero(~above[:-1] & above[1:]) + 1
+    down = np.flatnonzero(above[:-1] & ~above[1:]) + 1
+    if len(up) == 0:
+        return up, down[:0]
+    return up, down[down > up[0]]
+
+def pair_stance_swing(HS: np.ndarray, TO: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """stance = (HS, first TO after it); swing = (that TO, first HS after it). Shapes (K, 2)."""
+    j = np.searchsorted(TO, HS, side="left")
+    ok = j < len(TO)
+    stance = np.stack([HS[ok], TO[j[ok]]], axis=1) if ok.any() else np.empty((0, 2), dtype=np.intp)
+    nxt = np.searchsorted(HS, stance[:, 1], side="right")
+    ok2 = nxt < len(HS)
+    swing = np.stack([stance[ok2, 1], HS[nxt[ok2]]], axis=1) if ok2.any() else np.empty((0, 2), dtype=np.intp)
+    return stance, swing
+
+def detect_events_array(t: np.ndarray, F: np.ndarray, labels: Sequence[str],
+                        body_weight_N: Optional[float] = BODY_WEIGHT_N,
+                        thr_ratio: float = FORCE_THRESHOLD_RATIO) -> Dict[str, np.ndarray]:
+    """
+    Array version of detect_events. Returns HS, TO (index arrays), stance, swing ((K, 2)
+    index arrays), Ft, COP x/y arrays, region forces and the threshold.
+    """
+    labels = list(labels)
+    Ft = total_force_array(F)
+    if body_weight_N and body_weight_N > 0:
+        thr = thr_ratio * body_weight_N
+    else:
+        thr = auto_threshold(Ft, thr_ratio)
+    HS, TO = crossings(Ft, thr)
+    stance, swing = pair_stance_swing(HS, TO)
+    cop_x, cop_y = cop_array(F, labels, Ft)
+    return {"HS": HS, "TO": TO, "stance": stance, "swing": swing, "Ft": Ft,
+            "cop_x": cop_x, "cop_y": cop_y, "regions": region_forces_array(F, labels),
+            "threshold": thr}
+
+def temporal_metrics_array(t: np.ndarray, HS: np.ndarray, TO: np.ndarray,
+                           stance: np.ndarray) -> Dict[str, np.ndarray]:
+    """Array version of temporal_metrics: CT, FT, stride arrays + stride_freq."""
+    t = np.asarray(t, dtype=np.float64)
+    HS = np.asarray(HS, dtype=np.intp)
+    TO = np.asarray(TO, dtype=np.intp)
+    stance = np.asarray(stance, dtype=np.intp).reshape(-1, 2)
+    CT = t[stance[:, 1]] - t[stance[:, 0]]
+    prev_to = np.searchsorted(TO, HS[1:], side="left") - 1
+    ok = prev_to >= 0
+    FT = t[HS[1:][ok]] - t[TO[prev_to[ok]]]
+    stride = t[HS[1:]] - t[HS[:-1]]
+    stride_l = stride.tolist()
+    stride_freq = (1.0 / (sum(stride_l) / len(stride_l))) if stride_l else 0.0
+    return {"CT": CT, "FT": FT, "stride": stride, "stride_freq": stride_freq}
+
+# =========================== List-of-dicts Adapters ===========================
 
 def detect_events(times_s: List[float], forces_series: List[Dict[str, float]],
                   body_weight_N: Optional[float]=BODY_WEIGHT_N,
                   thr_ratio: float=FORCE_THRESHOLD_RATIO):
     """
     Returns dict with HS indices, TO indices, stance & swing windows, COP path.
+    Adapter over detect_events_array().
     """
-    if not times_s or not forces_series: 
+    if not len(times_s) or not len(forces_series):
         return {"HS":[], "TO":[], "stance":[], "swing":[], "COP": []}
 
-    # total force curve
-    Ft = [ _total_force(f) for f in forces_series ]
-
-    # threshold
-    if body_weight_N and body_weight_N > 0:
-        thr = thr_ratio * body_weight_N
-    else:
-        # auto: 5% of median of top decile
-        top = sorted(Ft)[max(0,int(0.9*len(Ft))):]
-        ref = top[len(top)//2] if top else (max(Ft) if Ft else 0.0)
-        thr = thr_ratio * ref
-
-    HS, TO = [], []
-    above = False
-    for i in range(1, len(Ft)):
-        if not above and Ft[i-1] < thr <= Ft[i]:
-            HS.append(i)
-            above = True
-        elif above and Ft[i-1] >= thr > Ft[i]:
-            TO.append(i)
-            above = False
-
-    # pair into stance/swing
-    stance, swing = [], []
-    ti = 0
-    for hs in HS:
-        # find the first TO after this HS
-        while ti < len(TO) and TO[ti] < hs:
-            ti += 1
-        if ti < len(TO):
-            stance.append((hs, TO[ti]))
-            # swing: TO -> next HS (if any)
-            nxt_hs_idx = None
-            for h2 in HS:
-                if h2 > TO[ti]:
-                    nxt_hs_idx = h2; break
-            if nxt_hs_idx is not None:
-                swing.append((TO[ti], nxt_hs_idx))
-            ti += 1
+    F, labels = forces_matrix(forces_series)
+    t = np.asarray(times_s, dtype=np.float64)
+    ev = detect_events_array(t, F, labels, body_weight_N, thr_ratio)
 
     # COP path (for plotting/analysis)
-    COP = []
-    for t, f in zip(times_s, forces_series):
-        x,y = _cop_xy(f)
-        COP.append({"t": t, "x": x, "y": y})
-
-    # heel-vs-forefoot ordering (optional: first peak comparison)
-    # You can add diagnostics here using _subset_force() over windows around HS.
+    COP = [{"t": ts, "x": x, "y": y}
+           for ts, x, y in zip(t.tolist(), ev["cop_x"].tolist(), ev["cop_y"].tolist())]
 
-    return {"HS":HS, "TO":TO, "stance":stance, "swing":swing, "COP":COP, "threshold":thr}
+    return {"HS": ev["HS"].tolist(), "TO": ev["TO"].tolist(),
+            "stance": [tuple(p) for p in ev["stance"].tolist()],
+            "swing": [tuple(p) for p in ev["swing"].tolist()],
+            "COP": COP, "threshold": ev["threshold"]}
 
 def temporal_metrics(times_s: List[float], HS: List[int], TO: List[int], stance: List[Tuple[int,int]]):
-    # Contact Time (CT)
-    CT = [ times_s[to]-times_s[hs] for (hs,to) in stance ]
-
-    # Flight Time (FT): TO_prev -> HS_next (same foot)
-    FT = []
-    for i in range(1, len(HS)):
-        # find TO just before this HS
-        to_prev = None
-        for to in reversed(TO):
-            if to < HS[i]:
-                to_prev = to; break
-        if to_prev is not None:
-            FT.append(times_s[HS[i]] - times_s[to_prev])
-
-    # Stride duration (HS_i -> HS_{i+1})
-    stride = [ times_s[HS[i+1]] - times_s[HS[i]] for i in range(len(HS)-1) ]
-
-    # Frequency
-    stride_freq = (1.0 / (sum(stride)/len(stride))) if stride else 0.0
-
-    return {"CT":CT, "FT":FT, "stride":stride, "stride_freq":stride_freq}
+    """Contact/flight/stride times and stride frequency. Adapter over temporal_metrics_array()."""
+    m = temporal_metrics_array(times_s, HS, TO, stance)
+    return {"CT": m["CT"].tolist(), "FT": m["FT"].tolist(), "stride": m["stride"].tolist(),
+            "stride_freq": m["stride_freq"]}
@@ -0,0 +1,329 @@
+# offload.py
+"""
+Worker-process mode for insole recordings.
+
+In the default mode every insole batch is calibrated, serialized to JSON and fed to
+the analysis buffers / live gait detector inside the recording process, where it
+competes for the GIL with the asyncio loop servicing BLE. With an InsoleWorker the
+recording process only reassembles batches and copies the raw <I8H frames into a
+shared-memory ring; a separate process does calibration, JSON (to its own log),
+the analysis columns, live gait and the end-of-session gait summary.
+
+    worker = InsoleWorker("insoles.jsonl", ["left_insole"], schema=SCHEMA_BATCH)
+    pipeline consume = worker.consumer("left_insole")     # what start_pull_pipeline does
+    ...
+    results = worker.close()      # {side: {"t", "dev_ts", "adc", "force", "summary", ...}}
+
+The worker is a spawned process (no fork of the recording process and its BLE
+stack). Its sample columns come back as .npy files memory mapped by the parent,
+so a session that spilled its buffers to disk is never copied through the pipe.
+
+run_insoles / run_session take `worker_log=path` to record this way. Insole records
+then go to that file (written by the worker) instead of the session writer; ball
+records and raw session files are unchanged.
+
+Ring layout (ShmRing): a 64-byte header with the producer's head and the consumer's
+tail byte counters, then `capacity` bytes of 8-aligned messages, each
+<u32 length><u32 tag> + payload. A message that doesn't fit before the end of the
+buffer is preceded by a WRAP marker and starts again at offset 0. One producer
+(calls serialized by a lock) and one consumer; a semaphore counts messages, and a
+full ring blocks the producer (the pull pipeline's consumer thread, never the
+event loop) until the worker catches up, or raises once the worker has exited.
+"""
+import contextlib
+import multiprocessing as mp
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .frames import INSOLE_DTYPE
+from .schema import SCHEMA_SAMPLE
+
+_HDR = 64
+_MSG = struct.Struct("<II")
+_WRAP = 0xFFFFFFFF
+_END_TAG = 0xFFFFFFFF
+_HOST_TS = struct.Struct("<d")
+_COLUMNS = ("t", "dev_ts", "adc", "force")     # returned as files, not through the pipe
+_MP = mp.get_context("spawn")
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
+
+# =========================== Shared-memory Ring ===========================
+
+class ShmRing:
+    """Single-producer / single-consumer message ring over multiprocessing.shared_memory."""
+    def __init__(self, capacity: int, items=None, name: Optional[str] = None):
+        self.capacity = _align8(capacity)
+        self.items = items if items is not None else mp.Semaphore(0)
+        self._owner = name is None
+        if self._owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=_HDR + self.capacity)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._ctr = np.ndarray((2,), dtype=np.uint64, buffer=self.shm.buf)   # head, tail
+        if self._owner:
+            self._ctr[:] = 0
+        self._data = self.shm.buf[_HDR:_HDR + self.capacity]
+        self.stalls = 0            # puts that had to wait for room
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def attach_args(self):
+        """Arguments for ShmRing(...) in the other process."""
+        return self.capacity, self.items, self.shm.name
+
+    def used(self) -> int:
+        return int(self._ctr[0] - self._ctr[1])
+
+    # ---- producer ----
+
+    def put(self, tag: int, *parts: bytes, timeout: Optional[float] = None,
+            alive: Optional[Callable[[], bool]] = None) -> None:
+        """
+        Append one message. While the ring is full, waits up to `timeout` (TimeoutError)
+        and polls `alive` (RuntimeError once it returns False: nobody will make room).
+        """
+        size = sum(len(p) for p in parts)
+        need = _MSG.size + _align8(size)
+        if need > self.capacity:
+            raise ValueError(f"message of {size} bytes does not fit a {self.capacity}-byte ring")
+        head = int(self._ctr[0])
+        pos = head % self.capacity
+        contig = self.capacity - pos
+        total = need if need <= contig else contig + need
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self.capacity - (head - int(self._ctr[1])) < total:
+            self.stalls += 1
+            while self.capacity - (head - int(self._ctr[1])) < total:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError("shared-memory ring full")
+                if alive is not None and not alive():
+                    raise RuntimeError("shared-memory ring consumer exited")
+                time.sleep(0.0005)
+        if need > contig:
+            _MSG.pack_into(self._data, pos, _WRAP, 0)
+            pos = 0
+        _MSG.pack_into(self._data, pos, size, tag)
+        off = pos + _MSG.size
+        for p in parts:
+            self._data[off:off + len(p)] = p
+            off += len(p)
+        self._ctr[0] = head + total
+        self.items.release()
+
+    # ---- consumer ----
+
+    def get(self, timeout: Optional[float] = None):
+        """(tag, payload bytes), or None on timeout."""
+        if not self.items.acquire(timeout=timeout):
+            return None
+        tail = int(self._ctr[1])
+        pos = tail % self.capacity
+        size, tag = _MSG.unpack_from(self._data, pos)
+        if size == _WRAP:
+            tail += self.capacity - pos
+            pos = 0
+            size, tag = _MSG.unpack_from(self._data, 0)
+        payload = bytes(self._data[pos + _MSG.size:pos + _MSG.size + size])
+        self._ctr[1] = tail + _MSG.size + _align8(size)
+        return tag, payload
+
+    def close(self) -> None:
+        self._ctr = None
+        self._data.release()
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+# =========================== Worker Process ===========================
+
+def _save_column(directory: str, side: str, key: str, data: np.ndarray) -> str:
+    path = os.path.join(directory, f"{side}.{key}.npy")
+    np.save(path, data)
+    return path
+
+def _load_column(path: str) -> np.ndarray:
+    """Map a column the worker saved (copy-on-write) and drop the file once mapped."""
+    data = np.load(path, mmap_mode="c")
+    with contextlib.suppress(OSError):       # Windows: no removing a mapped file; rmtree tries later
+        os.remove(path)
+    return data
+
+def _worker_main(ring_args, conn, cfg: Dict[str, Any]) -> None:
+    from . import insole
+    from .analyze import gait_row
+    from .calibration import CalibrationProfile
+    from .gait_stream import StreamingGaitDetector
+    from .segments import open_writer
+
+    ring = ShmRing(*ring_args)
+    sides: List[str] = cfg["sides"]
+    out: Dict[str, Any] = {}
+    try:
+        states = [insole.DeviceState(
+            side, schema=cfg["schema"], derived=cfg["derived"],
+            calibration=CalibrationProfile.from_dict(cfg["calibration"][side]),
+            gait=StreamingGaitDetector() if cfg["live_gait"] else None,
+            buffer=insole.make_buffer(cfg["spill_mb"], cfg["spill_dir"])) for side in sides]
+        batches = 0
+        t_busy = 0.0
+        with open_writer(cfg["path"], **cfg["log_opts"]) as writer:
+            while True:
+                tag, payload = ring.get()
+                if tag == _END_TAG:
+                    break
+                t0 = time.perf_counter()
+                (host_ts,) = _HOST_TS.unpack_from(payload)
+                frames = np.frombuffer(payload, dtype=INSOLE_DTYPE, offset=_HOST_TS.size)
+                insole.emit_batch_json(writer, sides[tag], frames, states[tag], host_ts=host_ts)
+                batches += 1
+                t_busy += time.perf_counter() - t0
+        for st in states:
+            buf = st.buffer
+            res = {key: _save_column(cfg["result_dir"], st.side, key, getattr(buf, key))
+                   for key in _COLUMNS}
+            res.update(labels=buf.labels, buffer=buf.stats(),
+                       summary=gait_row(st.side.split("_")[0], buf.t, buf.force, buf.labels)
+                       if len(buf) else {})
+            if st.gait is not None:
+                res["gait"] = {"events": st.gait.result(), "temporal": st.gait.temporal()}
+            out[st.side] = res
+            buf.close()
+        out["worker"] = {"batches": batches, "busy_s": t_busy}
+    except BaseException as e:
+        out = {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        conn.send(out)
+        conn.close()
+        ring.close()
+
+class InsoleWorker:
+    """
+    Insole calibration / serialization / analytics in a child process, fed raw frames
+    through a ShmRing. `calibration` maps side -> CalibrationProfile (default: the
+    active profile); `log_opts` go to segments.open_writer for the worker's log.
+    The result columns are handed back as files under `spill_dir` (default: the
+    system temp directory).
+    """
+    def __init__(self, path: str, sides: Sequence[str], schema: str = SCHEMA_SAMPLE, derived: bool = True,
+                 live_gait: bool = False, calibration: Optional[Dict[str, Any]] = None,
+                 log_opts: Optional[Dict[str, Any]] = None, ring_mb: float = 8.0,
+                 spill_mb: Optional[float] = None, spill_dir: Optional[str] = None):
+        from .buffers import DEFAULT_SPILL_MB
+        from .calibration import get_active_profile
+        calibration = calibration or {}
+        self.path = path
+        self.sides = list(sides)
+        self._ids = {side: i for i, side in enumerate(self.sides)}
+        self.result_dir = tempfile.mkdtemp(prefix="nrfworker-", dir=spill_dir)
+        cfg = {
+            "path": path, "sides": self.sides, "schema": schema, "derived": derived,
+            "live_gait": live_gait, "log_opts": dict(log_opts or {}),
+            "calibration": {s: (calibration.get(s) or get_active_profile()).to_dict() for s in self.sides},
+            "spill_mb": DEFAULT_SPILL_MB if spill_mb is None else spill_mb, "spill_dir": spill_dir,
+            "result_dir": self.result_dir,
+        }
+        self.ring = ShmRing(int(ring_mb * (1 << 20)), items=_MP.Semaphore(0))
+        self._lock = threading.Lock()
+        self._conn, child = _MP.Pipe(duplex=False)
+        self.process = _MP.Process(target=_worker_main, args=(self.ring.attach_args(), child, cfg),
+                                   name="insole-worker", daemon=True)
+        self.process.start()
+        child.close()
+        self.batches = 0
+        self.bytes = 0
+        self._closed = False
+
+    def put(self, side: str, frames: np.ndarray, host_ts: Optional[float] = None) -> None:
+        """Hand one batch of <I8H frames to the worker (blocks while the ring is full)."""
+        if not len(frames):
+            return
+        if not self.process.is_alive():
+            raise RuntimeError("insole worker exited")
+        data = np.ascontiguousarray(frames, dtype=INSOLE_DTYPE).tobytes()
+        with self._lock:
+            try:
+                self.ring.put(self._ids[side], _HOST_TS.pack(time.time() if host_ts is None else host_ts),
+                              data, alive=self.process.is_alive)
+            except RuntimeError:
+                raise RuntimeError("insole worker exited") from None
+            self.batches += 1
+            self.bytes += len(data)
+
+    def consumer(self, side: str, raw_sink: Any = None) -> Callable[..., None]:
+        """
+        PullPipeline `consume` callback (timestamps=True): raw frames to `raw_sink`
+        (if any) and the worker, with the batch's receive time.
+        """
+        def consume(frames: np.ndarray, host_ts: Optional[float] = None) -> None:
+            if raw_sink is not None and len(frames):
+                raw_sink.append(frames)
+            self.put(side, frames, host_ts)
+        return consume
+
+    def stats(self) -> Dict[str, Any]:
+        return {"batches": self.batches, "bytes": self.bytes, "ring_bytes": self.ring.capacity,
+                "ring_used": self.ring.used(), "stalls": self.ring.stalls}
+
+    def close(self, timeout: float = 60.0) -> Dict[str, Any]:
+        """Signal end of input, wait for the worker and return its per-side results."""
+        if self._closed:
+            raise ValueError("InsoleWorker already closed")
+        self._closed = True
+        try:
+            with self._lock:
+                self.ring.put(_END_TAG, timeout=timeout, alive=self.process.is_alive)
+            if not self._conn.poll(timeout):
+                raise TimeoutError("insole worker did not finish")
+            out = self._conn.recv()
+            stats = self.stats()
+        except (RuntimeError, EOFError):
+            raise RuntimeError("insole worker exited") from None
+        finally:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+            self._conn.close()
+            self.ring.close()
+        try:
+            if "error" in out:
+                raise RuntimeError(f"insole worker failed: {out['error']}")
+            for side in self.sides:
+                for key in _COLUMNS:
+                    out[side][key] = _load_column(out[side][key])
+        finally:
+            shutil.rmtree(self.result_dir, ignore_errors=True)
+        out["worker"].update(stats)
+        return out
+
+    def abort(self) -> None:
+        """Stop the worker without collecting results (recording failed); idempotent."""
+        if self._closed:
+            return
+        self._closed = True
+        self.process.terminate()
+        self.process.join(5.0)
+        self._conn.close()
+        with self._lock:          # a blocked put() sees the dead process and lets go
+            self.ring.close()
+        shutil.rmtree(self.result_dir, ignore_errors=True)
+
+def worker_result(res: Dict[str, Any], pull: Any = None) -> Dict[str, Any]:
+    """One side of InsoleWorker.close() in insole_result's shape (+ the worker's "summary")."""
+    from .buffers import ForcesView
+    return {
+        **res,
+        "forces_by_label": ForcesView(res["force"], res["labels"]),
+        **({"pull": pull.stats()} if pull is not None else {}),
+    }
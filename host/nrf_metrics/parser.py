@@ -1,5 +1,15 @@
+import struct
 from dataclasses import dataclass
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+OP_IMU_RAW = 0x10
+OP_IMU_PACKED = 0x11
+OP_HEARTBEAT = 0x20
+IMU_FIELDS = ("ax", "ay", "az", "gx", "gy", "gz")
+IMU_SAMPLE = struct.Struct("<6h")
+PACKED_HDR = struct.Struct("<BHBIH")   # op, seq, n, t0_us, dt_us (shared/docs/protocol.md)
 
 @dataclass
 class Packet:
@@ -12,13 +22,124 @@ def parse_packet(data: bytes) -> Optional[Packet]:
     op = data[0]
     return Packet(op=op, payload=data[1:])
 
+def _packed_header(op: int, payload: bytes):
+    """(seq, n, t0_us, dt_us) of a well-formed 0x11 packet, else None."""
+    size = PACKED_HDR.size - 1
+    if op != OP_IMU_PACKED or len(payload) < size:
+        return None
+    _, seq, n, t0_us, dt_us = PACKED_HDR.unpack(bytes([op]) + payload[:size])
+    if n == 0 or len(payload) != size + n * IMU_SAMPLE.size:
+        return None
+    return seq, n, t0_us, dt_us
+
 def to_json(pkt: Packet) -> Dict[str, Any]:
     if pkt.op == 0x10 and len(pkt.payload) == 12:
         # ax, ay, az, gx, gy, gz (int16)
-        import struct
-        ax, ay, az, gx, gy, gz = struct.unpack("<6h", pkt.payload)
+        ax, ay, az, gx, gy, gz = IMU_SAMPLE.unpack(pkt.payload)
         return {"op": "imu_raw", "ax": ax, "ay": ay, "az": az, "gx": gx, "gy": gy, "gz": gz}
+    elif (hdr := _packed_header(pkt.op, pkt.payload)) is not None:
+        seq, n, t0_us, dt_us = hdr
+        samples = [dict(zip(IMU_FIELDS, s))
+                   for s in IMU_SAMPLE.iter_unpack(pkt.payload[PACKED_HDR.size - 1:])]
+        return {"op": "imu_packed", "seq": seq, "n": n, "t0_us": t0_us, "dt_us": dt_us,
+                "samples": samples}
     elif pkt.op == 0x20 and len(pkt.payload) == 1:
         return {"op": "heartbeat", "count": pkt.payload[0]}
     else:
         return {"op": hex(pkt.op), "raw_len": len(pkt.payload)}
+
+# =========================== Batch Decode ===========================
+
+@dataclass
+class PacketBatch:
+    """
+    A run of notifications decoded at once. `imu` rows / `heartbeat` counts are in
+    arrival order; `imu_index` / `heartbeat_index` give each row's packet position.
+    IMU rows from 0x10 and 0x11 packets are interleaved as they arrived; a packed
+    packet contributes `n` consecutive rows sharing one `imu_index`.
+    """
+    ops: np.ndarray              # (P,) uint8 opcode per packet (0 for empty packets)
+    lengths: np.ndarray          # (P,) payload length per packet
+    imu: np.ndarray              # (M, 6) int16 ax..gz
+    imu_index: np.ndarray        # (M,) packet index of each IMU row
+    imu_t_us: np.ndarray         # (M,) int64 device time of each row (-1 for 0x10 rows)
+    heartbeat: np.ndarray        # (K,) uint8 counters
+    heartbeat_index: np.ndarray  # (K,) packet index of each heartbeat
+    packed_index: np.ndarray     # (Q,) packet index of each 0x11 packet
+    packed_seq: np.ndarray       # (Q,) uint16 sequence numbers
+    packed_n: np.ndarray         # (Q,) samples per packet
+    packed_dt_us: np.ndarray     # (Q,) sample period per packet
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+def parse_batch(datas: Sequence[bytes]) -> PacketBatch:
+    """
+    Decode many notifications with one np.frombuffer per packet type
+    (same rules as parse_packet + to_json).
+    """
+    n = len(datas)
+    lengths = np.fromiter((len(d) - 1 if d else -1 for d in datas), dtype=np.int64, count=n)
+    ops = np.fromiter((d[0] if d else 0 for d in datas), dtype=np.uint8, count=n)
+    hb_index = np.flatnonzero((ops == OP_HEARTBEAT) & (lengths == 1))
+    hb = np.fromiter((datas[i][1] for i in hb_index), dtype=np.uint8, count=len(hb_index))
+
+    # IMU payloads (0x10 single rows, 0x11 packed runs) joined in arrival order
+    chunks: List[bytes] = []
+    rows: List[int] = []           # rows contributed by each IMU packet
+    t0: List[int] = []
+    dt: List[int] = []
+    imu_pkts: List[int] = []
+    packed_index: List[int] = []
+    packed_seq: List[int] = []
+    for i in np.flatnonzero((ops == OP_IMU_RAW) | (ops == OP_IMU_PACKED)).tolist():
+        d = bytes(datas[i])
+        if d[0] == OP_IMU_RAW:
+            if len(d) != 13:
+                continue
+            chunks.append(d[1:]); rows.append(1); t0.append(-1); dt.append(0)
+        else:
+            hdr = _packed_header(d[0], d[1:])
+            if hdr is None:
+                continue
+            seq, k, t0_us, dt_us = hdr
+            chunks.append(d[PACKED_HDR.size:]); rows.append(k); t0.append(t0_us); dt.append(dt_us)
+            packed_index.append(i); packed_seq.append(seq)
+        imu_pkts.append(i)
+    imu = np.frombuffer(b"".join(chunks), dtype="<i2").reshape(-1, 6)
+    counts = np.asarray(rows, dtype=np.int64)
+    imu_index = np.repeat(np.asarray(imu_pkts, dtype=np.int64), counts)
+    # per-row offset inside its packet -> t0 + i * dt (or -1 for 0x10)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    offset = np.arange(len(imu_index), dtype=np.int64) - starts
+    imu_t_us = (np.repeat(np.asarray(t0, dtype=np.int64), counts)
+                + offset * np.repeat(np.asarray(dt, dtype=np.int64), counts))
+    packed_rows = np.asarray(imu_pkts, dtype=np.int64)
+    is_packed = np.isin(packed_rows, packed_index)
+    return PacketBatch(ops, lengths, imu, imu_index, imu_t_us, hb, hb_index,
+                       np.asarray(packed_index, dtype=np.int64),
+                       np.asarray(packed_seq, dtype=np.uint16),
+                       counts[is_packed], np.asarray(dt, dtype=np.int64)[is_packed])
+
+def batch_to_json(batch: PacketBatch) -> List[Optional[Dict[str, Any]]]:
+    """Per-packet to_json() dicts for a PacketBatch (None for empty packets)."""
+    out: List[Optional[Dict[str, Any]]] = [
+        None if ln < 0 else {"op": hex(int(op)), "raw_len": int(ln)}
+        for op, ln in zip(batch.ops.tolist(), batch.lengths.tolist())
+    ]
+    packed = set(batch.packed_index.tolist())
+    for i, row in zip(batch.imu_index.tolist(), batch.imu.tolist()):
+        if i in packed:
+            continue
+        out[i] = {"op": "imu_raw", **dict(zip(IMU_FIELDS, row))}
+    if packed:
+        bounds = np.searchsorted(batch.imu_index, batch.packed_index)
+        for i, seq, n, dt_us, lo in zip(batch.packed_index.tolist(), batch.packed_seq.tolist(),
+                                        batch.packed_n.tolist(), batch.packed_dt_us.tolist(),
+                                        bounds.tolist()):
+            out[i] = {"op": "imu_packed", "seq": seq, "n": n,
+                      "t0_us": int(batch.imu_t_us[lo]), "dt_us": dt_us,
+                      "samples": [dict(zip(IMU_FIELDS, r)) for r in batch.imu[lo:lo + n].tolist()]}
+    for i, c in zip(batch.heartbeat_index.tolist(), batch.heartbeat.tolist()):
+        out[i] = {"op": "heartbeat", "count": c}
+    return out
@@ -0,0 +1,294 @@
+# pull.py
+import asyncio
+import contextlib
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from . import telemetry
+from .framing import DONE
+
+_END = object()
+
+class RttEstimator:
+    """
+    Pull round-trip estimator, TCP style (RFC 6298): smoothed RTT and RTT variance
+    as EWMAs (alpha 1/8, beta 1/4), RTO = SRTT + 4 * RTTVAR clamped to
+    [min_rto, max_rto]. Each consecutive failure doubles the RTO (up to max_rto);
+    the next clean sample resets the backoff.
+    """
+    ALPHA = 0.125
+    BETA = 0.25
+    K = 4.0
+
+    def __init__(self, initial_rto: float = 1.0, min_rto: float = 0.1, max_rto: float = 5.0):
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.failures = 0          # consecutive, reset by sample()
+        self._base = self._clamp(initial_rto)
+        self.rto = self._base
+
+    def _clamp(self, v: float) -> float:
+        return min(max(v, self.min_rto), self.max_rto)
+
+    def sample(self, rtt: float) -> None:
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar += self.BETA * (abs(self.srtt - rtt) - self.rttvar)
+            self.srtt += self.ALPHA * (rtt - self.srtt)
+        self.failures = 0
+        self._base = self.rto = self._clamp(self.srtt + self.K * self.rttvar)
+
+    def backoff(self) -> None:
+        self.failures += 1
+        self.rto = self._clamp(self._base * 2 ** self.failures)
+
+class PullPipeline:
+    """
+    asyncio-native host-driven pull loop for the BIN10 protocol.
+
+      puller task:   write CMD_PULL -> await the reassembled batch -> put it on a bounded
+                     queue -> immediately issue the next pull
+      consumer task: take batches off the queue and run `consume(frames)` (in a worker
+                     thread when `offload`, so decode/JSON/disk never stall the BLE loop)
+
+    The radio is kept busy while the previous batch is still being processed; the queue
+    bound applies backpressure if the consumer falls behind. The device's notify handler
+    reports arrivals through deliver(), which stamps each batch with its receive time;
+    with `timestamps` that time is passed on as `consume(frames, host_ts)`, so queueing
+    delay never shows up in host timestamps. Ends on "Done" once the queue is drained.
+
+    Timeouts follow the measured round trip (RttEstimator): the batch wait is the current
+    RTO and the write wait is bounded by it too, with `write_timeout` / `batch_timeout` as
+    the upper limits (adaptive=False keeps them fixed). A timed-out pull is pulled again;
+    if its reply turns up late after all, the puller waits for the retry's reply before
+    pulling again, and RTT is only sampled while a single pull is in flight, so a late
+    reply is never timed against a later pull. Failed writes back off
+    exponentially from `error_backoff`. Cadence tracks the device's buffer: after a full
+    batch (as large as any seen so far) the next pull goes out at once; after a short one
+    the puller waits `idle_min`, doubling per empty batch up to `idle_max`.
+    """
+    def __init__(self, device: str, client: Any, cmd_char: str, pull_cmd: bytes,
+                 consume: Callable[[Any], None], queue_size: int = 8, offload: bool = True,
+                 write_timeout: float = 2.0, batch_timeout: float = 5.0, error_backoff: float = 0.05,
+                 adaptive: bool = True, initial_rto: float = 1.0, min_rto: float = 0.1,
+                 idle_min: float = 0.005, idle_max: float = 0.1, timestamps: bool = False):
+        self.device = device
+        self.client = client
+        self.cmd_char = cmd_char
+        self.pull_cmd = pull_cmd
+        self.consume = consume
+        self.timestamps = timestamps
+        self.offload = offload
+        self.write_timeout = write_timeout
+        self.batch_timeout = batch_timeout
+        self.error_backoff = error_backoff
+        self.adaptive = adaptive
+        self.rtt = RttEstimator(min(initial_rto, batch_timeout), min(min_rto, batch_timeout), batch_timeout)
+        self.idle_min = idle_min
+        self.idle_max = idle_max
+        self.idle_s = 0.0
+        self._full = 0             # largest batch seen: a batch this size means more is buffered
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._arrivals: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self.done = asyncio.Event()
+        # stats
+        self.pulls = 0
+        self.batches = 0
+        self.frames = 0
+        self.timeouts = 0
+        self.write_errors = 0
+        self.retries = 0
+        self.rtt_last_s = 0.0
+        self.rtt_sum_s = 0.0
+        self.rtt_max_s = 0.0
+        self.queue_max = 0
+        self._tm = telemetry.device(device)   # None unless telemetry.enable() was called
+
+    # ---- called from the notify handler (event-loop thread) ----
+
+    def deliver(self, kind: str, frames: Any = None, host_ts: Optional[float] = None) -> None:
+        self._arrivals.put_nowait((kind, frames, time.time() if host_ts is None else host_ts))
+
+    # ---- lifecycle ----
+
+    def start(self) -> "PullPipeline":
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._puller(), name=f"pull:{self.device}"),
+                       loop.create_task(self._consumer(), name=f"consume:{self.device}")]
+        return self
+
+    async def join(self) -> None:
+        """
+        Wait until "Done" arrived and every queued batch has been consumed. If either
+        task fails, the other is cancelled and the error re-raised.
+        """
+        try:
+            await asyncio.gather(*self._tasks)
+        except BaseException:
+            await self.cancel()
+            raise
+
+    async def cancel(self) -> None:
+        # cancel until done: wait_for() can swallow a cancel that races a reply (bpo-42130)
+        while not all(t.done() for t in self._tasks):
+            for t in self._tasks:
+                t.cancel()
+            await asyncio.wait(self._tasks, timeout=0.05)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    # ---- timeouts / cadence ----
+
+    def _timeouts(self):
+        if not self.adaptive:
+            return self.write_timeout, self.batch_timeout
+        return min(self.rtt.rto, self.write_timeout), self.rtt.rto
+
+    def _retry(self, tm) -> None:
+        self.retries += 1
+        if self.adaptive:
+            self.rtt.backoff()
+        if tm is not None:
+            tm.retries.value += 1
+            tm.rto.value = self.rtt.rto
+
+    def _pace(self, n: int) -> float:
+        """Delay before the next pull, given the size of the batch just received."""
+        self._full = max(self._full, n)
+        if n and n >= self._full:
+            self.idle_s = 0.0
+        elif n:
+            self.idle_s = self.idle_min
+        else:
+            self.idle_s = min(max(self.idle_s * 2, self.idle_min), self.idle_max)
+        return self.idle_s
+
+    # ---- tasks ----
+
+    async def _puller(self) -> None:
+        tm = self._tm
+        errors = 0
+        outstanding = 0            # pulls written but not answered yet
+        retry = False              # the last wait timed out: pull again even if one is in flight
+        clean = True               # Karn: no RTT sample until replies line up with pulls again
+        t0 = time.perf_counter()
+        try:
+            while True:
+                write_s, batch_s = self._timeouts()
+                draining = outstanding > 0 and not retry
+                if not draining:
+                    clean = clean and self._arrivals.empty()   # a queued reply isn't this pull's
+                    t0 = time.perf_counter()
+                    try:
+                        await asyncio.wait_for(
+                            self.client.write_gatt_char(self.cmd_char, self.pull_cmd), write_s)
+                    except Exception:
+                        self.write_errors += 1
+                        if tm is not None:
+                            tm.write_errors.value += 1
+                        self._retry(tm)
+                        await asyncio.sleep(min(self.error_backoff * 2 ** errors, self.batch_timeout))
+                        errors += 1
+                        continue
+                    errors = 0
+                    retry = False
+                    outstanding += 1
+                    self.pulls += 1
+                    if tm is not None:
+                        tm.pulls.value += 1
+                # else: a timed-out pull answered late and its retry is still in flight; wait
+                # for that reply instead of pulling again, so the next reply is the next pull's
+                try:
+                    kind, frames, host_ts = await asyncio.wait_for(self._arrivals.get(), batch_s)
+                except asyncio.TimeoutError:
+                    if draining:
+                        outstanding = 0            # never answered: those pulls were lost
+                        continue
+                    self.timeouts += 1
+                    if tm is not None:
+                        tm.timeouts.value += 1
+                    self._retry(tm)
+                    retry = True
+                    clean = False
+                    continue
+                outstanding = max(outstanding - 1, 0)
+                if kind == DONE:
+                    break
+                rtt = time.perf_counter() - t0
+                self.rtt_last_s = rtt
+                self.rtt_sum_s += rtt
+                self.rtt_max_s = max(self.rtt_max_s, rtt)
+                if clean and not outstanding:
+                    self.rtt.sample(rtt)
+                clean = not outstanding
+                self.batches += 1
+                n = len(frames) if frames is not None else 0
+                if tm is not None:
+                    tm.latency.observe(rtt)
+                    tm.batches.value += 1
+                    tm.frames.value += n
+                    tm.rto.value = self.rtt.rto
+                if n:
+                    self.frames += n
+                    await self.queue.put((frames, host_ts))
+                    self.queue_max = max(self.queue_max, self.queue.qsize())
+                    if tm is not None:
+                        tm.queue_depth.value = self.queue.qsize()
+                idle = self._pace(n)
+                if idle:
+                    await asyncio.sleep(idle)
+        except BaseException:
+            # cancelled or failed: the consumer may be gone, so never wait for queue room
+            self.done.set()
+            with contextlib.suppress(asyncio.QueueFull):
+                self.queue.put_nowait(_END)
+            raise
+        self.done.set()
+        await self.queue.put(_END)
+
+    async def _consumer(self) -> None:
+        tm = self._tm
+        while True:
+            item = await self.queue.get()
+            if item is _END:
+                return
+            args = item if self.timestamps else item[:1]
+            t0 = time.perf_counter() if tm is not None else 0.0
+            if self.offload:
+                await asyncio.to_thread(self.consume, *args)
+            else:
+                self.consume(*args)
+            if tm is not None:
+                tm.consume.observe(time.perf_counter() - t0)
+                tm.queue_depth.value = self.queue.qsize()
+
+    # ---- reporting ----
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "device": self.device,
+            "pulls": self.pulls,
+            "batches": self.batches,
+            "frames": self.frames,
+            "timeouts": self.timeouts,
+            "write_errors": self.write_errors,
+            "retries": self.retries,
+            "rto_ms": self.rtt.rto * 1e3,
+            "srtt_ms": (self.rtt.srtt or 0.0) * 1e3,
+            "rttvar_ms": self.rtt.rttvar * 1e3,
+            "idle_ms": self.idle_s * 1e3,
+            "rtt_ms_last": self.rtt_last_s * 1e3,
+            "rtt_ms_mean": (self.rtt_sum_s / self.batches * 1e3) if self.batches else 0.0,
+            "rtt_ms_max": self.rtt_max_s * 1e3,
+            "queue_depth": self.queue.qsize(),
+            "queue_max": self.queue_max,
+        }
+
+def format_stats(s: Dict[str, Any]) -> str:
+    return (f"[PULL] {s['device']}: {s['batches']} batches / {s['frames']} frames, "
+            f"rtt mean {s['rtt_ms_mean']:.1f} ms (max {s['rtt_ms_max']:.1f}), "
+            f"rto {s['rto_ms']:.0f} ms, queue max {s['queue_max']}, "
+            f"timeouts {s['timeouts']}, retries {s['retries']}")
@@ -0,0 +1,250 @@
+# registry.py
+"""
+Persistent device registry: advertised name / role -> last-seen address, RSSI and time.
+
+Every scan records what it saw, and every successful connect binds the device to
+its role (left, right, ball, ...). The next run connects to the cached address
+straight away. Only if that fails, or nothing is cached, does it fall back to a
+scan. That turns the 5-10 s discovery into a direct connect.
+
+    reg = get_registry()                          # ~/.nrf_metrics/devices.json
+    client = await connect_cached(reg, "Insole_L", "left", connect, scan)
+
+    async with BackgroundScanner(reg):            # optional: keep the cache fresh
+        ...
+
+The file is JSON ({"devices": {address: {name, address, rssi, seen, role, connected}}}),
+written atomically and merged with what is on disk (newest `seen` wins), so
+several tools can share it. Set NRF_DEVICE_CACHE to move it, or to "" to keep the
+registry in memory only.
+"""
+import asyncio
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from bleak import BleakScanner
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".nrf_metrics", "devices.json")
+MAX_AGE_S = 30 * 24 * 3600.0          # ignore cache entries older than this
+CACHED_CONNECT_TIMEOUT_S = 4.0        # give up on a cached address after this long
+SAVE_INTERVAL_S = 5.0                 # BackgroundScanner: write at most this often
+DISCONNECT_TIMEOUT_S = 2.0            # disconnect_quietly: don't hang on a half-open link
+
+class DeviceRegistry:
+    """Address-keyed cache of devices seen or connected; `path=None` keeps it in memory."""
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.devices: Dict[str, Dict[str, Any]] = self._read() if path else {}
+        self._forgotten: set = set()      # dropped from the file on the next save()
+        self._dirty = False
+
+    # ---- persistence ----
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return dict(json.load(f).get("devices", {}))
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def save(self) -> None:
+        """
+        Merge with the file (newest entry per address wins, forgotten addresses
+        dropped) and replace it atomically.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            merged = self._read()
+            for addr in self._forgotten:
+                merged.pop(addr, None)
+            self._forgotten.clear()
+            for addr, e in self.devices.items():
+                if e.get("seen", 0) >= merged.get(addr, {}).get("seen", 0):
+                    merged[addr] = e
+            self.devices = merged
+            self._dirty = False
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"devices": merged}, f, indent=1)
+            os.replace(tmp, self.path)
+
+    # ---- updates ----
+
+    def observe(self, name: Optional[str], address: str, rssi: Optional[int] = None,
+                save: bool = False) -> None:
+        """Record an advertisement (named devices only)."""
+        if not name:
+            return
+        with self._lock:
+            self._forgotten.discard(address)
+            e = self.devices.setdefault(address, {"address": address})
+            e.update(name=name, seen=time.time())
+            if rssi is not None:
+                e["rssi"] = rssi
+            self._dirty = True
+        if save:
+            self.save()
+
+    def connected(self, name: Optional[str], address: str, role: Optional[str] = None) -> None:
+        """Record a successful connect (and the role it was made for); saves."""
+        with self._lock:
+            self._forgotten.discard(address)
+            e = self.devices.setdefault(address, {"address": address})
+            now = time.time()
+            e.update(seen=now, connected=now)
+            if name:
+                e["name"] = name
+            if role:
+                # one address per role: drop the role from whatever held it before
+                for other in self.devices.values():
+                    if other is not e and other.get("role") == role:
+                        other.pop("role")
+                e["role"] = role
+            self._dirty = True
+        self.save()
+
+    def forget(self, address: str) -> None:
+        """Drop `address` here and from the file (until it is seen again)."""
+        with self._lock:
+            self.devices.pop(address, None)
+            self._forgotten.add(address)
+        self.save()
+
+    # ---- lookups ----
+
+    def lookup(self, name: Optional[str] = None, role: Optional[str] = None,
+               max_age_s: Optional[float] = MAX_AGE_S) -> Optional[Dict[str, Any]]:
+        """
+        Best entry whose name contains `name` (exact names first), preferring the one
+        bound to `role`, then the most recently seen; None if nothing fresh matches.
+        """
+        now = time.time()
+        with self._lock:
+            cands = [e for e in self.devices.values()
+                     if (not name or name in e.get("name", ""))
+                     and (max_age_s is None or now - e.get("seen", 0) <= max_age_s)]
+        if role is not None and not name:
+            cands = [e for e in cands if e.get("role") == role]
+        if not cands:
+            return None
+        return max(cands, key=lambda e: (role is not None and e.get("role") == role,
+                                         e.get("name") == name, e.get("seen", 0)))
+
+    def entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return sorted(self.devices.values(), key=lambda e: -e.get("seen", 0))
+
+# =========================== Process-wide Registry ===========================
+
+_registry_lock = threading.Lock()
+_registry: Optional[DeviceRegistry] = None
+
+def get_registry() -> DeviceRegistry:
+    """Registry used by the connect helpers (loaded on first use)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = DeviceRegistry(os.environ.get("NRF_DEVICE_CACHE", DEFAULT_PATH) or None)
+    return _registry
+
+def set_registry(registry: Optional[DeviceRegistry]) -> None:
+    """Swap the process-wide registry (None: reload from the default path on next use)."""
+    global _registry
+    with _registry_lock:
+        _registry = registry
+
+# =========================== Connect Helper ===========================
+
+async def connect_cached(registry: DeviceRegistry, name: str, role: Optional[str],
+                         connect: Callable[[Any], Awaitable[Any]],
+                         scan: Callable[[], Awaitable[Any]],
+                         timeout: float = CACHED_CONNECT_TIMEOUT_S) -> Any:
+    """
+    connect(cached address) if the registry knows `name`/`role`, else (or if that fails
+    or takes longer than `timeout`) connect(await scan()). `scan` returns a BLEDevice
+    or None. Returns what `connect` returned and records the device in the registry
+    (written from a worker thread, off the event loop).
+
+    `connect` is cancelled on timeout, so it must disconnect whatever it opened when
+    it fails or is cancelled (see disconnect_quietly).
+    """
+    entry = registry.lookup(name, role)
+    if entry is not None:
+        try:
+            client = await asyncio.wait_for(connect(entry["address"]), timeout)
+        except Exception as e:
+            print(f"[CACHE] {role or name}: cached {entry['address']} failed ({e!r}); scanning")
+        else:
+            print(f"[CACHE] {role or name}: connected to cached {entry.get('name')} ({entry['address']})")
+            await asyncio.to_thread(registry.connected, entry.get("name"), entry["address"], role)
+            return client
+    dev = await scan()
+    if dev is None:
+        raise RuntimeError(f"Device '{name}' not found")
+    client = await connect(dev)
+    await asyncio.to_thread(registry.connected, getattr(dev, "name", None), dev.address, role)
+    return client
+
+async def disconnect_quietly(client: Any, timeout: float = DISCONNECT_TIMEOUT_S) -> None:
+    """Best-effort disconnect of a client whose connect or setup failed or was cancelled."""
+    with contextlib.suppress(Exception):
+        await asyncio.wait_for(client.disconnect(), timeout)
+
+# =========================== Background Scanner ===========================
+
+class BackgroundScanner:
+    """
+    Keeps `registry` fresh from advertisements while running (passive scanning where
+    the platform allows it, active otherwise); writes it at most every `save_interval_s`.
+    """
+    def __init__(self, registry: Optional[DeviceRegistry] = None, save_interval_s: float = SAVE_INTERVAL_S):
+        self.registry = registry or get_registry()
+        self.save_interval_s = save_interval_s
+        self.mode: Optional[str] = None
+        self._scanner = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _on_detect(self, dev, adv) -> None:
+        self.registry.observe(dev.name or getattr(adv, "local_name", None), dev.address,
+                              getattr(adv, "rssi", None))
+
+    async def start(self) -> "BackgroundScanner":
+        for mode in ("passive", "active"):
+            try:
+                self._scanner = BleakScanner(detection_callback=self._on_detect, scanning_mode=mode)
+                await self._scanner.start()
+                self.mode = mode
+                break
+            except Exception:
+                if mode == "active":
+                    raise
+        self._task = asyncio.get_running_loop().create_task(self._saver())
+        return self
+
+    async def _saver(self) -> None:
+        while True:
+            await asyncio.sleep(self.save_interval_s)
+            if self.registry._dirty:
+                await asyncio.to_thread(self.registry.save)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._scanner is not None:
+            await self._scanner.stop()
+        await asyncio.to_thread(self.registry.save)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
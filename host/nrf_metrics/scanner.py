@@ -1,12 +1,43 @@
 # scan_ble.py
 import asyncio
+import time
+
 from bleak import BleakScanner
 
-async def main():
-    print("Scanning for 10 seconds…")
-    devs = await BleakScanner.discover(timeout=10.0)
-    for d in devs:
-        print(f"{d.name or '(no name)'}\t{d.address}")
+from .registry import get_registry
+
+async def scan(timeout: float = 10.0, name: str = None):
+    """
+    [(name, address, rssi)] of advertising devices (name substring filter), strongest
+    first. Everything seen is recorded in the device registry.
+    """
+    found = await BleakScanner.discover(timeout=timeout, return_adv=True)
+    reg = get_registry()
+    for d, adv in found.values():
+        reg.observe(d.name or adv.local_name, d.address, adv.rssi)
+    reg.save()
+    rows = [(d.name, d.address, adv.rssi) for d, adv in found.values()
+            if not name or (d.name and name in d.name)]
+    return sorted(rows, key=lambda r: -(r[2] if r[2] is not None else -999))
+
+async def main(timeout: float = 10.0, name: str = None):
+    print(f"Scanning for {timeout:g} seconds…")
+    for dev_name, address, rssi in await scan(timeout, name):
+        print(f"{dev_name or '(no name)'}\t{address}\t{rssi} dBm")
+
+async def watch(name: str = None, interval: float = 5.0):
+    """Keep the device registry fresh from a background scan, printing it every `interval` s."""
+    from .registry import BackgroundScanner
+    async with BackgroundScanner() as bg:
+        print(f"Watching ({bg.mode} scan), registry: {bg.registry.path or '(memory)'}. Ctrl+C to stop.")
+        while True:
+            await asyncio.sleep(interval)
+            now = time.time()
+            for e in bg.registry.entries():
+                if not name or name in e.get("name", ""):
+                    role = f" [{e['role']}]" if e.get("role") else ""
+                    print(f"{e.get('name')}{role}\t{e['address']}\t{e.get('rssi')} dBm\t"
+                          f"{now - e.get('seen', now):.0f} s ago")
 
 if __name__ == "__main__":
     import sys
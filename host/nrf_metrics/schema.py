@@ -0,0 +1,137 @@
+# schema.py
+import json
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+
+from .frames import BALL_FIELDS
+
+# Record schemas written by emit_batch_json / run_ball:
+#   "sample" -> one JSON line per sample / per ball batch of dicts (original layout)
+#   "batch"  -> one session header per device, then one columnar line per pulled batch
+SCHEMA_SAMPLE = "sample"
+SCHEMA_BATCH = "batch"
+SCHEMA_VERSION = 1
+
+BALL_DEVICE = "ball"
+
+# =========================== Writers ===========================
+
+def _tolist(values):
+    return values.tolist() if isinstance(values, np.ndarray) else list(values)
+
+def session_header(device: str, labels: Sequence[str], units_per_s: Optional[float] = None,
+                   derived: Sequence[str] = (), calibration: Optional[dict] = None,
+                   timestamp: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Written once per device before its first batch line:
+      {"timestamp", "session": {"schema", "version", "device", "labels", "units_per_s",
+                                "derived", "calibration"}}
+    `labels` are the channel labels (insole) or frame field names (ball).
+    `calibration` (CalibrationProfile.to_dict()) lets readers rebuild omitted derived values.
+    """
+    return {
+        "timestamp": time.time() if timestamp is None else timestamp,
+        "session": {
+            "schema": SCHEMA_BATCH,
+            "version": SCHEMA_VERSION,
+            "device": device,
+            "labels": list(labels),
+            "units_per_s": units_per_s,
+            "derived": list(derived),
+            "calibration": calibration,
+        },
+    }
+
+def insole_batch_record(device: str, host_ts: float, dev_ts, analog, **derived) -> Dict[str, Any]:
+    """
+    One line per pulled insole batch (arrays or nested lists accepted):
+      {"timestamp", "device", "dev_ts": [N], "analog": [[8] * N], <derived name>: [[8] * N], ...}
+    """
+    rec = {"timestamp": host_ts, "device": device, "dev_ts": _tolist(dev_ts), "analog": _tolist(analog)}
+    for name, values in derived.items():
+        if values is not None:
+            rec[name] = _tolist(values)
+    return rec
+
+def ball_batch_record(host_ts: float, frames: np.ndarray) -> Dict[str, Any]:
+    """One line per pulled ball batch: {"timestamp", "device": "ball", "frames": [[6] * N]}."""
+    return {"timestamp": host_ts, "device": BALL_DEVICE, "frames": _tolist(frames)}
+
+# =========================== Reader ===========================
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream records from a JSONL log, skipping blank or malformed lines. `path` may be
+    a plain or compressed (.gz/.xz/.zz) file or a segmented log (segments.py).
+    """
+    from .segments import iter_lines
+    for line in iter_lines(path):
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+def is_batch_record(rec: Dict[str, Any]) -> bool:
+    return "device" in rec and ("dev_ts" in rec or "frames" in rec)
+
+def _insole_profile(header: Optional[dict]):
+    from .calibration import CalibrationProfile, get_active_profile
+    if header and header.get("calibration"):
+        return CalibrationProfile.from_dict(header["calibration"])
+    return get_active_profile()
+
+def _expand_insole(rec: dict, header: Optional[dict], cache: dict) -> Iterator[Dict[str, Any]]:
+    device = rec["device"]
+    if device not in cache:
+        cache[device] = _insole_profile(header)
+    prof = cache[device]
+    # no header (e.g. a segment or index range read without it): the profile's labels
+    labels = (header or {}).get("labels") or prof.labels
+    analog = np.asarray(rec["analog"], dtype=np.intp)
+    cols = {}
+    for name in ("resistance", "force", "pressure"):
+        if name in rec:
+            cols[name] = rec[name]
+        else:
+            cols[name] = getattr(prof, name)(analog).tolist()
+    analog_l = analog.tolist()
+    for i in range(len(analog_l)):
+        sensors = [
+            {"label": lbl, "analog": a, "resistance": r, "force": f, "pressure": p}
+            for lbl, a, r, f, p in zip(labels, analog_l[i], cols["resistance"][i],
+                                       cols["force"][i], cols["pressure"][i])
+        ]
+        out = {"timestamp": rec["timestamp"], "left_insole": None, "right_insole": None}
+        out[device] = {"sensors": sensors}
+        yield out
+
+def expand_records(records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Expand "batch" schema records back to the per-sample ("sample" schema) shape:
+      insole batch -> one {"timestamp", "left_insole", "right_insole"} per sample
+      ball batch   -> {"timestamp", "ball": {"records": [{ax..gz}, ...]}}
+    Session headers are consumed; every other record passes through unchanged.
+    """
+    headers: Dict[str, dict] = {}
+    profiles: Dict[str, Any] = {}
+    for rec in records:
+        sess = rec.get("session")
+        if isinstance(sess, dict) and sess.get("schema") == SCHEMA_BATCH:
+            headers[sess["device"]] = sess
+            profiles.pop(sess["device"], None)
+            continue
+        if not is_batch_record(rec):
+            yield rec
+            continue
+        if rec["device"] == BALL_DEVICE:
+            fields = headers.get(BALL_DEVICE, {}).get("labels") or BALL_FIELDS
+            yield {"timestamp": rec["timestamp"],
+                   "ball": {"records": [dict(zip(fields, r)) for r in rec["frames"]]}}
+        else:
+            yield from _expand_insole(rec, headers.get(rec["device"]), profiles)
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Per-sample records from a log written with either schema."""
+    return expand_records(iter_jsonl(path))
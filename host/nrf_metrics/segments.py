@@ -0,0 +1,323 @@
+# segments.py
+"""
+Rotating, compressed JSONL logs.
+
+RotatingJSONLinesWriter is a JSONLinesWriter that starts a new segment file once the
+current one reaches `max_bytes` or has been open for `max_seconds`:
+
+    day.jsonl  ->  day.00000.jsonl.gz, day.00001.jsonl.gz, ...  +  day.jsonl.manifest.json
+
+Finished segments are compressed (stdlib gzip / lzma / zlib) by a background thread,
+so neither the BLE side nor the JSONL writer thread waits on the compressor. The
+manifest lists every segment in order with its record count, sizes and the first /
+last record timestamp; it is rewritten atomically whenever a segment changes.
+
+Reading: iter_lines(path) / schema.iter_jsonl(path) stream records from a plain
+.jsonl, a single compressed file, a segmented log (base path or manifest path),
+decompressing one segment at a time.
+"""
+import gzip
+import io
+import json
+import lzma
+import os
+import queue
+import shutil
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional
+
+from .json_writer import JSONLinesWriter
+
+MANIFEST_SUFFIX = ".manifest.json"
+MANIFEST_FORMAT = "nrf-jsonl-segments"
+COMPRESSIONS = {"gzip": ".gz", "lzma": ".xz", "zlib": ".zz"}
+
+_CHUNK = 1 << 16
+
+# =========================== Compression ===========================
+
+def _compress_file(src: str, dst: str, compression: str, level: Optional[int] = None):
+    """Compress src into dst (via a temporary file, so dst is either complete or absent)."""
+    tmp = dst + ".tmp"
+    with open(src, "rb") as fin:
+        if compression == "gzip":
+            with gzip.open(tmp, "wb", compresslevel=6 if level is None else level) as fout:
+                shutil.copyfileobj(fin, fout, _CHUNK)
+        elif compression == "lzma":
+            with lzma.open(tmp, "wb", preset=level) as fout:
+                shutil.copyfileobj(fin, fout, _CHUNK)
+        elif compression == "zlib":
+            comp = zlib.compressobj(6 if level is None else level)
+            with open(tmp, "wb") as fout:
+                for chunk in iter(lambda: fin.read(_CHUNK), b""):
+                    fout.write(comp.compress(chunk))
+                fout.write(comp.flush())
+        else:
+            raise ValueError(f"compression must be one of {tuple(COMPRESSIONS)}")
+    os.replace(tmp, dst)
+
+class _ZlibReader(io.RawIOBase):
+    """Streaming reader for a raw zlib stream (stdlib zlib has no file interface)."""
+    def __init__(self, path: str):
+        self._f = open(path, "rb")
+        self._d = zlib.decompressobj()
+        self._buf = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            if self._d.unconsumed_tail:
+                data = self._d.unconsumed_tail
+            else:
+                data = self._f.read(_CHUNK)
+                if not data:
+                    self._buf = self._d.flush()
+                    if not self._buf:
+                        return 0
+                    break
+            self._buf = self._d.decompress(data, len(b))
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+def open_binary(path: str):
+    """Open a (possibly compressed, by suffix) file for streaming reads of its decompressed bytes."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith((".xz", ".lzma")):
+        return lzma.open(path, "rb")
+    if path.endswith(".zz"):
+        return io.BufferedReader(_ZlibReader(path), _CHUNK)
+    return open(path, "rb")
+
+def open_text(path: str):
+    """Open a (possibly compressed, by suffix) JSONL file for streaming text reads."""
+    if path.endswith((".gz", ".xz", ".lzma", ".zz")):
+        return io.TextIOWrapper(open_binary(path), encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+# =========================== Manifest ===========================
+
+def manifest_path(path: str) -> str:
+    return path if path.endswith(MANIFEST_SUFFIX) else path + MANIFEST_SUFFIX
+
+def read_manifest(path: str) -> Optional[Dict[str, Any]]:
+    """The manifest of a segmented log (base or manifest path), or None for a single file."""
+    mp = manifest_path(path)
+    if not os.path.exists(mp):
+        return None
+    with open(mp, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_json_atomic(path: str, obj: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=1)
+    os.replace(tmp, path)
+
+def _candidates(root: str, seg: Dict[str, Any]) -> List[str]:
+    # a plain segment may get compressed (and removed) between listing and opening
+    names = [seg["file"]]
+    if seg.get("plain"):
+        names += [seg["plain"] + ext for ext in COMPRESSIONS.values()]
+    return [os.path.join(root, n) for n in names]
+
+def segment_files(path: str) -> List[str]:
+    """Files currently holding the records of `path`, in record order."""
+    man = read_manifest(path)
+    if man is None:
+        return [path]
+    root = os.path.dirname(os.path.abspath(manifest_path(path)))
+    out = []
+    for seg in man["segments"]:
+        out.extend([c for c in _candidates(root, seg) if os.path.exists(c)][:1])
+    return out
+
+def iter_lines(path: str) -> Iterator[str]:
+    """Stream lines across every segment of `path`, one open file at a time."""
+    man = read_manifest(path)
+    if man is None:
+        with open_text(path) as f:
+            yield from f
+        return
+    root = os.path.dirname(os.path.abspath(manifest_path(path)))
+    for seg in man["segments"]:
+        for cand in _candidates(root, seg):
+            try:
+                f = open_text(cand)
+            except FileNotFoundError:
+                continue
+            with f:
+                yield from f
+            break
+
+# =========================== Writer ===========================
+
+class RotatingJSONLinesWriter(JSONLinesWriter):
+    """
+    JSONLinesWriter over numbered segment files next to `path` (see module doc).
+
+    - max_bytes: rotate once a segment holds this many bytes (checked per write batch).
+    - max_seconds: rotate once a segment has been open this long (checked per sync tick).
+    - compression: None, "gzip", "lzma" or "zlib", applied to each finished segment.
+    - level: compression level / lzma preset (None = library default).
+
+    Re-opening an existing log continues its numbering. Other keyword arguments go
+    to JSONLinesWriter. Empty segments are discarded.
+    """
+    def __init__(self, path: str, max_bytes: Optional[int] = None, max_seconds: Optional[float] = None,
+                 compression: Optional[str] = None, level: Optional[int] = None, **kw):
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError(f"compression must be one of {tuple(COMPRESSIONS)}")
+        self.base_path = path
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.compression = compression
+        self.level = level
+        self.compress_error: Optional[BaseException] = None
+        self._root = os.path.dirname(os.path.abspath(path))
+        stem, ext = os.path.splitext(os.path.basename(path))
+        self._pattern = stem + ".{:05d}" + (ext or ".jsonl")
+        self._mlock = threading.Lock()
+        self._finished = False
+        man = read_manifest(path)
+        self._segments: List[Dict[str, Any]] = man["segments"] if man else []
+        self._seg: Optional[Dict[str, Any]] = None
+        self._jobs: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._compressor = threading.Thread(target=self._compress_loop, name="SegmentCompressor",
+                                            daemon=True)
+        self._compressor.start()
+        # segments left plain by an interrupted run
+        for seg in self._segments:
+            if compression and seg.get("compression") is None and seg.get("closed"):
+                self._jobs.put(seg)
+        super().__init__(path, **kw)
+
+    @property
+    def manifest_path(self) -> str:
+        return manifest_path(self.base_path)
+
+    def segments(self) -> List[Dict[str, Any]]:
+        with self._mlock:
+            return [dict(s) for s in self._segments]
+
+    # ---- writer thread ----
+
+    def _open(self):
+        index = self._segments[-1]["index"] + 1 if self._segments else 0
+        name = self._pattern.format(index)
+        self._seg = {"index": index, "file": name, "plain": name, "compression": None,
+                     "records": 0, "bytes": 0, "stored_bytes": None,
+                     "t_first": None, "t_last": None, "opened": time.time(), "closed": None}
+        with self._mlock:
+            self._segments.append(self._seg)
+        self._save_manifest()
+        return open(os.path.join(self._root, name), "a", encoding="utf-8")
+
+    def _encode(self, obj) -> str:
+        ts = obj.get("timestamp", obj.get("ts")) if isinstance(obj, dict) else None
+        if isinstance(ts, (int, float)):
+            seg = self._seg
+            if seg["t_first"] is None:
+                seg["t_first"] = ts
+            seg["t_last"] = ts
+        return super()._encode(obj)
+
+    def _write(self, pending: list):
+        if not pending:
+            return
+        self._seg["records"] += len(pending)
+        self._seg["bytes"] += sum(map(len, pending))   # json.dumps output is ASCII
+        super()._write(pending)
+        if self.max_bytes and self._seg["bytes"] >= self.max_bytes:
+            self._rotate()
+
+    def _sync(self, durability: str):
+        super()._sync(durability)
+        if (self.max_seconds and not self._closed and self._seg["records"]
+                and time.time() - self._seg["opened"] >= self.max_seconds):
+            self._rotate()
+
+    def _rotate(self):
+        self._file.flush()
+        self._file.close()
+        self._finish_segment()
+        self._file = self._open()
+
+    def _finish_segment(self):
+        seg = self._seg
+        seg["closed"] = time.time()
+        if seg["records"] == 0:
+            with self._mlock:
+                self._segments.remove(seg)
+            try:
+                os.remove(os.path.join(self._root, seg["plain"]))
+            except FileNotFoundError:
+                pass
+        elif self.compression:
+            self._jobs.put(seg)
+        else:
+            seg["stored_bytes"] = seg["bytes"]
+        self._save_manifest()
+
+    # ---- compressor thread ----
+
+    def _compress_loop(self):
+        while True:
+            seg = self._jobs.get()
+            if seg is None:
+                return
+            src = os.path.join(self._root, seg["plain"])
+            name = seg["plain"] + COMPRESSIONS[self.compression]
+            dst = os.path.join(self._root, name)
+            try:
+                _compress_file(src, dst, self.compression, self.level)
+            except Exception as e:  # keep the plain segment; reported via .compress_error
+                self.compress_error = e
+                continue
+            with self._mlock:
+                seg.update(file=name, plain=None, compression=self.compression,
+                           stored_bytes=os.path.getsize(dst))
+            self._save_manifest()
+            os.remove(src)   # after the manifest points at the compressed file
+
+    # ---- manifest ----
+
+    def _save_manifest(self):
+        with self._mlock:
+            _write_json_atomic(self.manifest_path, {
+                "format": MANIFEST_FORMAT, "version": 1,
+                "compression": self.compression,
+                "max_bytes": self.max_bytes, "max_seconds": self.max_seconds,
+                "complete": self._finished,
+                "segments": self._segments,
+            })
+
+    def close(self):
+        """Close the last segment, wait for pending compression, mark the manifest complete."""
+        super().close()
+        with self._mlock:
+            if self._finished:
+                return
+            self._finished = True
+        self._finish_segment()
+        self._jobs.put(None)
+        self._compressor.join()
+        self._save_manifest()
+
+def open_writer(path: str, max_bytes: Optional[int] = None, max_seconds: Optional[float] = None,
+                compression: Optional[str] = None, **kw) -> JSONLinesWriter:
+    """A plain JSONLinesWriter, or a RotatingJSONLinesWriter when rotation/compression is asked for."""
+    if max_bytes or max_seconds or compression:
+        return RotatingJSONLinesWriter(path, max_bytes=max_bytes, max_seconds=max_seconds,
+                                       compression=compression, **kw)
+    return JSONLinesWriter(path, **kw)
@@ -0,0 +1,321 @@
+# session.py
+"""
+Concurrent multi-device recording session (left + right insole + SmartBall).
+
+    cached addresses     -> devices seen before are connected directly (registry.py)
+    one shared scan      -> every other device found by a single BleakScanner
+    concurrent connects  -> asyncio.gather over all devices
+    start / stop         -> all CMD_START writes issued in the same event-loop tick
+    drain                -> one deadline for every device's "Done"
+
+Setup time is bounded by the slowest device rather than the sum over devices.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from bleak import BleakClient, BleakScanner
+
+from . import ball, insole
+from .calibration import resolve_profile
+from .config import LEFT_NAME, RIGHT_NAME, CMD_CHAR_UUID, CMD_START, CMD_STOP, DATA_CHAR_UUID
+from .gait_stream import StreamingGaitDetector
+from .json_writer import JSONLinesWriter
+from .offload import InsoleWorker, worker_result
+from .pull import PullPipeline, format_stats
+from .registry import CACHED_CONNECT_TIMEOUT_S, DeviceRegistry, get_registry
+from .schema import SCHEMA_SAMPLE
+from .timeline import Timeline
+
+# role -> advertised-name substring
+DEFAULT_DEVICES = {"left": LEFT_NAME, "right": RIGHT_NAME, "ball": ball.BALL_NAME}
+
+# =========================== Shared Scan ===========================
+
+async def scan_devices(targets: Dict[str, str], timeout: float = 10.0,
+                       registry: Optional[DeviceRegistry] = None) -> Dict[str, Any]:
+    """
+    Run one scanner until every role in `targets` ({role: name substring}) has been
+    seen, or `timeout` expires. Returns {role: BLEDevice} for the devices found;
+    each device fills at most one role. Everything seen is recorded in `registry`.
+    """
+    registry = registry or get_registry()
+    found: Dict[str, Any] = {}
+    complete = asyncio.Event()
+
+    def on_detect(dev, adv):
+        name = dev.name or getattr(adv, "local_name", None)
+        registry.observe(name, dev.address, getattr(adv, "rssi", None))
+        if not name or any(d.address == dev.address for d in found.values()):
+            return
+        for role, substr in targets.items():
+            if role not in found and substr in name:
+                found[role] = dev
+                print(f"[SCAN] Found {role}: {name} ({dev.address})")
+                break
+        if len(found) == len(targets):
+            complete.set()
+
+    scanner = BleakScanner(detection_callback=on_detect)
+    await scanner.start()
+    try:
+        await asyncio.wait_for(complete.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await scanner.stop()
+    return found
+
+# =========================== Devices ===========================
+
+@dataclass
+class _Device:
+    role: str
+    dev: Any
+    client: Optional[BleakClient] = None
+    cmd_char: str = CMD_CHAR_UUID
+    data_char: str = DATA_CHAR_UUID
+    insole_state: Optional[insole.DeviceState] = None
+    ball_state: Optional[ball.BallState] = None
+    pipeline: Optional[PullPipeline] = None
+    connect_s: float = 0.0
+    cached: bool = False          # `dev` is an address from the registry, not a scan result
+
+    @property
+    def address(self) -> str:
+        return self.dev if isinstance(self.dev, str) else self.dev.address
+
+    @property
+    def is_ball(self) -> bool:
+        return self.ball_state is not None
+
+# =========================== Orchestration ===========================
+
+async def _connect(d: _Device) -> None:
+    if d.cached:
+        await asyncio.wait_for(_open(d), CACHED_CONNECT_TIMEOUT_S)
+    else:
+        await _open(d)
+
+async def _open(d: _Device) -> None:
+    t0 = time.perf_counter()
+    if d.is_ball:
+        d.client = BleakClient(d.dev)
+        await d.client.connect()
+        await d.client.start_notify(d.data_char, d.ball_state.notify)
+        print(f"[BLE] Connected to {d.role}")
+    else:
+        d.client = await insole.connect_device(d.dev, d.insole_state, d.role)
+    d.connect_s = time.perf_counter() - t0
+
+async def _write_all(devices: List[_Device], insole_cmd: bytes, ball_cmd: bytes) -> None:
+    """Write the command to every device; all writes are started in the same loop tick."""
+    await asyncio.gather(*(d.client.write_gatt_char(d.cmd_char, ball_cmd if d.is_ball else insole_cmd)
+                           for d in devices))
+
+async def _disconnect(d: _Device) -> None:
+    try:
+        await d.client.stop_notify(d.data_char)
+    finally:
+        await d.client.disconnect()
+
+async def run_session(writer: JSONLinesWriter, stop_event: Optional[asyncio.Event] = None,
+                      devices: Optional[Dict[str, str]] = None, schema: str = SCHEMA_SAMPLE,
+                      derived: bool = True, raw_sinks: Optional[Dict[str, Any]] = None,
+                      live_gait: bool = False, scan_timeout: float = 10.0,
+                      done_timeout: float = 120.0, require_all: bool = True,
+                      timeline: Optional[Timeline] = None,
+                      spill_mb: Optional[float] = insole.DEFAULT_SPILL_MB,
+                      spill_dir: Optional[str] = None,
+                      worker_log: Optional[str] = None,
+                      registry: Optional[DeviceRegistry] = None,
+                      calibration: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Record from every device in `devices` ({role: name substring}, default
+    DEFAULT_DEVICES; role "ball" is the SmartBall, any other role an insole).
+    `schema`/`derived`/`raw_sinks`/`live_gait`/`spill_mb`/`spill_dir` as for
+    run_insoles/run_ball (raw_sinks is keyed by role). Without `require_all`, missing devices are skipped.
+    With a `timeline`, insole samples are clock-aligned and merged while recording and
+    each insole raw sink gets the clock fit in its trailer ("clock"); ball raw sinks
+    always get the host start/stop times, so timeline.merge_sessions() can merge all.
+    With `worker_log`, insole calibration/JSON/analytics run in one offload.InsoleWorker
+    process that writes the insole records to that path (not supported with a timeline).
+    `calibration` maps insole roles to a CalibrationProfile, serial or profile JSON
+    path (calibration.resolve_profile); other insoles use the active profile.
+    Roles found in `registry` (default: registry.get_registry()) are connected at
+    their cached address without scanning; a role whose cached connect fails is
+    rescanned and connected once more.
+
+    Returns {role: insole_result, "ball": ball_summary, "timing": {...}, "pull": [...]}.
+    """
+    if worker_log is not None and timeline is not None:
+        raise ValueError("worker_log cannot be combined with a timeline")
+    devices = dict(devices or DEFAULT_DEVICES)
+    raw_sinks = raw_sinks or {}
+    profiles = {role: resolve_profile(spec) for role, spec in (calibration or {}).items()}
+    timing: Dict[str, float] = {}
+    t0 = time.perf_counter()
+
+    # Cached addresses first, then one scan for everything else
+    registry = registry or get_registry()
+    found: Dict[str, Any] = {}
+    for role, substr in devices.items():
+        e = registry.lookup(substr, role)
+        if e is not None and e["address"] not in found.values():
+            found[role] = e["address"]
+            print(f"[CACHE] {role}: {e.get('name')} ({e['address']})")
+    cached = set(found)
+    to_scan = {r: n for r, n in devices.items() if r not in found}
+    if to_scan:
+        print(f"[SCAN] Looking for {', '.join(to_scan.values())}...")
+        found.update(await scan_devices(to_scan, scan_timeout, registry))
+    timing["scan_s"] = time.perf_counter() - t0
+    missing = [r for r in devices if r not in found]
+    if missing:
+        msg = f"Device(s) not found: {', '.join(f'{r} ({devices[r]})' for r in missing)}"
+        if require_all or not found:
+            raise RuntimeError(msg)
+        print(f"[WARN] {msg}; continuing without them")
+
+    devs: List[_Device] = []
+    for role, dev in found.items():
+        if role == "ball":
+            devs.append(_Device(role, dev, cmd_char=ball.CHAR_UUID, data_char=ball.CHAR_UUID,
+                                ball_state=ball.BallState(), cached=role in cached))
+        else:
+            state = insole.DeviceState(f"{role}_insole", schema=schema, derived=derived,
+                                       raw_sink=raw_sinks.get(role),
+                                       gait=StreamingGaitDetector() if live_gait else None,
+                                       timeline=timeline,
+                                       buffer=insole.make_buffer(spill_mb, spill_dir),
+                                       calibration=profiles.get(role))
+            if timeline is not None:
+                timeline.add_source(state.side)
+            devs.append(_Device(role, dev, insole_state=state, cached=role in cached))
+
+    # Concurrent connects
+    t1 = time.perf_counter()
+    results = await asyncio.gather(*(_connect(d) for d in devs), return_exceptions=True)
+    stale = {i for i, (d, r) in enumerate(zip(devs, results)) if d.cached and isinstance(r, BaseException)}
+    if stale:
+        # cached address gone stale (device moved / re-paired): rescan those roles, retry once
+        for i in stale:
+            print(f"[CACHE] {devs[i].role}: cached {devs[i].address} failed ({results[i]!r}); scanning")
+        await asyncio.gather(*(devs[i].client.disconnect() for i in stale if devs[i].client is not None),
+                             return_exceptions=True)
+        rescanned = await scan_devices({devs[i].role: devices[devs[i].role] for i in stale},
+                                       scan_timeout, registry)
+        for i in stale:
+            d = devs[i]
+            d.client, d.cached, d.dev = None, False, rescanned.get(d.role)
+            results[i] = RuntimeError(f"'{devices[d.role]}' not found")
+        retry = [i for i in stale if devs[i].dev is not None]
+        for i, r in zip(retry, await asyncio.gather(*(_connect(devs[i]) for i in retry),
+                                                    return_exceptions=True)):
+            results[i] = r
+    timing["connect_s"] = time.perf_counter() - t1
+    timing.update({f"connect_{d.role}_s": d.connect_s for d in devs})
+    errors = [(d, r) for d, r in zip(devs, results) if isinstance(r, BaseException)]
+    if errors:
+        await asyncio.gather(*(_disconnect(d) for d in devs if d.client is not None),
+                             return_exceptions=True)
+        raise RuntimeError("Connect failed: " + ", ".join(f"{d.role}: {e}" for d, e in errors))
+    for d in devs:      # each saves the registry file: keep that off the event loop
+        await asyncio.to_thread(registry.connected, getattr(d.dev, "name", None), d.address, d.role)
+    timing["setup_s"] = time.perf_counter() - t0
+
+    worker, offloaded = None, {}
+    try:
+        insoles = [d for d in devs if not d.is_ball]
+        balls = [d for d in devs if d.is_ball]
+        if worker_log is not None and insoles:
+            worker = InsoleWorker(worker_log, [d.insole_state.side for d in insoles], schema=schema,
+                                  derived=derived, live_gait=live_gait,
+                                  calibration={d.insole_state.side: d.insole_state.calibration
+                                               for d in insoles},
+                                  spill_mb=spill_mb, spill_dir=spill_dir)
+
+        # Insoles are pulled while recording
+        for d in insoles:
+            d.pipeline = insole.start_pull_pipeline(d.insole_state.side, d.client, d.insole_state,
+                                                    writer, worker=worker)
+
+        print(f"[ACTION] start_r {', '.join(d.role for d in devs)}")
+        timing["start_host_ts"] = time.time()
+        await _write_all(devs, CMD_START, ball.CMD_START)
+
+        if stop_event is not None:
+            await stop_event.wait()
+        else:
+            input("Recording (session). Press ENTER here to stop all devices.\n")
+
+        print(f"[ACTION] stop_r {', '.join(d.role for d in devs)}")
+        timing["stop_host_ts"] = time.time()
+        await _write_all(devs, CMD_STOP, ball.CMD_STOP)
+
+        # The ball is drained after stop
+        if balls:
+            await asyncio.sleep(0.3)
+        for d in balls:
+            d.pipeline = PullPipeline(d.role, d.client, ball.CHAR_UUID, ball.CMD_PULL,
+                                      ball.make_ball_consumer(writer, schema, raw_sinks.get(d.role),
+                                                              d.ball_state.spin),
+                                      timestamps=True)
+            d.ball_state.pipeline = d.pipeline.start()
+
+        # One deadline for every 'Done'
+        print(f"[WAIT] Waiting for 'Done' from {len(devs)} device(s)...")
+        t2 = time.perf_counter()
+        joins = {asyncio.ensure_future(d.pipeline.join()): d for d in devs}
+        finished, pending = await asyncio.wait(joins, timeout=done_timeout)
+        timing["drain_s"] = time.perf_counter() - t2
+        for fut in pending:
+            print(f"[WARN] Timeout waiting for {joins[fut].role}; proceeding.")
+            fut.cancel()
+            await joins[fut].pipeline.cancel()
+        for fut in finished:
+            if fut.exception() is not None:
+                print(f"[WARN] {joins[fut].role}: {fut.exception()!r}")
+    except BaseException:
+        if worker is not None:
+            await asyncio.to_thread(worker.abort)
+        raise
+    finally:
+        # no-op for pipelines that finished; stops pulls if recording failed part-way
+        await asyncio.gather(*(d.pipeline.cancel() for d in devs if d.pipeline is not None),
+                             return_exceptions=True)
+        await asyncio.gather(*(_disconnect(d) for d in devs), return_exceptions=True)
+    if worker is not None:
+        offloaded = await asyncio.to_thread(worker.close)
+        print(f"[OFFLOAD] {offloaded['worker']}")
+
+    out: Dict[str, Any] = {"timing": timing, "pull": []}
+    for d in devs:
+        out["pull"].append(d.pipeline.stats())
+        print(format_stats(out["pull"][-1]))
+        if d.is_ball:
+            analysis = d.ball_state.spin.finish(d.ball_state.start_ms, d.ball_state.end_ms)
+            summary = ball.ball_summary(d.ball_state, analysis)
+            writer.append(summary)
+            out["ball"] = {**summary, "spin_series": ball.spin_series(analysis)}
+            sink = raw_sinks.get(d.role)
+            if sink is not None:
+                sink.meta.update(t_start_ms=summary["ball_summary"]["t_start_ms"],
+                                 t_end_ms=summary["ball_summary"]["t_end_ms"],
+                                 host_start_ts=timing["start_host_ts"],
+                                 host_stop_ts=timing["stop_host_ts"])
+        else:
+            if worker is not None:
+                out[d.role] = worker_result(offloaded[d.insole_state.side], d.pipeline)
+            else:
+                out[d.role] = insole.insole_result(d.insole_state, d.pipeline)
+            if timeline is not None:
+                timeline.close(d.insole_state.side)
+                sink = raw_sinks.get(d.role)
+                if sink is not None:
+                    sink.meta["clock"] = timeline.aligner(d.insole_state.side).to_dict()
+    if timeline is not None:
+        timeline.flush()
+        out["timeline"] = timeline.stats()
+    return out
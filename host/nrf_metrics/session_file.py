@@ -0,0 +1,326 @@
+# session_file.py
+"""
+Append-only binary session container for raw insole (<I8H) / ball (<6h) frames.
+
+Layout (little-endian):
+  MAGIC(8) | u32 header_len | header JSON | pad to 8      <- written at open
+  frames ... (contiguous, exactly as received)            <- appended while recording
+  index: chunk_frames-sized entries (INDEX_DTYPE)         <- written at close
+  trailer JSON (extra metadata, e.g. ball start/end ms)
+  footer: u64 index_offset | u32 n_entries | u32 trailer_len | INDEX_MAGIC(8)
+
+Chunks are fixed-size runs of `chunk_frames` frames (the last may be short); each
+index entry stores the device-time range of its chunk. Insole chunks are keyed by the
+frame timestamp, ball chunks (no per-frame time) by frame ordinal. If a session was
+not closed cleanly the index is rebuilt from the frames on open.
+"""
+import json
+import mmap
+import struct
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .frames import INSOLE_DTYPE, BALL_DTYPE, BALL_FIELDS
+
+MAGIC = b"NRFSESS1"
+INDEX_MAGIC = b"NRFIDX01"
+FOOTER = struct.Struct("<QII8s")
+INDEX_DTYPE = np.dtype([("first", "<u8"), ("count", "<u4"), ("t_first", "<i8"), ("t_last", "<i8")])
+
+KINDS = {
+    # kind: (frame dtype, frame format, time key)
+    "insole": (INSOLE_DTYPE, "<I8H", "ts"),
+    "ball": (BALL_DTYPE, "<6h", "index"),
+}
+
+def _kind_for(device: str) -> str:
+    return "ball" if device == "ball" else "insole"
+
+# =========================== Writer ===========================
+
+class SessionWriter:
+    """
+    Append raw frames for one device. append() accepts the bytes of whole frames or a
+    decoded batch (structured insole array / (N, 6) ball array) and writes them as-is.
+    """
+    def __init__(self, path: str, device: str, side: Optional[str] = None,
+                 calibration: Optional[dict] = None, units_per_s: Optional[float] = None,
+                 chunk_frames: int = 4096):
+        self.path = path
+        self.kind = _kind_for(device)
+        self.dtype, fmt, self.time_key = KINDS[self.kind]
+        self.chunk_frames = int(chunk_frames)
+        self.header = {
+            "version": 1,
+            "device": device,
+            "side": side,
+            "kind": self.kind,
+            "frame_format": fmt,
+            "frame_size": self.dtype.itemsize,
+            "time_key": self.time_key,
+            "units_per_s": units_per_s,
+            "calibration": calibration,
+            "chunk_frames": self.chunk_frames,
+            "created": time.time(),
+        }
+        self.meta: Dict[str, Any] = {}
+        self._f = open(path, "wb")
+        hdr = json.dumps(self.header, separators=(",", ":")).encode("utf-8")
+        self._f.write(MAGIC + struct.pack("<I", len(hdr)) + hdr)
+        self._f.write(b"\0" * (-self._f.tell() % 8))
+        self.frames_written = 0
+        self._index = []          # [first, count, t_first, t_last]
+        self._closed = False
+
+    def append(self, frames) -> None:
+        if isinstance(frames, np.ndarray):
+            buf = frames.tobytes()
+        else:
+            buf = bytes(frames)
+        n = len(buf) // self.dtype.itemsize
+        if n == 0:
+            return
+        buf = buf[:n * self.dtype.itemsize]
+        self._f.write(buf)
+        if self.time_key == "ts":
+            keys = np.frombuffer(buf, dtype=self.dtype, count=n)["ts"].astype(np.int64)
+        else:
+            keys = np.arange(self.frames_written, self.frames_written + n, dtype=np.int64)
+        self._extend_index(keys)
+        self.frames_written += n
+
+    def _extend_index(self, keys: np.ndarray) -> None:
+        pos = 0
+        while pos < len(keys):
+            if not self._index or self._index[-1][1] >= self.chunk_frames:
+                self._index.append([self.frames_written + pos, 0, int(keys[pos]), int(keys[pos])])
+            entry = self._index[-1]
+            take = min(self.chunk_frames - entry[1], len(keys) - pos)
+            entry[1] += take
+            entry[3] = int(keys[pos + take - 1])
+            pos += take
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def close(self, **meta) -> None:
+        """Write index + trailer metadata and close. Extra keyword args go into the trailer."""
+        if self._closed:
+            return
+        self._closed = True
+        self.meta.update(meta)
+        index_offset = self._f.tell()
+        idx = np.array([tuple(e) for e in self._index], dtype=INDEX_DTYPE)
+        self._f.write(idx.tobytes())
+        trailer = json.dumps(self.meta, separators=(",", ":")).encode("utf-8")
+        self._f.write(trailer)
+        self._f.write(FOOTER.pack(index_offset, len(idx), len(trailer), INDEX_MAGIC))
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# =========================== Reader ===========================
+
+class SessionReader:
+    """
+    Memory-mapped reader. `frames` and everything returned by `between()` / `chunk()`
+    are NumPy views into the mapping (no copy); keep the reader open while using them.
+    Insole views are structured (fields "ts", "ch"); ball views are (N, 6) int16.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        if mm[:8] != MAGIC:
+            raise ValueError(f"{path}: not a session file")
+        (hlen,) = struct.unpack_from("<I", mm, 8)
+        self.header: Dict[str, Any] = json.loads(bytes(mm[12:12 + hlen]).decode("utf-8"))
+        self.data_offset = 12 + hlen + (-(12 + hlen) % 8)
+        self.kind = self.header["kind"]
+        self.dtype, _fmt, self.time_key = KINDS[self.kind]
+        self.meta: Dict[str, Any] = {}
+
+        data_end = len(mm)
+        index = None
+        if len(mm) >= self.data_offset + FOOTER.size:
+            index_offset, n_entries, tlen, magic = FOOTER.unpack_from(mm, len(mm) - FOOTER.size)
+            if magic == INDEX_MAGIC:
+                data_end = index_offset
+                index = np.frombuffer(mm, dtype=INDEX_DTYPE, count=n_entries, offset=index_offset)
+                t_off = index_offset + n_entries * INDEX_DTYPE.itemsize
+                self.meta = json.loads(bytes(mm[t_off:t_off + tlen]).decode("utf-8") or "{}")
+
+        self.n_frames = (data_end - self.data_offset) // self.dtype.itemsize
+        self._frames = np.frombuffer(mm, dtype=self.dtype, count=self.n_frames, offset=self.data_offset)
+        self.index = index if index is not None else self._rebuild_index()
+        self._keys_first = self.index["t_first"]
+        self._keys_last = self.index["t_last"]
+
+    def _keys(self, frames: np.ndarray, first: int) -> np.ndarray:
+        if self.time_key == "ts":
+            return frames["ts"].astype(np.int64)
+        return np.arange(first, first + len(frames), dtype=np.int64)
+
+    def _rebuild_index(self) -> np.ndarray:
+        cf = int(self.header.get("chunk_frames") or 4096)
+        firsts = np.arange(0, self.n_frames, cf, dtype=np.uint64)
+        idx = np.empty(len(firsts), dtype=INDEX_DTYPE)
+        idx["first"] = firsts
+        idx["count"] = np.minimum(cf, self.n_frames - firsts.astype(np.int64))
+        keys = self._keys(self._frames, 0)
+        if len(firsts):
+            idx["t_first"] = keys[firsts.astype(np.int64)]
+            idx["t_last"] = keys[np.minimum(firsts.astype(np.int64) + cf, self.n_frames) - 1]
+        return idx
+
+    # ---- views ----
+
+    def _view(self, frames: np.ndarray) -> np.ndarray:
+        if self.kind == "ball":
+            return frames.view("<i2").reshape(-1, len(BALL_FIELDS))
+        return frames
+
+    @property
+    def frames(self) -> np.ndarray:
+        return self._view(self._frames)
+
+    def chunk(self, i: int) -> np.ndarray:
+        e = self.index[i]
+        first = int(e["first"])
+        return self._view(self._frames[first:first + int(e["count"])])
+
+    def between(self, t0: Optional[int] = None, t1: Optional[int] = None) -> np.ndarray:
+        """
+        Frames with t0 <= key <= t1 (device time units for insoles, frame ordinal for the
+        ball). Chunks are located via the index, then bisected; keys must be non-decreasing.
+        """
+        if len(self.index) == 0:
+            return self._view(self._frames[:0])
+        c0 = int(np.searchsorted(self._keys_last, t0, side="left")) if t0 is not None else 0
+        c1 = int(np.searchsorted(self._keys_first, t1, side="right")) if t1 is not None else len(self.index)
+        if c0 >= c1:
+            return self._view(self._frames[:0])
+        lo = int(self.index["first"][c0])
+        hi = int(self.index["first"][c1 - 1]) + int(self.index["count"][c1 - 1])
+        keys = self._keys(self._frames[lo:hi], lo)
+        i0 = lo + (int(np.searchsorted(keys, t0, side="left")) if t0 is not None else 0)
+        i1 = lo + (int(np.searchsorted(keys, t1, side="right")) if t1 is not None else hi - lo)
+        return self._view(self._frames[i0:i1])
+
+    def between_s(self, t0_s: Optional[float] = None, t1_s: Optional[float] = None) -> np.ndarray:
+        """between() with insole times given in seconds (uses header units_per_s)."""
+        ups = self.header.get("units_per_s") or 1
+        return self.between(None if t0_s is None else int(np.ceil(t0_s * ups)),
+                            None if t1_s is None else int(np.floor(t1_s * ups)))
+
+    def close(self) -> None:
+        self._frames = None
+        self.index = self._keys_first = self._keys_last = None
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # views still alive; the mapping is released when they are collected
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# =========================== JSONL Conversion ===========================
+
+def jsonl_to_session(jsonl_path: str, out_path: str, device: str = "left_insole",
+                     chunk_frames: int = 4096) -> int:
+    """
+    Extract one device's frames from a JSONL log (either schema) into a session file.
+    Per-sample ("sample" schema) insole lines carry no device time, so their frames get
+    consecutive ordinals as "ts". Returns the number of frames written.
+    """
+    from .schema import iter_jsonl, SCHEMA_BATCH
+
+    kind = _kind_for(device)
+    w = None
+
+    def writer(header: Optional[dict] = None) -> SessionWriter:
+        nonlocal w
+        if w is None:
+            header = header or {}
+            w = SessionWriter(out_path, device, side=device if kind == "insole" else None,
+                              calibration=header.get("calibration"),
+                              units_per_s=header.get("units_per_s"), chunk_frames=chunk_frames)
+        return w
+
+    ordinal = 0
+    for rec in iter_jsonl(jsonl_path):
+        sess = rec.get("session")
+        if isinstance(sess, dict) and sess.get("schema") == SCHEMA_BATCH:
+            if sess.get("device") == device:
+                writer(sess)
+            continue
+        if kind == "ball":
+            if rec.get("device") == "ball":
+                writer().append(np.asarray(rec["frames"], dtype="<i2"))
+            elif isinstance(rec.get("ball"), dict) and "records" in rec["ball"]:
+                rows = [[r[k] for k in BALL_FIELDS] for r in rec["ball"]["records"]]
+                writer().append(np.asarray(rows, dtype="<i2").reshape(-1, len(BALL_FIELDS)))
+            elif "ball_summary" in rec:
+                s = rec["ball_summary"]
+                writer().meta.update(t_start_ms=s.get("t_start_ms"), t_end_ms=s.get("t_end_ms"))
+            continue
+        if rec.get("device") == device and "dev_ts" in rec:
+            arr = np.empty(len(rec["dev_ts"]), dtype=INSOLE_DTYPE)
+            arr["ts"] = rec["dev_ts"]
+            arr["ch"] = rec["analog"]
+            writer().append(arr)
+        elif isinstance(rec.get(device), dict):
+            arr = np.empty(1, dtype=INSOLE_DTYPE)
+            arr["ts"] = ordinal
+            arr["ch"] = [s["analog"] for s in rec[device]["sensors"]]
+            ordinal += 1
+            writer().append(arr)
+
+    if w is None:
+        writer()
+    n = w.frames_written
+    w.close()
+    return n
+
+def _iter_batches(reader: SessionReader, batch_frames: int) -> Iterator[Tuple[int, np.ndarray]]:
+    frames = reader.frames
+    for i in range(0, len(frames), batch_frames):
+        yield i, frames[i:i + batch_frames]
+
+def session_to_jsonl(session_path: str, jsonl_path: str, batch_frames: int = 100) -> int:
+    """
+    Write a session file out as "batch" schema JSONL (header + one line per batch_frames
+    frames; derived values are left to schema.expand_records). Returns frames written.
+    """
+    from .json_writer import JSONLinesWriter
+    from .schema import session_header, insole_batch_record, ball_batch_record
+
+    with SessionReader(session_path) as r, JSONLinesWriter(jsonl_path, durability="none") as out:
+        h = r.header
+        created = h.get("created") or time.time()
+        if r.kind == "ball":
+            out.append(session_header("ball", BALL_FIELDS, timestamp=created))
+            for _, fr in _iter_batches(r, batch_frames):
+                out.append(ball_batch_record(created, fr.tolist()))
+        else:
+            cal = h.get("calibration") or {}
+            labels = cal.get("labels")
+            if labels is None:
+                from .config import CHANNEL_LABELS
+                labels = CHANNEL_LABELS
+            out.append(session_header(h["device"], labels, h.get("units_per_s"),
+                                      calibration=h.get("calibration"), timestamp=created))
+            for _, fr in _iter_batches(r, batch_frames):
+                out.append(insole_batch_record(h["device"], created, fr["ts"], fr["ch"]))
+        return r.n_frames
@@ -0,0 +1,478 @@
+# sim.py
+"""
+Simulated BLE peripherals standing in for bleak's BleakScanner / BleakClient.
+
+Implements the insole / SmartBall pull protocol:
+  host writes   start_r | stop_r | get_data10_bin
+  device sends  "BIN10:<n>" -> n frames as MTU-sized binary chunks -> "BATCH_DONE"
+                "Done" once stopped and drained; the ball also sends its <II start/end ms
+                timing packet when stopped
+and the generic NRF-BLE-DEMO protocol (0x01 write -> 0x10 sample, 0x20 heartbeat,
+0x02 [rate_hz] / 0x03 -> continuous 0x11 packed samples).
+
+Usage (run_insoles / run_ball / client.run unchanged):
+
+    with simulate(SimPeripheral("Insole_L", "insole", speed=None)):
+        await run_insoles(writer, stop_event)
+"""
+import asyncio
+import contextlib
+import struct
+import sys
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .frames import INSOLE_DTYPE, BALL_FRAME_SIZE, INSOLE_FRAME_SIZE
+
+CMD_START = b"start_r"
+CMD_STOP = b"stop_r"
+CMD_PULL = b"get_data10_bin"
+STREAM_RATE_MIN_HZ = 16        # firmware clamps 0x02 rates so dt_us fits its uint16
+STREAM_RATE_MAX_HZ = 1000
+
+# Modules whose bleak names are swapped by simulate()
+PATCH_MODULES = ("nrf_metrics.insole", "nrf_metrics.ball", "nrf_metrics.client", "nrf_metrics.scanner",
+                 "nrf_metrics.session", "nrf_metrics.registry")
+
+# =========================== Synthetic Frames ===========================
+
+def synth_insole(start: int, stop: int, rate_hz: float, units_per_s: float = 1000.0,
+                 stride_s: float = 1.0, stance_ratio: float = 0.6, seed: int = 0) -> np.ndarray:
+    """
+    Gait-like <I8H frames [start, stop): ADC 0 in swing, heel channels loaded early in
+    stance and toe channels late, plus noise. Deterministic for a given seed and index.
+    """
+    i = np.arange(start, stop)
+    out = np.empty(len(i), dtype=INSOLE_DTYPE)
+    t = i / rate_hz
+    out["ts"] = (t * units_per_s).astype(np.uint32)
+    phase = (t % stride_s) / (stride_s * stance_ratio)            # 0..1 during stance
+    stance = phase < 1.0
+    # channel c peaks at phase c/7 (heel -> toe)
+    centers = np.linspace(0.15, 0.85, 8)
+    load = np.exp(-((phase[:, None] - centers[None, :]) / 0.25) ** 2) * stance[:, None]
+    noise = np.random.default_rng([seed, start]).integers(-40, 40, size=load.shape)
+    out["ch"] = np.clip(load * 2600 + 400 * stance[:, None] + noise, 0, 4094) * stance[:, None]
+    return out
+
+def synth_ball(start: int, stop: int, rate_hz: float, spin_deg_s: float = 720.0,
+               seed: int = 0) -> np.ndarray:
+    """(N, 6) int16 ax..gz: spin of ~spin_deg_s about a slowly precessing axis, plus noise."""
+    i = np.arange(start, stop)
+    t = i / rate_hz
+    rng = np.random.default_rng([seed, start])
+    axis = np.stack([np.cos(0.2 * t), np.sin(0.2 * t), np.full_like(t, 0.5)], axis=1)
+    axis /= np.linalg.norm(axis, axis=1, keepdims=True)
+    gyro = axis * spin_deg_s + rng.normal(0, 5, size=axis.shape)
+    acc = rng.normal(0, 200, size=axis.shape) + [0, 0, 2048]
+    return np.clip(np.hstack([acc, gyro]), -32768, 32767).astype("<i2")
+
+# =========================== Peripheral ===========================
+
+@dataclass
+class SimDevice:
+    """Stand-in for bleak.backends.device.BLEDevice."""
+    name: str
+    address: str
+    rssi: int = -50
+    details: Any = None
+
+@dataclass
+class SimAdvertisementData:
+    local_name: str
+    rssi: int = -50
+    service_uuids: List[str] = field(default_factory=list)
+
+class SimPeripheral:
+    """
+    One simulated device.
+
+    kind: "insole" (<I8H frames), "ball" (<6h frames) or "nrf" (generic demo protocol)
+    rate_hz: sample rate while recording; speed: time scale (1.0 = real time, N = N x,
+        None/0 = as fast as possible: the whole recording is buffered at start_r)
+    frames: optional frames to replay instead of synthetic data (structured insole
+        array or (N, 6) ball array); see from_session()
+    duration_s: length of the synthetic recording in as-fast-as-possible mode
+    batch_frames: frames per pull
+    mtu: ATT MTU (payload per notification = mtu - 3)
+    latency_s: delay before each response; chunk_interval_s: gap between notifications
+    drop_rate: probability of losing each binary chunk
+    """
+    def __init__(self, name: str, kind: str = "insole", address: Optional[str] = None,
+                 rate_hz: float = 100.0, speed: Optional[float] = 1.0,
+                 frames: Optional[np.ndarray] = None, duration_s: float = 10.0,
+                 batch_frames: int = 10, mtu: int = 247,
+                 latency_s: float = 0.0, chunk_interval_s: float = 0.0, drop_rate: float = 0.0,
+                 units_per_s: float = 1000.0, heartbeat_s: float = 1.0, seed: int = 0):
+        if kind not in ("insole", "ball", "nrf"):
+            raise ValueError(f"unknown kind {kind!r}")
+        self.name = name
+        self.kind = kind
+        self.address = address or "SIM:%08X" % zlib.crc32(name.encode())
+        self.rate_hz = rate_hz
+        self.speed = speed if speed else None
+        self.frames = frames
+        self.duration_s = duration_s
+        self.batch_frames = batch_frames
+        self.mtu = mtu
+        self.latency_s = latency_s
+        self.chunk_interval_s = chunk_interval_s
+        self.drop_rate = drop_rate
+        self.units_per_s = units_per_s
+        self.heartbeat_s = heartbeat_s
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+        self.reset()
+
+    @classmethod
+    def from_session(cls, path: str, name: str, **kw) -> "SimPeripheral":
+        """Replay the frames of a session_file recording."""
+        from .session_file import SessionReader
+        with SessionReader(path) as r:
+            frames = np.array(r.frames)          # copy out of the mapping
+            kind = r.kind
+            kw.setdefault("units_per_s", r.header.get("units_per_s") or 1000.0)
+        return cls(name, kind, frames=frames, **kw)
+
+    def reset(self) -> None:
+        self.boot = time.monotonic()
+        self.t_start: Optional[float] = None
+        self.t_stop: Optional[float] = None
+        self.cursor = 0
+        # counters
+        self.pulls = 0
+        self.frames_sent = 0
+        self.chunks_sent = 0
+        self.chunks_dropped = 0
+        # nrf packed streaming (0x02 / 0x03)
+        self.stream_rate_hz: Optional[float] = None
+        self.stream_seq = 0
+        self.packets_streamed = 0
+        self._stream_t0 = 0.0          # host time the current rate took effect
+        self._stream_due = 0           # samples since _stream_t0 already packed
+        self._stream_us = 0            # device time (us) of the next sample
+        self._stream_buf: List[bytes] = []
+
+    @property
+    def device(self) -> SimDevice:
+        return SimDevice(self.name, self.address)
+
+    @property
+    def frame_size(self) -> int:
+        return BALL_FRAME_SIZE if self.kind == "ball" else INSOLE_FRAME_SIZE
+
+    # ---- frame source ----
+
+    def _produced(self, now: float) -> int:
+        if self.t_start is None:
+            return 0
+        limit = len(self.frames) if self.frames is not None else None
+        if self.speed is None:
+            return limit if limit is not None else int(self.duration_s * self.rate_hz)
+        end = self.t_stop if self.t_stop is not None else now
+        n = int((end - self.t_start) * self.speed * self.rate_hz)
+        return n if limit is None else min(n, limit)
+
+    def _frames(self, start: int, stop: int) -> np.ndarray:
+        if self.frames is not None:
+            return self.frames[start:stop]
+        if self.kind == "ball":
+            return synth_ball(start, stop, self.rate_hz, seed=self.seed)
+        return synth_insole(start, stop, self.rate_hz, self.units_per_s, seed=self.seed)
+
+    # ---- nrf packed stream ----
+
+    @property
+    def packed_max_samples(self) -> int:
+        return max(1, (self.mtu - 3 - 10) // 12)
+
+    def stream_poll(self, now: Optional[float] = None, flush: bool = False) -> List[bytes]:
+        """0x11 packets completed since the last poll (plus the partial one if flush)."""
+        if self.stream_rate_hz is None:
+            return []
+        now = time.monotonic() if now is None else now
+        due = int((now - self._stream_t0) * (self.speed or 1.0) * self.stream_rate_hz)
+        out = []
+        dt_us = int(1e6 / self.stream_rate_hz)
+        while self._stream_due < due:
+            frame = self._frames(self.cursor, self.cursor + 1) if self.frames is not None \
+                else synth_ball(self.cursor, self.cursor + 1, self.stream_rate_hz, seed=self.seed)
+            if not len(frame):
+                break
+            self.cursor += 1
+            self._stream_due += 1
+            self._stream_buf.append(frame.tobytes())
+            self._stream_us += dt_us
+            if len(self._stream_buf) == self.packed_max_samples:
+                out.append(self._stream_packet())
+        if flush and self._stream_buf:
+            out.append(self._stream_packet())
+        return out
+
+    def _stream_packet(self) -> bytes:
+        n = len(self._stream_buf)
+        dt_us = int(1e6 / self.stream_rate_hz)
+        t0_us = (self._stream_us - n * dt_us) & 0xFFFFFFFF
+        pkt = struct.pack("<BHBIH", 0x11, self.stream_seq, n, t0_us, dt_us)
+        self.stream_seq = (self.stream_seq + 1) & 0xFFFF
+        self.packets_streamed += 1
+        pkt += b"".join(self._stream_buf)
+        self._stream_buf = []
+        return pkt
+
+    # ---- protocol ----
+
+    def _split(self, payload: bytes) -> Iterator[bytes]:
+        step = max(1, self.mtu - 3)
+        for off in range(0, len(payload), step):
+            yield payload[off:off + step]
+
+    def on_write(self, data: bytes) -> List[bytes]:
+        """Apply a host command; returns the notifications it triggers, in order."""
+        now = time.monotonic()
+        data = bytes(data)
+        if self.kind == "nrf":
+            if data[:1] == b"\x01":
+                frame = self._frames(self.cursor, self.cursor + 1) if self.frames is not None \
+                    else synth_ball(self.cursor, self.cursor + 1, self.rate_hz, seed=self.seed)
+                self.cursor += 1
+                return [b"\x10" + frame.tobytes()] if len(frame) else []
+            if data[:1] == b"\x02":
+                rate = int.from_bytes(data[1:3], "little") if len(data) >= 3 else 0
+                out = self.stream_poll(now, flush=True)       # partial packet keeps the old dt_us
+                if self.stream_rate_hz is None:
+                    self.stream_seq = 0
+                    self._stream_us = int((now - self.boot) * 1e6)
+                self.stream_rate_hz = float(min(max(rate or self.rate_hz, STREAM_RATE_MIN_HZ),
+                                                STREAM_RATE_MAX_HZ))
+                self._stream_t0, self._stream_due = now, 0
+                return out
+            if data[:1] == b"\x03":
+                out = self.stream_poll(now, flush=True)
+                self.stream_rate_hz = None
+                return out
+            return []
+        if data == CMD_START:
+            self.reset()
+            self.t_start = now
+            return []
+        if data == CMD_STOP:
+            if self.t_start is not None and self.t_stop is None:
+                self.t_stop = now
+                if self.kind == "ball":
+                    start_ms = int((self.t_start - self.boot) * 1000)
+                    end_ms = start_ms + int(self._produced(now) / self.rate_hz * 1000)
+                    return [np.array([start_ms, end_ms], dtype="<u4").tobytes()]
+            return []
+        if data == CMD_PULL:
+            self.pulls += 1
+            n = max(0, min(self.batch_frames, self._produced(now) - self.cursor))
+            if n == 0 and self.t_stop is not None:
+                return [b"Done"]
+            frames = self._frames(self.cursor, self.cursor + n)
+            self.cursor += n
+            self.frames_sent += n
+            out = [f"BIN10:{n}".encode()]
+            for chunk in self._split(frames.tobytes()):
+                if self.drop_rate and self._rng.random() < self.drop_rate:
+                    self.chunks_dropped += 1
+                    continue
+                self.chunks_sent += 1
+                out.append(chunk)
+            out.append(b"BATCH_DONE")
+            return out
+        return []
+
+# =========================== Registry ===========================
+
+_REGISTRY: Dict[str, SimPeripheral] = {}
+
+def _lookup(device_or_address) -> SimPeripheral:
+    address = getattr(device_or_address, "address", device_or_address)
+    for p in _REGISTRY.values():
+        if p.address == address or p.name == address:
+            return p
+    raise RuntimeError(f"Simulated device {address!r} not found")
+
+class SimScanner:
+    """
+    Drop-in for BleakScanner: the class methods used by the host tools, and a
+    scanner instance whose detection_callback sees every registered peripheral.
+    """
+    def __init__(self, detection_callback: Optional[Callable] = None, **_kw):
+        self._callback = detection_callback
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._callback is not None:
+            for p in list(_REGISTRY.values()):
+                loop.call_soon(self._callback, p.device, SimAdvertisementData(p.name))
+
+    async def stop(self) -> None:
+        self._callback = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    @staticmethod
+    async def discover(timeout: float = 5.0, return_adv: bool = False, **_kw):
+        await asyncio.sleep(0)
+        if return_adv:
+            return {p.address: (p.device, SimAdvertisementData(p.name)) for p in _REGISTRY.values()}
+        return [p.device for p in _REGISTRY.values()]
+
+    @staticmethod
+    async def find_device_by_filter(filterfunc: Callable, timeout: float = 10.0, **_kw):
+        await asyncio.sleep(0)
+        for p in _REGISTRY.values():
+            if filterfunc(p.device, SimAdvertisementData(p.name)):
+                return p.device
+        return None
+
+    @staticmethod
+    async def find_device_by_address(address: str, timeout: float = 10.0, **_kw):
+        await asyncio.sleep(0)
+        try:
+            return _lookup(address).device
+        except RuntimeError:
+            return None
+
+    @staticmethod
+    async def find_device_by_name(name: str, timeout: float = 10.0, **_kw):
+        await asyncio.sleep(0)
+        for p in _REGISTRY.values():
+            if p.name == name:
+                return p.device
+        return None
+
+class SimClient:
+    """Drop-in for bleak.BleakClient against a registered SimPeripheral."""
+    def __init__(self, address_or_device, timeout: float = 10.0, **_kw):
+        self.peripheral = _lookup(address_or_device)
+        self.address = self.peripheral.address
+        self._callbacks: Dict[str, Callable] = {}
+        self._outbox: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._connected = False
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def connect(self, **_kw) -> bool:
+        self._outbox = asyncio.Queue()
+        self._tasks = [asyncio.get_running_loop().create_task(self._sender())]
+        if self.peripheral.kind == "nrf" and self.peripheral.heartbeat_s:
+            self._tasks.append(asyncio.get_running_loop().create_task(self._heartbeat()))
+        if self.peripheral.kind == "nrf":
+            self._tasks.append(asyncio.get_running_loop().create_task(self._streamer()))
+        self._connected = True
+        return True
+
+    async def disconnect(self) -> bool:
+        self._connected = False
+        for t in self._tasks:
+            t.cancel()
+        for t in self._tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await t
+        self._tasks = []
+        self._callbacks.clear()
+        return True
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.disconnect()
+
+    async def start_notify(self, char, callback: Callable, **_kw) -> None:
+        self._callbacks[str(char).lower()] = callback
+
+    async def stop_notify(self, char) -> None:
+        self._callbacks.pop(str(char).lower(), None)
+
+    async def write_gatt_char(self, char, data, response: bool = True) -> None:
+        if not self._connected:
+            raise RuntimeError("Not connected")
+        packets = self.peripheral.on_write(data)
+        if packets:
+            due = time.monotonic() + self.peripheral.latency_s
+            self._outbox.put_nowait((due, packets))
+
+    async def _sender(self) -> None:
+        while True:
+            due, packets = await self._outbox.get()
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            for i, pkt in enumerate(packets):
+                if i and self.peripheral.chunk_interval_s:
+                    await asyncio.sleep(self.peripheral.chunk_interval_s)
+                self._deliver(pkt)
+            await asyncio.sleep(0)   # let other tasks run between responses
+
+    async def _heartbeat(self) -> None:
+        count = 0
+        while True:
+            await asyncio.sleep(self.peripheral.heartbeat_s / (self.peripheral.speed or 1.0))
+            count = (count + 1) & 0xFF
+            self._deliver(bytes([0x20, count]))
+
+    async def _streamer(self) -> None:
+        p = self.peripheral
+        while True:
+            if p.stream_rate_hz is None:
+                await asyncio.sleep(0.01)
+                continue
+            # wake roughly once per full packet
+            await asyncio.sleep(p.packed_max_samples / (p.stream_rate_hz * (p.speed or 1.0)))
+            packets = p.stream_poll()
+            if packets:      # through the outbox so command responses stay in order
+                self._outbox.put_nowait((time.monotonic(), packets))
+
+    def _deliver(self, pkt: bytes) -> None:
+        for char, cb in list(self._callbacks.items()):
+            cb(char, bytearray(pkt))
+
+# =========================== Patching ===========================
+
+@contextlib.contextmanager
+def simulate(*peripherals: SimPeripheral, modules=PATCH_MODULES, registry=None):
+    """
+    Register peripherals and swap BleakScanner/BleakClient in the host modules
+    (those already imported) for the simulated versions; restored on exit.
+    The device registry is replaced by `registry` (default: a fresh in-memory one),
+    so simulated addresses never reach the on-disk cache.
+    """
+    from . import registry as reg
+    saved = []
+    saved_registry = reg._registry
+    reg.set_registry(registry if registry is not None else reg.DeviceRegistry(None))
+    for p in peripherals:
+        _REGISTRY[p.address] = p
+    try:
+        for name in modules:
+            mod = sys.modules.get(name)
+            if mod is None:
+                continue
+            for attr, repl in (("BleakScanner", SimScanner), ("BleakClient", SimClient)):
+                if hasattr(mod, attr):
+                    saved.append((mod, attr, getattr(mod, attr)))
+                    setattr(mod, attr, repl)
+        yield peripherals
+    finally:
+        for mod, attr, orig in reversed(saved):
+            setattr(mod, attr, orig)
+        reg.set_registry(saved_registry)
+        for p in peripherals:
+            _REGISTRY.pop(p.address, None)
@@ -0,0 +1,162 @@
+# spin.py
+"""
+Ball spin analytics on (N, 6) <6h frames (ax, ay, az, gx, gy, gz), batch at a time.
+
+SpinAnalyzer.add() does the per-batch work (|omega| per sample, gyro outer-product sum
+for the axis) with NumPy, off the notify path. The ball frames carry no timestamps and
+its start/end ms only describe the whole recording, so the time axis is laid out in
+finish(): samples evenly spaced from start to end (or at `rate_hz` when no timing).
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_WINDOWS_S = (0.1, 1.0)
+PERCENTILE = 95.0
+
+# =========================== Window Helpers ===========================
+
+def rolling_mean(x: np.ndarray, n: int) -> np.ndarray:
+    """Mean over each run of n consecutive samples (len(x) - n + 1 values)."""
+    if n <= 1:
+        return x.astype(np.float64, copy=True)
+    if len(x) < n:
+        return np.empty(0)
+    c = np.concatenate(([0.0], np.cumsum(x, dtype=np.float64)))
+    return (c[n:] - c[:-n]) / n
+
+def revolutions(t: np.ndarray, omega_deg_s: np.ndarray, period_s: float) -> float:
+    """Integrate |omega| over device time (each sample held for its interval)."""
+    if not len(t):
+        return 0.0
+    dt = np.empty(len(t))
+    dt[:-1] = np.diff(t)
+    dt[-1] = period_s
+    return float(np.dot(omega_deg_s, dt)) / 360.0
+
+def spin_axis(gram: np.ndarray, gsum: np.ndarray) -> Optional[List[float]]:
+    """
+    Unit spin axis in the ball frame: principal eigenvector of sum(g g^T), signed to
+    agree with the mean gyro vector.
+    """
+    if not np.any(gram):
+        return None
+    w, v = np.linalg.eigh(gram)
+    axis = v[:, int(np.argmax(w))]
+    if np.dot(axis, gsum) < 0:
+        axis = -axis
+    return axis.tolist()
+
+# =========================== Analyzer ===========================
+
+class SpinAnalyzer:
+    """
+    Accumulates |omega| (8 bytes/sample) and O(1) axis statistics per batch;
+    finish() / summary() build the time axis, rolling spin-rate series and the
+    ball_summary fields. `gyro_scale` converts raw gyro counts to deg/s.
+    """
+    def __init__(self, windows_s: Sequence[float] = DEFAULT_WINDOWS_S, gyro_scale: float = 1.0,
+                 rate_hz: Optional[float] = None):
+        self.windows_s = tuple(windows_s)
+        self.gyro_scale = gyro_scale
+        self.rate_hz = rate_hz
+        self._omega: List[np.ndarray] = []
+        self.samples = 0
+        self.peak_omega_deg_s = 0.0
+        self._gram = np.zeros((3, 3))
+        self._gsum = np.zeros(3)
+
+    def add(self, frames: np.ndarray) -> np.ndarray:
+        """Consume one (N, 6) batch; returns its |omega| in deg/s."""
+        if not len(frames):
+            return np.empty(0)
+        g = frames[:, 3:6].astype(np.float64)
+        if self.gyro_scale != 1.0:
+            g *= self.gyro_scale
+        omega = np.sqrt(np.einsum("ij,ij->i", g, g))
+        self._omega.append(omega)
+        self.samples += len(omega)
+        self.peak_omega_deg_s = max(self.peak_omega_deg_s, float(omega.max()))
+        self._gram += g.T @ g
+        self._gsum += g.sum(axis=0)
+        return omega
+
+    def omega(self) -> np.ndarray:
+        if len(self._omega) > 1:
+            self._omega = [np.concatenate(self._omega)]
+        return self._omega[0] if self._omega else np.empty(0)
+
+    def time_axis(self, start_ms: Optional[int], end_ms: Optional[int]) -> np.ndarray:
+        """Device time (s) of every sample."""
+        n = self.samples
+        if start_ms is not None and end_ms is not None and end_ms > start_ms and n:
+            return start_ms / 1000.0 + np.arange(n) * ((end_ms - start_ms) / 1000.0 / n)
+        if self.rate_hz:
+            return (start_ms or 0) / 1000.0 + np.arange(n) / self.rate_hz
+        return np.empty(0)
+
+    def finish(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Full analysis: {"t", "omega_deg_s", "revolutions", "omega_p", "axis",
+        "windows": {window_s: {"t", "rps", "peak_rps", "p_rps"}}}.
+        Window series are reported every half window.
+        """
+        omega = self.omega()
+        t = self.time_axis(start_ms, end_ms)
+        period = float(t[1] - t[0]) if len(t) > 1 else 0.0
+        out: Dict[str, Any] = {
+            "t": t,
+            "omega_deg_s": omega,
+            "revolutions": revolutions(t, omega, period) if len(t) else 0.0,
+            "omega_p": float(np.percentile(omega, PERCENTILE)) if len(omega) else 0.0,
+            "axis": spin_axis(self._gram, self._gsum),
+            "windows": {},
+        }
+        for w in self.windows_s:
+            if period <= 0.0:
+                break
+            n = max(1, int(round(w / period)))
+            rps = rolling_mean(omega, n) / 360.0
+            hop = max(1, n // 2)
+            out["windows"][w] = {
+                "t": t[n - 1::hop],                         # window end times
+                "rps": rps[::hop],
+                "peak_rps": float(rps.max()) if len(rps) else 0.0,
+                "p_rps": float(np.percentile(rps, PERCENTILE)) if len(rps) else 0.0,
+            }
+        return out
+
+    def summary(self, start_ms: Optional[int], end_ms: Optional[int],
+                analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """ball_summary fields (unchanged) plus percentile, axis and windowed peaks."""
+        duration_s = 0.0
+        if start_ms is not None and end_ms is not None and end_ms >= start_ms:
+            duration_s = (end_ms - start_ms) / 1000.0
+        a = analysis if analysis is not None else self.finish(start_ms, end_ms)
+
+        if self.samples > 0 and duration_s > 0.0:
+            avg_rev_per_sec = float(a["omega_deg_s"].mean()) / 360.0
+            total_revolutions = a["revolutions"]
+        else:
+            avg_rev_per_sec = 0.0
+            total_revolutions = 0.0
+
+        return {
+            "t_start_ms": int(start_ms) if start_ms is not None else None,
+            "t_end_ms":   int(end_ms) if end_ms is not None else None,
+            "duration_s": duration_s,
+            "samples": self.samples,
+            "avg_rev_per_sec": avg_rev_per_sec,
+            "avg_spin_rpm": avg_rev_per_sec * 60.0,
+            "total_revolutions": total_revolutions,
+            "omega_deg_s_peak": self.peak_omega_deg_s,
+            "spin_rps_peak": self.peak_omega_deg_s / 360.0,
+            "spin_rpm_peak": (self.peak_omega_deg_s / 360.0) * 60.0,
+            f"omega_deg_s_p{PERCENTILE:g}": a["omega_p"],
+            f"spin_rps_p{PERCENTILE:g}": a["omega_p"] / 360.0,
+            "spin_axis": a["axis"],
+            "spin_windows": {
+                f"{w:g}s": {"peak_rps": v["peak_rps"], f"p{PERCENTILE:g}_rps": v["p_rps"]}
+                for w, v in a["windows"].items()
+            },
+        }
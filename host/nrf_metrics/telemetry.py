@@ -0,0 +1,280 @@
+# telemetry.py
+"""
+Hot-path instrumentation for recordings: notify handlers, pull pipelines and the
+JSONL writer report into one process-wide registry, readable as Prometheus text
+over a local HTTP endpoint or dumped periodically to JSONL.
+
+    telemetry.enable()
+    telemetry.serve(9108)                        # GET /metrics (Prometheus), /metrics.json
+    telemetry.JSONLDumper("metrics.jsonl", 5.0)  # or a snapshot + per-second rates every 5 s
+
+Disabled by default. Instrumented objects ask for their metric handles once, when
+they are created (device(), writer()); while disabled they get None and the hot
+path costs a single `is not None` check. Enable before starting a recording.
+
+Counters are plain attribute updates (each handle is only written from one thread:
+the event loop for notify/pull, the writer thread for JSONLinesWriter), so reads
+from the HTTP / dump threads may be a moment stale but never block the writers.
+"""
+import bisect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_enabled = False
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+def enabled() -> bool:
+    return _enabled
+
+# =========================== Metric Types ===========================
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n: float = 1) -> None:
+        self.value += n
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, v: float) -> None:
+        self.value = v
+
+class Histogram:
+    """Fixed upper bounds; counts are per bucket (made cumulative when exported)."""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS_S):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)    # last = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (inf if beyond the last bound)."""
+        if not self.count:
+            return 0.0
+        target, acc = q * self.count, 0
+        for bound, c in zip(self.bounds + (float("inf"),), self.counts):
+            acc += c
+            if acc >= target:
+                return bound
+        return float("inf")
+
+_TYPES = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}
+
+class Registry:
+    """name -> (type, help, {label values: metric})."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families: Dict[str, Tuple[type, str, Tuple[str, ...], Dict[Tuple[str, ...], Any]]] = {}
+
+    def get(self, kind: type, name: str, help: str, labels: Dict[str, str]) -> Any:
+        keys, values = tuple(labels), tuple(str(v) for v in labels.values())
+        with self._lock:
+            fam = self._families.setdefault(name, (kind, help, keys, {}))
+            if fam[0] is not kind or fam[2] != keys:
+                raise ValueError(f"metric {name} already registered with another type/labels")
+            m = fam[3].get(values)
+            if m is None:
+                m = fam[3][values] = kind()
+            return m
+
+    def clear(self) -> None:
+        with self._lock:
+            self._families.clear()
+
+    def _items(self):
+        with self._lock:
+            return [(name, kind, help, keys, list(children.items()))
+                    for name, (kind, help, keys, children) in sorted(self._families.items())]
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """{name: [{"labels": {...}, "value": v} | {"labels", "count", "sum", "buckets"}]}."""
+        out: Dict[str, List[Dict[str, Any]]] = {}
+        for name, kind, _, keys, children in self._items():
+            rows = out[name] = []
+            for values, m in children:
+                row: Dict[str, Any] = {"labels": dict(zip(keys, values))}
+                if kind is Histogram:
+                    row.update(count=m.count, sum=m.sum,
+                               buckets=dict(zip([*map(str, m.bounds), "+Inf"], m.counts)))
+                else:
+                    row["value"] = m.value
+                rows.append(row)
+        return out
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for name, kind, help, keys, children in self._items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {_TYPES[kind]}")
+            for values, m in children:
+                lbl = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(keys, values))
+                if kind is Histogram:
+                    acc = 0
+                    for bound, c in zip([*map(_fmt, m.bounds), "+Inf"], m.counts):
+                        acc += c
+                        sep = "," if lbl else ""
+                        lines.append(f'{name}_bucket{{{lbl}{sep}le="{bound}"}} {acc}')
+                    lines.append(f"{name}_sum{_braces(lbl)} {_fmt(m.sum)}")
+                    lines.append(f"{name}_count{_braces(lbl)} {m.count}")
+                else:
+                    lines.append(f"{name}{_braces(lbl)} {_fmt(m.value)}")
+        return "\n".join(lines) + "\n"
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _braces(lbl: str) -> str:
+    return f"{{{lbl}}}" if lbl else ""
+
+def _fmt(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+REGISTRY = Registry()
+
+# =========================== Instrument Handles ===========================
+
+class DeviceMetrics:
+    """Per-device handles for the notify handler and the pull pipeline."""
+    def __init__(self, device: str, registry: Registry = REGISTRY):
+        lbl = {"device": device}
+        g = registry.get
+        self.notifications = g(Counter, "nrf_notifications_total", "BLE notifications received", lbl)
+        self.notify_bytes = g(Counter, "nrf_notify_bytes_total", "BLE notification payload bytes", lbl)
+        self.batch_errors = g(Counter, "nrf_batch_errors_total", "Short or overrun BIN10 batches", lbl)
+        self.pulls = g(Counter, "nrf_pulls_total", "Pull commands written", lbl)
+        self.batches = g(Counter, "nrf_batches_total", "Batches received (BATCH_DONE)", lbl)
+        self.frames = g(Counter, "nrf_frames_total", "Frames received", lbl)
+        self.timeouts = g(Counter, "nrf_pull_timeouts_total", "Pulls with no batch within the timeout", lbl)
+        self.retries = g(Counter, "nrf_pull_retries_total", "Pulls re-issued after a timeout or write error", lbl)
+        self.write_errors = g(Counter, "nrf_pull_write_errors_total", "Failed or timed-out pull writes", lbl)
+        self.latency = g(Histogram, "nrf_pull_latency_seconds", "Pull command to BATCH_DONE latency", lbl)
+        self.rto = g(Gauge, "nrf_pull_rto_seconds", "Current pull retransmission timeout", lbl)
+        self.queue_depth = g(Gauge, "nrf_pull_queue_depth", "Batches waiting for the consumer", lbl)
+        self.consume = g(Histogram, "nrf_consume_seconds", "Time to process one batch (decode/JSON/disk)", lbl)
+
+    def notify(self, nbytes: int) -> None:
+        self.notifications.value += 1
+        self.notify_bytes.value += nbytes
+
+class WriterMetrics:
+    """Handles for one JSONLinesWriter (label: file name)."""
+    def __init__(self, name: str, registry: Registry = REGISTRY):
+        lbl = {"writer": name}
+        g = registry.get
+        self.records = g(Counter, "nrf_writer_records_total", "Records written", lbl)
+        self.bytes = g(Counter, "nrf_writer_bytes_total", "Bytes written", lbl)
+        self.dropped = g(Counter, "nrf_writer_dropped_total", "Records dropped (on_full=drop)", lbl)
+        self.queue_depth = g(Gauge, "nrf_writer_queue_depth", "Records waiting for the writer thread", lbl)
+        self.flush = g(Histogram, "nrf_writer_flush_seconds", "Write + sync latency per flush", lbl)
+
+def device(name: str) -> Optional[DeviceMetrics]:
+    """Metric handles for a device, or None while telemetry is disabled."""
+    return DeviceMetrics(name) if _enabled else None
+
+def writer(name: str) -> Optional[WriterMetrics]:
+    """Metric handles for a writer, or None while telemetry is disabled."""
+    return WriterMetrics(name) if _enabled else None
+
+# =========================== Exporters ===========================
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] in ("/metrics", "/"):
+            body = self.registry.prometheus().encode()
+            ctype = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.split("?")[0] == "/metrics.json":
+            body = json.dumps(self.registry.snapshot()).encode()
+            ctype = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def serve(port: int = 9108, host: str = "127.0.0.1", registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread; .shutdown() to stop."""
+    handler = type("Handler", (_Handler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="telemetry-http", daemon=True).start()
+    print(f"[METRICS] serving http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+def _counter_totals(snap: Dict[str, List[Dict[str, Any]]]) -> Dict[Tuple[str, str], float]:
+    return {(name, json.dumps(r["labels"], sort_keys=True)): r["value"]
+            for name, rows in snap.items() if name.endswith("_total") for r in rows}
+
+class JSONLDumper:
+    """
+    Append {"timestamp", "metrics": snapshot, "rates": {name: [{"labels", "per_s"}]}} to
+    `path` every `interval_s` from a daemon thread (rates = counter deltas / interval).
+    """
+    def __init__(self, path: str, interval_s: float = 5.0, registry: Registry = REGISTRY):
+        self.path = path
+        self.interval_s = interval_s
+        self.registry = registry
+        self._stop = threading.Event()
+        self._prev: Dict[Tuple[str, str], float] = {}
+        self._prev_t = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="telemetry-dump", daemon=True)
+        self._thread.start()
+
+    def dump(self) -> Dict[str, Any]:
+        snap = self.registry.snapshot()
+        now = time.monotonic()
+        dt = max(now - self._prev_t, 1e-9)
+        totals = _counter_totals(snap)
+        rates: Dict[str, List[Dict[str, Any]]] = {}
+        for (name, labels), v in totals.items():
+            rates.setdefault(name, []).append(
+                {"labels": json.loads(labels), "per_s": (v - self._prev.get((name, labels), 0)) / dt})
+        self._prev, self._prev_t = totals, now
+        rec = {"timestamp": time.time(), "metrics": snap, "rates": rates}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+        return rec
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self.dump()
+
+    def close(self):
+        """Stop the thread and write a final record."""
+        self._stop.set()
+        self._thread.join()
+        self.dump()
@@ -0,0 +1,303 @@
+# timeline.py
+"""
+Common host timeline for multi-device sessions.
+
+  ClockAligner   online fit host_s = offset + (1 + drift) * dev_s per device
+                 (weighted least squares with exponential forgetting, O(1) state)
+  StreamMerger   push-based heap merge with a bounded reorder window (live)
+  merge_streams  pull-based k-way heap merge of time-ordered sources (offline)
+  Timeline       aligners + StreamMerger fed by emit_batch_json during recording
+  merge_sessions merged stream from per-device session files (session_file.py)
+
+Insoles are aligned from (last device time in batch, host receive time) pairs, so the
+mapping carries the BLE transport latency as a constant bias common to all devices.
+The ball has no per-frame time: its frames are spread uniformly between its start/end
+ms, anchored to the host times at which start_r / stop_r were written. Because the ball
+is only drained after stop, it joins the merge offline (merge_sessions).
+"""
+import heapq
+import itertools
+import math
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .session_file import SessionReader
+
+# =========================== Clock Alignment ===========================
+
+class ClockAligner:
+    """
+    Device-to-host clock mapping, refitted on every observation.
+    `decay` (0 < decay <= 1) down-weights old pairs so slow drift changes are tracked;
+    1.0 is an ordinary least-squares fit over the whole session.
+    """
+    def __init__(self, decay: float = 0.999):
+        self.decay = decay
+        self.n = 0
+        self._x0 = self._y0 = 0.0          # first pair; fit is done on offsets from it
+        self._s0 = self._sx = self._sy = self._sxx = self._sxy = 0.0
+        self._a = 0.0                       # host - y0 at dev == x0
+        self._b = 1.0                       # host seconds per device second
+
+    def observe(self, dev_s: float, host_s: float) -> None:
+        if self.n == 0:
+            self._x0, self._y0 = float(dev_s), float(host_s)
+        x, y, k = float(dev_s) - self._x0, float(host_s) - self._y0, self.decay
+        self._s0 = k * self._s0 + 1.0
+        self._sx = k * self._sx + x
+        self._sy = k * self._sy + y
+        self._sxx = k * self._sxx + x * x
+        self._sxy = k * self._sxy + x * y
+        self.n += 1
+        den = self._s0 * self._sxx - self._sx * self._sx
+        if self.n >= 2 and den > 1e-12 * max(1.0, self._s0 * self._sxx):
+            self._b = (self._s0 * self._sxy - self._sx * self._sy) / den
+        self._a = (self._sy - self._b * self._sx) / self._s0
+
+    def to_host(self, dev_s):
+        """Host time for device time(s) (scalar or array)."""
+        if isinstance(dev_s, np.ndarray):
+            return self._y0 + self._a + self._b * (dev_s - self._x0)
+        return self._y0 + self._a + self._b * (float(dev_s) - self._x0)
+
+    @property
+    def offset_s(self) -> float:
+        """Host time at device time 0."""
+        return float(self.to_host(0.0))
+
+    @property
+    def drift_ppm(self) -> float:
+        return (self._b - 1.0) * 1e6
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"offset_s": self.offset_s, "scale": self._b, "drift_ppm": self.drift_ppm,
+                "observations": self.n}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, float]) -> "ClockAligner":
+        al = cls()
+        al._a, al._b, al.n = float(d["offset_s"]), float(d["scale"]), int(d.get("observations", 0))
+        return al
+
+    @classmethod
+    def from_anchors(cls, dev_s: Iterable[float], host_s: Iterable[float]) -> "ClockAligner":
+        al = cls(decay=1.0)
+        for x, y in zip(dev_s, host_s):
+            al.observe(x, y)
+        return al
+
+# =========================== Merging ===========================
+
+class StreamMerger:
+    """
+    Push-based time-ordered merge of several live sources.
+
+    Items are held in one heap and released once every open source has advanced
+    past them (watermark), or once they are more than `window_s` older than the newest
+    item seen: the buffer never spans more than the reorder window, whatever the
+    session length. Items arriving behind what was already released are still emitted
+    and counted in `late`. Not thread-safe on its own (Timeline serializes access).
+    """
+    def __init__(self, window_s: float = 0.5, emit: Optional[Callable[[float, str, Any], None]] = None):
+        self.window_s = window_s
+        self.emit = emit
+        self._heap: List[Tuple[float, int, str, Any]] = []
+        self._seq = itertools.count()
+        self._last: Dict[str, float] = {}     # open source -> newest time pushed
+        self.newest = -math.inf
+        self.released_t = -math.inf
+        self.released = 0
+        self.late = 0
+        self.max_buffered = 0
+
+    def add_source(self, source: str) -> None:
+        """Declare a source up front so the merge waits for it (within the window)."""
+        self._last.setdefault(source, -math.inf)
+
+    def push(self, source: str, t: float, item: Any) -> List[Tuple[float, str, Any]]:
+        return self.push_many(source, (t,), (item,))
+
+    def push_many(self, source: str, times: Iterable[float], items: Iterable[Any]) -> List[Tuple[float, str, Any]]:
+        last = self._last.get(source, -math.inf)
+        for t, item in zip(times, items):
+            heapq.heappush(self._heap, (t, next(self._seq), source, item))
+            if t > last:
+                last = t
+        self._last[source] = last
+        if last > self.newest:
+            self.newest = last
+        self.max_buffered = max(self.max_buffered, len(self._heap))
+        return self._release()
+
+    def close(self, source: str) -> List[Tuple[float, str, Any]]:
+        """Source finished: stop waiting for it."""
+        self._last.pop(source, None)
+        return self._release()
+
+    def flush(self) -> List[Tuple[float, str, Any]]:
+        return self._release(math.inf)
+
+    def _release(self, horizon: Optional[float] = None) -> List[Tuple[float, str, Any]]:
+        if horizon is None:
+            watermark = min(self._last.values()) if self._last else math.inf
+            horizon = max(watermark, self.newest - self.window_s)
+        out = []
+        heap = self._heap
+        while heap and heap[0][0] <= horizon:
+            t, _, source, item = heapq.heappop(heap)
+            if t < self.released_t:
+                self.late += 1
+            else:
+                self.released_t = t
+            out.append((t, source, item))
+        self.released += len(out)
+        if self.emit is not None:
+            for rec in out:
+                self.emit(*rec)
+        return out
+
+def reorder(items: Iterable[Tuple[float, Any]], window_s: float) -> Iterator[Tuple[float, Any]]:
+    """Sort a nearly ordered (t, item) stream, holding at most `window_s` of items."""
+    heap: List[Tuple[float, int, Any]] = []
+    seq = itertools.count()
+    newest = -math.inf
+    for t, item in items:
+        heapq.heappush(heap, (t, next(seq), item))
+        newest = max(newest, t)
+        while heap and heap[0][0] <= newest - window_s:
+            t0, _, it = heapq.heappop(heap)
+            yield t0, it
+    while heap:
+        t0, _, it = heapq.heappop(heap)
+        yield t0, it
+
+def merge_streams(streams: Dict[str, Iterable[Tuple[float, Any]]],
+                  window_s: float = 0.0) -> Iterator[Tuple[float, str, Any]]:
+    """
+    k-way heap merge of per-source (t, item) streams into one (t, source, item) stream.
+    Memory is one head per source (plus `window_s` of items per source when > 0, for
+    sources that are only approximately ordered).
+    """
+    iters = {name: iter(reorder(s, window_s) if window_s > 0 else s) for name, s in streams.items()}
+    heap: List[Tuple[float, int, str, Any]] = []
+    seq = itertools.count()
+    for name, it in iters.items():
+        for t, item in itertools.islice(it, 1):
+            heap.append((t, next(seq), name, item))
+    heapq.heapify(heap)
+    while heap:
+        t, _, name, item = heap[0]
+        yield t, name, item
+        nxt = next(iters[name], None)
+        if nxt is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (nxt[0], next(seq), name, nxt[1]))
+
+# =========================== Live Timeline ===========================
+
+class Timeline:
+    """
+    Per-device ClockAligners + one StreamMerger. emit_batch_json calls add_insole()
+    for every batch (state.timeline); merged records go to `writer` as
+    {"timestamp": host_s, "device", "dev_t", "analog": [...]}. Thread-safe.
+    """
+    def __init__(self, writer: Any = None, window_s: float = 0.5, decay: float = 0.999):
+        self.writer = writer
+        self.decay = decay
+        self.aligners: Dict[str, ClockAligner] = {}
+        self.merger = StreamMerger(window_s, emit=self._emit if writer is not None else None)
+        self.lock = threading.Lock()
+
+    def aligner(self, device: str) -> ClockAligner:
+        al = self.aligners.get(device)
+        if al is None:
+            al = self.aligners[device] = ClockAligner(self.decay)
+        return al
+
+    def add_source(self, device: str) -> None:
+        with self.lock:
+            self.merger.add_source(device)
+
+    def add_insole(self, device: str, dev_s: List[float], host_ts: float, analog: List[List[int]]) -> None:
+        if not dev_s:
+            return
+        with self.lock:
+            al = self.aligner(device)
+            al.observe(dev_s[-1], host_ts)
+            host = al.to_host(np.asarray(dev_s, dtype=np.float64)).tolist()
+            self.merger.push_many(device, host, ({"dev_t": t, "analog": a} for t, a in zip(dev_s, analog)))
+
+    def close(self, device: str) -> None:
+        with self.lock:
+            self.merger.close(device)
+
+    def flush(self) -> None:
+        with self.lock:
+            self.merger.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        m = self.merger
+        return {"released": m.released, "late": m.late, "max_buffered": m.max_buffered,
+                "clocks": {d: al.to_dict() for d, al in self.aligners.items()}}
+
+    def _emit(self, t: float, device: str, item: Dict[str, Any]) -> None:
+        self.writer.append({"timestamp": t, "device": device, **item})
+
+# =========================== Offline (session files) ===========================
+
+def session_stream(reader: SessionReader, chunk_frames: int = 4096) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """
+    (host_s, item) stream for one session file, using the clock fit stored in its
+    trailer ("clock"), or for the ball the start/stop anchors
+    (t_start_ms/t_end_ms + host_start_ts/host_stop_ts).
+    """
+    h, meta = reader.header, reader.meta
+    n = reader.n_frames
+    if reader.kind == "ball":
+        t0, t1 = meta.get("t_start_ms"), meta.get("t_end_ms")
+        hs, he = meta.get("host_start_ts"), meta.get("host_stop_ts")
+        if None in (t0, t1, hs, he) or n == 0:
+            return
+        al = ClockAligner.from_anchors((t0 / 1000.0, t1 / 1000.0), (hs, he))
+        period = (t1 - t0) / 1000.0 / n
+        for first in range(0, n, chunk_frames):
+            block = reader.frames[first:first + chunk_frames]
+            dev = t0 / 1000.0 + np.arange(first, first + len(block)) * period
+            for t, d, row in zip(al.to_host(dev).tolist(), dev.tolist(), block.tolist()):
+                yield t, {"dev_t": d, "imu": row}
+        return
+    units = h.get("units_per_s") or 1.0
+    if "clock" in meta:
+        al = ClockAligner.from_dict(meta["clock"])
+    else:
+        # no fit recorded: anchor the first frame at the file's creation time
+        al = ClockAligner()
+        if n:
+            al.observe(float(reader.frames["ts"][0]) / units, h.get("created") or 0.0)
+    for first in range(0, n, chunk_frames):
+        block = reader.frames[first:first + chunk_frames]
+        dev = block["ts"] / units
+        for t, d, row in zip(al.to_host(dev).tolist(), dev.tolist(), block["ch"].tolist()):
+            yield t, {"dev_t": d, "analog": row}
+
+def merge_sessions(paths: Iterable[str], writer: Any = None,
+                   window_s: float = 0.0) -> Iterator[Dict[str, Any]]:
+    """
+    Time-ordered merged records from several session files. Yields
+    {"timestamp", "device", "dev_t", "analog" | "imu"}; also appended to `writer` if given.
+    """
+    readers = [SessionReader(p) for p in paths]
+    try:
+        names = [r.header.get("device") or f"dev{i}" for i, r in enumerate(readers)]
+        streams = {name: session_stream(r) for name, r in zip(names, readers)}
+        for t, device, item in merge_streams(streams, window_s):
+            rec = {"timestamp": t, "device": device, **item}
+            if writer is not None:
+                writer.append(rec)
+            yield rec
+    finally:
+        for r in readers:
+            r.close()
@@ -0,0 +1,72 @@
+import asyncio
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from nrf_metrics import session
+from nrf_metrics.analyze import analyze_many, find_sessions, spread_batches
+from nrf_metrics.json_writer import JSONLinesWriter
+from nrf_metrics.metrics import detect_events
+from nrf_metrics.schema import SCHEMA_BATCH, SCHEMA_SAMPLE
+from nrf_metrics.segments import RotatingJSONLinesWriter
+from nrf_metrics.session_file import SessionWriter
+from nrf_metrics.sim import SimPeripheral, simulate
+
+DEVICES = {"left": "Insole_L", "ball": "SmartBall"}
+
+def record(tmp_path, name, schema, writer_cls=JSONLinesWriter, **kw):
+    sims = [SimPeripheral("Insole_L", "insole", speed=None, rate_hz=100, duration_s=5.0, seed=1),
+            SimPeripheral("SmartBall", "ball", speed=None, rate_hz=100, duration_s=2.0)]
+    sinks = {"left": SessionWriter(str(tmp_path / f"{name}_left.nrfs"), "left_insole", units_per_s=1000.0),
+             "ball": SessionWriter(str(tmp_path / f"{name}_ball.nrfs"), "ball")}
+
+    async def run():
+        stop = asyncio.Event()
+        stop.set()
+        with simulate(*sims), writer_cls(str(tmp_path / f"{name}.jsonl"), **kw) as w:
+            return await session.run_session(w, stop, devices=DEVICES, schema=schema, raw_sinks=sinks)
+    res = asyncio.run(run())
+    for s in sinks.values():
+        s.close()
+    return res
+
+def test_spread_batches():
+    t = np.array([1.0, 1.0, 2.0, 2.0, 2.0, 2.0, 3.0, 3.0])
+    assert spread_batches(t).tolist() == pytest.approx([0.75, 1.0, 1.25, 1.5, 1.75, 2.0, 2.5, 3.0])
+
+def test_batch_analysis_matches_live_result(tmp_path):
+    res = record(tmp_path, "a", SCHEMA_BATCH)
+    record(tmp_path, "b", SCHEMA_SAMPLE, RotatingJSONLinesWriter, max_bytes=64 * 1024, compression="gzip")
+    (tmp_path / "junk.jsonl").write_text("not json\n")
+    (tmp_path / "bad.nrfs").write_bytes(b"NRFSESS1" + b"\xff" * 4)
+
+    paths = find_sessions([str(tmp_path)])
+    names = sorted(p.rsplit("/", 1)[1] for p in paths)
+    assert names == ["a.jsonl", "a_ball.nrfs", "a_left.nrfs", "b.jsonl", "b_ball.nrfs",
+                     "b_left.nrfs", "bad.nrfs", "junk.jsonl"]           # segments folded into b.jsonl
+
+    out = tmp_path / "summary.csv"
+    rows = analyze_many(paths, str(out), workers=2, progress=False)
+    by = {r["path"].rsplit("/", 1)[1]: r for r in rows}
+    live = detect_events(res["left"]["t"], res["left"]["forces_by_label"])
+    steps = len(live["HS"])
+    assert steps >= 3
+    for name in ("a.jsonl", "a_left.nrfs", "b.jsonl"):
+        assert by[name]["error"] is None and by[name]["left_steps"] == steps
+        assert by[name]["left_samples"] == 500
+    assert by["a_left.nrfs"]["left_duration_s"] == pytest.approx(res["left"]["t"][-1] - res["left"]["t"][0])
+    summary = res["ball"]["ball_summary"]
+    for name in ("a.jsonl", "a_ball.nrfs"):
+        assert by[name]["ball_samples"] == 200
+        assert by[name]["ball_total_revolutions"] == pytest.approx(summary["total_revolutions"])
+    assert by["bad.nrfs"]["error"] and by["junk.jsonl"]["records"] == 0
+
+    table = list(csv.DictReader(out.open()))
+    assert [r["path"] for r in table] == paths
+    assert all(float(r["wall_s"]) > 0 for r in table)
+
+    analyze_many(paths[:2], str(tmp_path / "s.jsonl"), workers=1, progress=False)
+    assert len((tmp_path / "s.jsonl").read_text().splitlines()) == 2
+    assert json.loads((tmp_path / "s.jsonl").read_text().splitlines()[0])["path"] == paths[0]
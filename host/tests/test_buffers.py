@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from nrf_metrics.buffers import Column, ForcesView, InsoleBuffer, force_rows
+
+LABELS = [f"S{i}" for i in range(8)]
+
+def batch(i, n=100):
+    ts = np.arange(i * n, (i + 1) * n, dtype=np.uint32)
+    adc = (ts[:, None] + np.arange(8)).astype(np.uint16)
+    return ts, ts / 1000.0, adc, adc * 0.5
+
+def test_column_grows_and_views_are_stable():
+    c = Column(np.float64, capacity=4)
+    c.extend([1.0, 2.0, 3.0])
+    v = c.view()
+    c.extend(np.arange(10.0))
+    assert len(c) == 13 and c.nbytes >= 13 * 8
+    assert v.tolist() == [1.0, 2.0, 3.0] and c.view()[-1] == 9.0
+
+def test_buffer_spills_to_memmap_without_changing_data(tmp_path):
+    buf = InsoleBuffer(LABELS, spill_bytes=256 * 1024, spill_dir=str(tmp_path))
+    ref = [batch(i) for i in range(50)]
+    for i, b in enumerate(ref):
+        buf.append(*b)
+        if i == 0:
+            assert not buf.spilled
+    assert buf.spilled and isinstance(buf.force, np.memmap)
+    assert len(buf) == 5000 and buf.stats()["samples"] == 5000
+    for k, col in enumerate((buf.dev_ts, buf.t, buf.adc, buf.force)):
+        assert np.array_equal(col, np.concatenate([b[k] for b in ref]))
+    assert buf.adc.dtype == np.uint16 and buf.adc.shape == (5000, 8)
+    assert list(tmp_path.iterdir()) == []                        # unlinked temp files
+    f = buf.force
+    buf.close()
+    assert f[-1, -1] == ref[-1][3][-1, -1]
+
+def test_never_spills_without_limit():
+    buf = InsoleBuffer(LABELS, spill_bytes=None)
+    for i in range(20):
+        buf.append(*batch(i))
+    assert not buf.spilled and len(buf) == 2000
+
+def test_forces_view_is_list_like():
+    buf = InsoleBuffer(LABELS)
+    buf.append(*batch(0, 3))
+    fv = ForcesView(buf.force, LABELS)
+    assert len(fv) == 3 and fv[-1] == dict(zip(LABELS, (buf.adc[2] * 0.5).tolist()))
+    assert [d["S0"] for d in fv] == [0.0, 0.5, 1.0] and len(fv[1:]) == 2
+    with pytest.raises(IndexError):
+        fv[3]
+    F, labels = force_rows(fv)
+    assert np.shares_memory(F, buf.force) and labels == LABELS
+    assert force_rows(fv, LABELS[::-1]) is None and force_rows(list(fv)) is None
@@ -0,0 +1,96 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from nrf_metrics import calibration
+from nrf_metrics.calibration import (ADC_MAX, CalibrationProfile, ChannelCurve, get_active_profile,
+                                     load_profile, resolve_profile, save_profile, set_active_profile)
+
+def old_calibrate(analog_val):
+    """The per-sample formula the lookup tables replaced."""
+    if analog_val >= 4095 or analog_val == 0:
+        return 0.0, 0.0
+    resistance = (analog_val / (4095 - analog_val)) * 3.3
+    force = 156.6869 * (resistance ** -1.839)
+    return resistance, min(max(force, 0.0), 30.0)
+
+@pytest.fixture
+def restore_active():
+    prev = get_active_profile()
+    yield
+    set_active_profile(prev)
+
+def test_tables_match_old_formula():
+    prof = CalibrationProfile.default()
+    want = np.array([old_calibrate(a) for a in range(ADC_MAX + 1)])
+    for ch in range(len(prof.labels)):
+        assert np.array_equal(prof.resistance_lut[ch], want[:, 0])
+        assert np.array_equal(prof.force_lut[ch], want[:, 1])
+    assert prof.force(0, 0) == prof.force(ADC_MAX, 0) == 0.0
+    assert prof.force(1, 0) == 30.0                          # clamped at f_max
+    assert prof.force(ADC_MAX - 1, 0) == want[ADC_MAX - 1, 1]
+
+def test_scalar_and_batch_lookups():
+    curves = [ChannelCurve(f_max=10.0 + i, area_cm2=1.0 + i) for i in range(8)]
+    prof = CalibrationProfile([f"c{i}" for i in range(8)], curves)
+    adc = np.random.default_rng(0).integers(0, ADC_MAX + 1, size=(50, 8))
+    adc[0] = ADC_MAX + 100                                   # out of range: treated as full scale
+    force = prof.force(adc)
+    assert force.shape == (50, 8)
+    for i in (0, 1, 49):
+        for ch in range(8):
+            assert force[i, ch] == prof.force(min(int(adc[i, ch]), ADC_MAX), ch)
+            assert prof.pressure(adc)[i, ch] == pytest.approx(force[i, ch] / ((1.0 + ch) * 1e-4))
+    assert force.max() <= 17.0 and np.all(force[0] == 0.0)
+
+def test_save_load_round_trip(tmp_path):
+    curves = [ChannelCurve(a=100.0 + i, f_max=20.0) for i in range(8)]
+    prof = CalibrationProfile([f"c{i}" for i in range(8)], curves, serial="SN42")
+    path = save_profile(prof, str(tmp_path))
+    loaded = load_profile("SN42", str(tmp_path))
+    assert loaded.to_dict() == prof.to_dict()
+    assert np.array_equal(loaded.force_lut, prof.force_lut)
+    assert resolve_profile("SN42", str(tmp_path)).to_dict() == prof.to_dict()
+    assert resolve_profile(path).to_dict() == prof.to_dict()
+    assert resolve_profile(prof) is prof and resolve_profile(None) is None
+    with pytest.raises(FileNotFoundError):
+        load_profile("missing", str(tmp_path))
+    with pytest.raises(ValueError):
+        save_profile(CalibrationProfile.default(), str(tmp_path))
+
+def test_from_dict_rejects_wrong_channel_count():
+    d = CalibrationProfile.default().to_dict()
+    d["labels"] = d["labels"][:3]
+    with pytest.raises(ValueError, match="3 labels"):
+        CalibrationProfile.from_dict(d)
+
+def test_set_active_profile_changes_calibrate(restore_active):
+    from nrf_metrics import insole
+    before = insole.calibrate(1000, 0)
+    assert before == old_calibrate(1000)
+    labels = get_active_profile().labels
+    set_active_profile(CalibrationProfile(labels, [ChannelCurve(a=1.0, f_max=0.5)] * len(labels)))
+    r, f = insole.calibrate(1000, 0)
+    assert r == before[0] and f == pytest.approx(min(1.0 * r ** -1.839, 0.5)) and f != before[1]
+    assert calibration.get_active_profile().force(1000, 0) == f
+
+def test_session_uses_per_insole_calibration(tmp_path, restore_active):
+    from nrf_metrics import session
+    from nrf_metrics.json_writer import JSONLinesWriter
+    from nrf_metrics.sim import SimPeripheral, simulate
+    labels = get_active_profile().labels
+    save_profile(CalibrationProfile(labels, [ChannelCurve(f_max=1.0)] * len(labels), serial="SNL"),
+                 str(tmp_path))
+
+    async def run():
+        stop = asyncio.Event()
+        stop.set()
+        with simulate(SimPeripheral("Insole_L", "insole", speed=None, rate_hz=100, duration_s=0.5, seed=1),
+                      SimPeripheral("Insole_R", "insole", speed=None, rate_hz=100, duration_s=0.5, seed=2)), \
+                JSONLinesWriter(str(tmp_path / "s.jsonl")) as w:
+            return await session.run_session(w, stop, devices={"left": "Insole_L", "right": "Insole_R"},
+                                             calibration={"left": str(tmp_path / "SNL.json")})
+
+    res = asyncio.run(run())
+    assert np.max(res["left"]["force"]) <= 1.0 < np.max(res["right"]["force"])
@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from nrf_metrics import cli
+
+HOST = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("bleak", "rich", "numpy", "nrf_metrics.client", "nrf_metrics.session", "nrf_metrics.insole")
+
+def loaded_after(code):
+    """Heavy modules in sys.modules after running `code` in a fresh interpreter."""
+    probe = (f"import sys\nfrom nrf_metrics import cli\ntry:\n    {code}\nexcept SystemExit:\n    pass\n"
+             f"print([m for m in {HEAVY!r} if m in sys.modules])")
+    out = subprocess.run([sys.executable, "-c", probe], cwd=HOST, capture_output=True, text=True,
+                         timeout=60, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1].replace("'", '"'))
+
+@pytest.mark.parametrize("argv", [["--help"], ["record", "--help"], ["replay", "--help"],
+                                  ["log", "--help"], ["scan", "--help"]])
+def test_help_does_not_import_heavy_modules(argv):
+    assert loaded_after(f"cli.main({argv!r})") == []
+
+def test_analyze_does_not_import_ble_stack():
+    assert not {"bleak", "rich", "nrf_metrics.client"} & set(loaded_after("cli.main(['analyze', '--help'])"))
+
+def test_replay_is_offline(tmp_path):
+    log = tmp_path / "day.jsonl"
+    log.write_text("".join(json.dumps({"ts": 100.0 + i, "op": "imu_raw", "ax": i}) + "\n" for i in range(10)))
+    code = f"cli.main(['replay', {str(log)!r}, '--start', '2', '--end', '4', '--speed', '0'])"
+    assert not {"bleak", "rich", "nrf_metrics.client"} & set(loaded_after(code))
+
+def test_replay_range_to_file(tmp_path, capsys):
+    log = tmp_path / "day.jsonl"
+    log.write_text("".join(json.dumps({"ts": 100.0 + i, "ax": i}) + "\n" for i in range(10)))
+    assert cli.main(["replay", str(log), "--start", "2", "--end", "4", "--speed", "0"]) == 0
+    assert [json.loads(l)["ax"] for l in capsys.readouterr().out.splitlines()] == [2, 3, 4]
+    out = tmp_path / "cut.jsonl"
+    cli.main(["replay", str(log), "--end", "1", "--speed", "0", "-o", str(out)])
+    assert [json.loads(l)["ax"] for l in out.read_text().splitlines()] == [0, 1]
+
+def test_bare_options_default_to_log(monkeypatch):
+    seen = []
+    monkeypatch.setattr(cli, "cmd_log", lambda args: seen.append(args) or 0)
+    assert cli.main(["--save", "x.jsonl", "--once"]) == 0
+    assert seen[0].command == "log" and seen[0].save == "x.jsonl" and seen[0].once
+
+def test_record_all_with_simulated_devices(tmp_path, capsys):
+    from nrf_metrics import session  # noqa: F401  (imported so simulate() can patch it)
+    from nrf_metrics.sim import SimPeripheral, simulate
+    sims = [SimPeripheral("Insole_L", "insole", speed=None, rate_hz=100, duration_s=0.5, seed=1),
+            SimPeripheral("Insole_R", "insole", speed=None, rate_hz=100, duration_s=0.5, seed=2),
+            SimPeripheral("SmartBall", "ball", speed=None, rate_hz=100, duration_s=0.5)]
+    out = tmp_path / "s.jsonl"
+    with simulate(*sims):
+        assert cli.main(["record", "all", "-o", str(out), "--duration", "0",
+                         "--raw-dir", str(tmp_path / "raw")]) == 0
+    text = capsys.readouterr().out
+    assert "[RECORD] left: 50 samples" in text and "[RECORD] ball: 50 samples" in text
+    assert sorted(os.listdir(tmp_path / "raw")) == ["ball.nrfs", "left_insole.nrfs", "right_insole.nrfs"]
+    assert out.stat().st_size > 0
+
+def test_record_calibration_option():
+    args = cli.build_parser().parse_args(["record", "all", "--calibration", "left=SN1",
+                                          "--calibration", "right=cal/r.json"])
+    assert args.calibration == ["left=SN1", "right=cal/r.json"]
+    with pytest.raises(SystemExit):
+        cli.build_parser().parse_args(["record", "all", "--calibration", "ball=SN1"])
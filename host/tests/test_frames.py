@@ -0,0 +1,17 @@
+import struct
+from nrf_metrics.frames import decode_insole, decode_ball, insole_tuples, ball_tuples
+
+def test_decode_insole_batch():
+    frames = [(1000 + i, tuple(range(i, i + 8))) for i in range(5)]
+    buf = b"".join(struct.pack("<I8H", ts, *vals) for ts, vals in frames)
+    arr = decode_insole(buf, 5)
+    assert arr["ts"].tolist() == [ts for ts, _ in frames]
+    assert arr["ch"].shape == (5, 8)
+    assert insole_tuples(arr) == frames
+
+def test_decode_ball_batch():
+    rows = [(1, -2, 3, -400, 500, -600), (7, 8, 9, 10, 11, 12)]
+    buf = b"".join(struct.pack("<6h", *r) for r in rows)
+    arr = decode_ball(buf)
+    assert arr.shape == (2, 6)
+    assert ball_tuples(arr) == rows
@@ -0,0 +1,33 @@
+import struct
+from nrf_metrics.frames import decode_insole, decode_ball
+from nrf_metrics.framing import BatchReassembler, BATCH, DONE, TIMING, OK, SHORT, OVERRUN
+
+def _payload(n):
+    return b"".join(struct.pack("<I8H", i, *([i] * 8)) for i in range(n))
+
+def test_reassembles_chunks_without_decoding_text():
+    r = BatchReassembler(20, decode_insole)
+    payload = _payload(5)
+    assert r.feed(b"BIN10:5") is None
+    for off in range(0, len(payload), 7):
+        assert r.feed(bytearray(payload[off:off + 7])) is None
+    assert r.feed(b"BATCH_DONE") == BATCH
+    assert r.last.status == OK and r.last.frames["ts"].tolist() == [0, 1, 2, 3, 4]
+    assert r.feed(b"Done") == DONE
+
+def test_short_and_overrun_batches_are_reported():
+    r = BatchReassembler(20, decode_insole)
+    r.feed(b"BIN10:3")
+    r.feed(_payload(2))
+    assert r.feed(b"BATCH_DONE") == BATCH
+    assert r.last.status == SHORT and len(r.last.frames) == 0 and r.short_batches == 1
+    r.feed(b"BIN10:1")
+    r.feed(_payload(2))
+    r.feed(b"BATCH_DONE")
+    assert r.last.status == OVERRUN and r.last.frames["ts"].tolist() == [0]
+
+def test_ball_timing_packet_vs_8_byte_header():
+    r = BatchReassembler(12, decode_ball, timing_len=8)
+    assert r.feed(struct.pack("<II", 100, 900)) == TIMING
+    assert r.timing == struct.pack("<II", 100, 900)
+    assert r.feed(b"BIN10:10") is None and r.in_batch
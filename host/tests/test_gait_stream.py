@@ -0,0 +1,45 @@
+import random
+from nrf_metrics.config import CHANNEL_LABELS
+from nrf_metrics.metrics import detect_events, temporal_metrics
+from nrf_metrics.gait_stream import StreamingGaitDetector, P2Quantile
+
+def _series(n=3000, rate=200.0, seed=7):
+    rng = random.Random(seed)
+    times, forces = [], []
+    for i in range(n):
+        t = i / rate
+        loaded = (t % 1.0) < 0.6
+        forces.append({l: (rng.uniform(5, 30) if loaded else rng.uniform(0, 0.5)) for l in CHANNEL_LABELS})
+        times.append(t)
+    return times, forces
+
+def test_matches_batch_with_fixed_threshold():
+    times, forces = _series()
+    batch = detect_events(times, forces, body_weight_N=700.0)
+    det = StreamingGaitDetector(body_weight_N=700.0, keep_cop=True)
+    det.update_batch(times, forces)
+    assert det.result() == batch
+    assert det.temporal() == temporal_metrics(times, batch["HS"], batch["TO"], batch["stance"])
+
+def test_auto_threshold_converges():
+    times, forces = _series()
+    batch = detect_events(times, forces, body_weight_N=None)
+    det = StreamingGaitDetector(body_weight_N=None)
+    det.update_batch(times, forces)
+    assert abs(det.threshold - batch["threshold"]) / batch["threshold"] < 0.05
+    assert det.result()["HS"] == batch["HS"]
+
+def test_p2_quantile():
+    rng = random.Random(1)
+    xs = [rng.random() for _ in range(20000)]
+    q = P2Quantile(0.95)
+    for x in xs:
+        q.add(x)
+    assert abs(q.value() - sorted(xs)[int(0.95 * len(xs))]) < 0.01
+
+def test_cop_only_kept_on_request():
+    times, forces = _series(n=500)
+    det = StreamingGaitDetector(body_weight_N=700.0)
+    det.update_batch(times, forces)
+    batch = detect_events(times, forces, body_weight_N=700.0)
+    assert det.COP == [] and det.result() == {**batch, "COP": []}
@@ -0,0 +1,42 @@
+import json
+import threading
+
+import pytest
+
+from nrf_metrics.json_writer import JSONLinesWriter
+
+def test_writer_drains_on_close(tmp_path):
+    path = tmp_path / "out.jsonl"
+    with JSONLinesWriter(str(path), durability="none", sync_interval_ms=10_000) as w:
+        for i in range(1000):
+            w.append({"i": i})
+    lines = path.read_text().splitlines()
+    assert [json.loads(l)["i"] for l in lines] == list(range(1000))
+
+def test_writer_flush_makes_records_visible(tmp_path):
+    path = tmp_path / "out.jsonl"
+    w = JSONLinesWriter(str(path), sync_interval_ms=10_000)
+    w.append({"a": 1})
+    assert w.flush(timeout=5.0)
+    assert path.read_text() == '{"a":1}\n'
+    w.close()
+    w.close()
+
+def test_flush_raises_after_writer_thread_died(tmp_path):
+    w = JSONLinesWriter(str(tmp_path / "out.jsonl"), queue_size=2, sync_interval_ms=10_000)
+    w.append({"bad": object()})                  # not JSON-serializable: kills the writer thread
+    w._thread.join(5.0)
+    result = []
+    t = threading.Thread(target=lambda: result.append(pytest.raises(TypeError, w.flush)), daemon=True)
+    t.start()
+    t.join(5.0)
+    assert not t.is_alive() and result
+    with pytest.raises(TypeError):
+        w.append({"a": 1})
+    while not w._queue.full():                  # full queue nobody will drain
+        w._queue.put_nowait({"a": 1})
+    t = threading.Thread(target=lambda: result.append(pytest.raises(TypeError, w.close)), daemon=True)
+    t.start()
+    t.join(5.0)
+    assert not t.is_alive() and len(result) == 2
+    w.close()                                   # already closed: no-op
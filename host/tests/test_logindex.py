@@ -0,0 +1,91 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from nrf_metrics.json_writer import JSONLinesWriter
+from nrf_metrics.logindex import LogIndex, extract_series, index_path, lttb, minmax
+from nrf_metrics.schema import insole_batch_record, iter_jsonl, session_header
+from nrf_metrics.segments import RotatingJSONLinesWriter
+
+LABELS = [f"S{i}" for i in range(8)]
+
+def imu(ts, i):
+    return {"ts": ts, "op": "imu_raw", "ax": i, "ay": -i, "az": 0, "gx": 0, "gy": 0, "gz": 0}
+
+def write(path, recs, writer=JSONLinesWriter, **kw):
+    with writer(str(path), durability="none", **kw) as w:
+        for r in recs:
+            w.append(r)
+
+def test_range_read_matches_filter(tmp_path):
+    path = tmp_path / "log.jsonl"
+    write(path, [imu(100.0 + i * 0.01, i) for i in range(3000)])
+    idx = LogIndex.open(str(path))
+    assert len(idx) == 3000 and idx.t_min == 100.0
+    got = [r["ax"] for r in idx.records(110.0, 115.0)]
+    assert got == [i for i in range(3000) if 110.0 <= 100.0 + i * 0.01 <= 115.0]
+    assert os.path.exists(index_path(str(path)))
+
+def test_cached_index_reused_and_extended(tmp_path):
+    path = tmp_path / "log.jsonl"
+    write(path, [imu(float(i), i) for i in range(100)])
+    LogIndex.open(str(path))
+    mtime = os.stat(index_path(str(path))).st_mtime_ns
+    assert len(LogIndex.open(str(path))) == 100
+    assert os.stat(index_path(str(path))).st_mtime_ns == mtime          # unchanged log: no rewrite
+    with open(path, "a") as f:
+        f.write(json.dumps(imu(100.0, 100)) + "\n" + '{"ts": 101.0, "op"')  # + a partial line
+    idx = LogIndex.open(str(path))
+    assert len(idx) == 101 and [r["ax"] for r in idx.records(99.5)] == [100]
+
+@pytest.mark.parametrize("compression", ["gzip", "zlib"])
+def test_segmented_compressed_log(tmp_path, compression):
+    path = tmp_path / "day.jsonl"
+    write(path, [imu(float(i), i) for i in range(2000)], writer=RotatingJSONLinesWriter,
+          max_bytes=8192, compression=compression, batch_bytes=1)
+    idx = LogIndex.open(str(path))
+    assert len(idx.files) > 3 and len(idx) == 2000
+    assert [r["ax"] for r in idx.records(1500.0, 1502.0)] == [1500, 1501, 1502]
+    assert sum(1 for _ in idx.records()) == sum(1 for _ in iter_jsonl(str(path)))
+
+def test_extract_series_all_record_kinds(tmp_path):
+    path = tmp_path / "mixed.jsonl"
+    analog = np.full((4, 8), 100)
+    force = np.arange(32.0).reshape(4, 8)
+    recs = [
+        session_header("left_insole", LABELS, 1000.0, ("force",), None, 10.0),
+        {**insole_batch_record("left_insole", 11.0, [0, 10, 20, 30], analog, force=force)},
+        {"timestamp": 11.5, "left_insole": None,
+         "right_insole": {"sensors": [{"label": l, "force": 2.0} for l in LABELS]}},
+        {"timestamp": 12.0, "device": "ball", "frames": [[1, 2, 3, 4, 5, 6]] * 2},
+        {"timestamp": 13.0, "ball": {"records": [dict(zip(("ax", "ay", "az", "gx", "gy", "gz"),
+                                                          [0, 0, 0, 7, 8, 9]))] * 2}},
+        {"ts": 14.0, "op": "imu_packed", "seq": 0, "n": 3, "t0_us": 0, "dt_us": 5000,
+         "samples": [dict(ax=i, ay=0, az=0, gx=0, gy=0, gz=0) for i in range(3)]},
+    ]
+    write(path, recs)
+    # the header is kept for a range that starts after it
+    s = extract_series(LogIndex.open(str(path)).records(10.5))
+    left = s["left_insole"]
+    assert left["t"].tolist() == pytest.approx([10.97, 10.98, 10.99, 11.0])
+    assert left["force"].shape == (4, 8) and left["labels"] == LABELS
+    assert s["right_insole"]["force"].tolist() == [[2.0] * 8]
+    assert s["ball"]["t"].tolist() == [12.0, 12.0, 12.5, 13.0] and s["ball"]["gz"][-1] == 9
+    assert s["imu"]["t"].tolist() == pytest.approx([13.99, 13.995, 14.0])
+
+def test_lttb_keeps_endpoints_and_spike():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 500.0)
+    y[4321] = 50.0
+    keep = lttb(x, y, 200)
+    assert len(keep) == 200 and keep[0] == 0 and keep[-1] == 9999
+    assert np.all(np.diff(keep) > 0) and 4321 in keep
+    assert lttb(x[:50], y[:50], 200).tolist() == list(range(50))
+
+def test_minmax_keeps_extremes():
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=5000)
+    keep = minmax(np.arange(5000), y, 100)
+    assert len(keep) <= 102 and int(np.argmax(y)) in keep and int(np.argmin(y)) in keep
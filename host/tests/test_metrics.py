@@ -0,0 +1,28 @@
+import numpy as np
+from nrf_metrics.config import CHANNEL_LABELS
+from nrf_metrics.metrics import detect_events_array, temporal_metrics_array, detect_events
+
+def _square_wave(n=1000, period=100, duty=60):
+    t = np.arange(n) / 100.0
+    loaded = (np.arange(n) % period) < duty
+    F = np.where(loaded[:, None], 10.0, 0.0) * np.ones((1, len(CHANNEL_LABELS)))
+    return t, F
+
+def test_array_engine_crossings_and_pairing():
+    t, F = _square_wave()
+    ev = detect_events_array(t, F, CHANNEL_LABELS, body_weight_N=100.0, thr_ratio=0.5)
+    assert ev["HS"].tolist() == list(range(100, 1000, 100))
+    assert ev["TO"].tolist() == list(range(160, 1000, 100))
+    assert ev["stance"].tolist() == [[hs, hs + 60] for hs in range(100, 1000, 100)]
+    assert ev["swing"].tolist() == [[to, to + 40] for to in range(160, 900, 100)]
+    m = temporal_metrics_array(t, ev["HS"], ev["TO"], ev["stance"])
+    assert np.allclose(m["CT"], 0.6) and np.allclose(m["FT"], 0.4) and np.allclose(m["stride"], 1.0)
+    assert abs(m["stride_freq"] - 1.0) < 1e-9
+
+def test_dict_adapter_matches_array_engine():
+    t, F = _square_wave()
+    series = [dict(zip(CHANNEL_LABELS, row)) for row in F.tolist()]
+    ev = detect_events(t.tolist(), series, body_weight_N=None)
+    arr = detect_events_array(t, F, CHANNEL_LABELS, body_weight_N=None)
+    assert ev["HS"] == arr["HS"].tolist() and ev["threshold"] == arr["threshold"]
+    assert [c["x"] for c in ev["COP"]] == arr["cop_x"].tolist()
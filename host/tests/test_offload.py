@@ -0,0 +1,96 @@
+import asyncio
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from nrf_metrics.offload import ShmRing
+
+def test_ring_wraps_and_preserves_order():
+    ring = ShmRing(256)
+    try:
+        sent = [bytes([i]) * (i * 7 % 60) for i in range(200)]
+        got = []
+
+        def consume():
+            for _ in sent:
+                got.append(ring.get(timeout=5))
+
+        t = threading.Thread(target=consume)
+        t.start()
+        for i, p in enumerate(sent):
+            ring.put(i, p[:3], p[3:], timeout=5)
+        t.join()
+        assert got == list(enumerate(sent)) and ring.used() == 0
+        assert ring.get(timeout=0.01) is None
+        with pytest.raises(ValueError):
+            ring.put(0, b"x" * 256)
+        ring.put(1, b"x" * 200)
+        with pytest.raises(TimeoutError):
+            ring.put(2, b"x" * 100, timeout=0.01)
+        assert ring.stalls >= 1
+    finally:
+        ring.close()
+
+def test_session_with_worker_process_matches_in_process(tmp_path):
+    from nrf_metrics import session
+    from nrf_metrics.json_writer import JSONLinesWriter
+    from nrf_metrics.sim import SimPeripheral, simulate
+
+    def record(name, **kw):
+        sims = [SimPeripheral("Insole_L", "insole", speed=None, rate_hz=100, duration_s=3.0, seed=1),
+                SimPeripheral("SmartBall", "ball", speed=None, rate_hz=100, duration_s=0.5)]
+
+        async def run():
+            stop = asyncio.Event()
+            stop.set()
+            with simulate(*sims), JSONLinesWriter(str(tmp_path / f"{name}.jsonl")) as w:
+                return await session.run_session(w, stop, devices={"left": "Insole_L", "ball": "SmartBall"},
+                                                 live_gait=True, **kw)
+        return asyncio.run(run())
+
+    ref = record("ref")
+    res = record("main", worker_log=str(tmp_path / "insoles.jsonl"), spill_dir=str(tmp_path))
+    left, want = res["left"], ref["left"]
+    assert len(left["t"]) == 300
+    # columns come back as mapped files (not pickled through the pipe), then cleaned up
+    assert isinstance(left["force"], np.memmap) and not list(tmp_path.glob("nrfworker-*"))
+    for k in ("t", "dev_ts", "adc", "force"):
+        assert np.array_equal(left[k], want[k])
+    assert left["gait"] == want["gait"] and left["summary"]["left_samples"] == 300
+    assert left["forces_by_label"][5] == want["forces_by_label"][5]
+    assert res["ball"]["ball_summary"]["samples"] == 50
+
+    insole_lines = (tmp_path / "insoles.jsonl").read_text().splitlines()
+    main_lines = [json.loads(l) for l in (tmp_path / "main.jsonl").read_text().splitlines()]
+    assert len(insole_lines) == 300 and all("left_insole" not in r for r in main_lines)
+    strip = lambda l: {**json.loads(l), "timestamp": 0}
+    ref_insole = [strip(l) for l in (tmp_path / "ref.jsonl").read_text().splitlines() if "left_insole" in l]
+    assert [strip(l) for l in insole_lines] == ref_insole
+
+@pytest.mark.parametrize("how", ["killed", "bad_log_path"])
+def test_put_raises_when_worker_dies(tmp_path, how):
+    from nrf_metrics.frames import INSOLE_DTYPE
+    from nrf_metrics.offload import InsoleWorker
+    path = tmp_path / ("missing/dir/x.jsonl" if how == "bad_log_path" else "x.jsonl")
+    worker = InsoleWorker(str(path), ["left_insole"], ring_mb=0.01)
+    frames = np.zeros(100, dtype=INSOLE_DTYPE)
+    errors = []
+
+    def produce():
+        try:
+            for _ in range(10_000):
+                worker.put("left_insole", frames)
+        except RuntimeError as e:
+            errors.append(e)
+
+    if how == "killed":
+        worker.put("left_insole", frames)
+        worker.process.kill()
+    t = threading.Thread(target=produce, daemon=True)
+    t.start()
+    t.join(10)
+    assert not t.is_alive() and "worker exited" in str(errors[0])
+    with pytest.raises(RuntimeError):
+        worker.close(timeout=5)
@@ -0,0 +1,195 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from nrf_metrics.framing import BATCH, DONE
+from nrf_metrics.pull import PullPipeline, RttEstimator, format_stats
+
+class FakeClient:
+    """Answers every pull with the next batch (or "Done"), optionally dropping some replies."""
+    def __init__(self, batches, drop=()):
+        self.batches = list(batches)
+        self.drop = set(drop)
+        self.pipeline = None
+        self.writes = 0
+
+    async def write_gatt_char(self, char, data):
+        self.writes += 1
+        if self.writes in self.drop:
+            return
+        loop = asyncio.get_running_loop()
+        if self.batches:
+            loop.call_soon(self.pipeline.deliver, BATCH, self.batches.pop(0))
+        else:
+            loop.call_soon(self.pipeline.deliver, DONE)
+
+def run_pipeline(client, **kw):
+    consumed = []
+
+    async def main():
+        p = PullPipeline("dev", client, "char", b"pull", consumed.append, **kw)
+        client.pipeline = p
+        p.start()
+        await asyncio.wait_for(p.join(), 10)
+        return p
+
+    return asyncio.run(main()), consumed
+
+def test_pipeline_consumes_all_batches_in_order():
+    batches = [np.arange(i * 10, i * 10 + 10) for i in range(20)]
+    p, consumed = run_pipeline(FakeClient(batches), queue_size=2)
+    assert len(consumed) == 20
+    assert np.array_equal(np.concatenate(consumed), np.arange(200))
+    s = p.stats()
+    assert s["batches"] == 20 and s["frames"] == 200
+    assert s["queue_depth"] == 0 and 1 <= s["queue_max"] <= 2
+    assert s["rtt_ms_max"] >= s["rtt_ms_mean"] >= 0.0
+    assert "dev" in format_stats(s)
+
+def test_empty_batches_not_consumed():
+    batches = [np.arange(0), np.arange(3), np.arange(0)]
+    p, consumed = run_pipeline(FakeClient(batches), offload=False)
+    assert [len(c) for c in consumed] == [3]
+    assert p.stats()["batches"] == 3
+
+def test_lost_reply_times_out_and_repulls():
+    batches = [np.arange(5), np.arange(5, 10)]
+    p, consumed = run_pipeline(FakeClient(batches, drop={2}), batch_timeout=0.05)
+    assert np.array_equal(np.concatenate(consumed), np.arange(10))
+    assert p.stats()["timeouts"] == 1
+
+def test_rtt_estimator_rto_and_backoff():
+    est = RttEstimator(initial_rto=1.0, min_rto=0.1, max_rto=5.0)
+    assert est.rto == 1.0
+    est.sample(0.2)
+    assert est.srtt == 0.2 and est.rto == pytest.approx(0.2 + 4 * 0.1)
+    for _ in range(50):
+        est.sample(0.02)
+    assert est.srtt == pytest.approx(0.02, rel=0.05) and est.rto == 0.1      # clamped at min_rto
+    est.backoff()
+    est.backoff()
+    assert est.failures == 2 and est.rto == pytest.approx(0.4)
+    for _ in range(5):
+        est.backoff()
+    assert est.rto == 5.0
+    est.sample(0.02)
+    assert est.failures == 0 and est.rto == 0.1
+
+def test_timeout_tracks_rtt_and_backs_off():
+    batches = [np.arange(10)] * 5 + [np.arange(10, 20)]
+    p, consumed = run_pipeline(FakeClient(batches, drop={6, 7}), min_rto=0.02)
+    assert np.array_equal(np.concatenate(consumed)[-10:], np.arange(10, 20))
+    s = p.stats()
+    assert s["timeouts"] == 2 and s["retries"] == 2
+    # 20 ms floor doubled twice; the reply after a timeout is not sampled (Karn), so it holds
+    assert s["srtt_ms"] < 20 and s["rto_ms"] == pytest.approx(80.0)
+    assert "rto" in format_stats(s)
+
+def test_write_errors_back_off_then_recover():
+    class Flaky(FakeClient):
+        async def write_gatt_char(self, char, data):
+            if self.writes < 2:
+                self.writes += 1
+                raise OSError("busy")
+            await super().write_gatt_char(char, data)
+    p, consumed = run_pipeline(Flaky([np.arange(3)]), error_backoff=0.01)
+    assert len(consumed) == 1 and p.stats()["write_errors"] == 2 and p.stats()["retries"] == 2
+
+def test_cadence_follows_buffered_data():
+    p = PullPipeline("dev", None, "char", b"pull", print, idle_min=0.01, idle_max=0.05)
+    assert p._pace(20) == 0.0                 # full batch: more is waiting, pull at once
+    assert p._pace(5) == 0.01                 # short batch: drained
+    assert [p._pace(0) for _ in range(4)] == [0.02, 0.04, 0.05, 0.05]
+    assert p._pace(20) == 0.0
+
+def test_cancel_returns_with_full_queue():
+    client = FakeClient([np.arange(5)] * 100)
+    blocked = asyncio.Event()
+
+    async def main():
+        async def stuck(frames):
+            blocked.set()
+            await asyncio.sleep(3600)
+        p = PullPipeline("dev", client, "char", b"pull", lambda f: None, queue_size=1, offload=False)
+        p._consumer = lambda: stuck(None)          # consumer that never takes from the queue
+        client.pipeline = p
+        p.start()
+        await blocked.wait()
+        while not p.queue.full():
+            await asyncio.sleep(0.001)
+        await asyncio.wait_for(p.cancel(), 1)
+        return p
+
+    assert asyncio.run(main()).done.is_set()
+
+def test_consumer_error_stops_puller():
+    client = FakeClient([np.arange(5)] * 1000)
+
+    def consume(frames):
+        raise ValueError("disk full")
+
+    async def main():
+        p = PullPipeline("dev", client, "char", b"pull", consume, queue_size=2)
+        client.pipeline = p
+        p.start()
+        with pytest.raises(ValueError):
+            await asyncio.wait_for(p.join(), 5)
+        writes = client.writes
+        await asyncio.sleep(0.05)
+        assert client.writes == writes and all(t.done() for t in p._tasks)
+
+    asyncio.run(main())
+
+def test_timestamps_are_receive_times():
+    client = FakeClient([np.arange(5)] * 6)
+    seen = []
+
+    def consume(frames, host_ts):
+        seen.append((host_ts, time.time()))
+        time.sleep(0.02)
+
+    async def main():
+        p = PullPipeline("dev", client, "char", b"pull", consume, queue_size=8, timestamps=True)
+        client.pipeline = p
+        p.start()
+        await asyncio.wait_for(p.join(), 10)
+
+    asyncio.run(main())
+    assert len(seen) == 6 and [h for h, _ in seen] == sorted(h for h, _ in seen)
+    # the last batch arrived long before the slow consumer got to it
+    assert seen[-1][1] - seen[-1][0] > 0.05 > seen[-1][0] - seen[0][0]
+
+def test_late_replies_never_shrink_rtt():
+    from nrf_metrics.framing import BatchReassembler
+    from nrf_metrics.frames import INSOLE_FRAME_SIZE, decode_insole
+    from nrf_metrics.sim import CMD_PULL, CMD_START, CMD_STOP, SimClient, SimPeripheral, simulate
+    latency = 0.06
+    consumed = []
+
+    async def main():
+        client = SimClient("Insole_L")
+        await client.connect()
+        p = PullPipeline("dev", client, "char", CMD_PULL, consumed.append,
+                         initial_rto=0.02, min_rto=0.01, idle_min=0.0)
+        rx = BatchReassembler(INSOLE_FRAME_SIZE, decode_insole)
+
+        def on_notify(_char, data):
+            kind = rx.feed(data)
+            if kind is not None:
+                p.deliver(kind, rx.last.frames)
+
+        await client.start_notify("char", on_notify)
+        await client.write_gatt_char("char", CMD_START)
+        await client.write_gatt_char("char", CMD_STOP)
+        await asyncio.wait_for(p.start().join(), 10)
+        await client.disconnect()
+        return p
+
+    with simulate(SimPeripheral("Insole_L", "insole", speed=None, duration_s=1.0, latency_s=latency)):
+        p = asyncio.run(main())
+    assert sum(len(f) for f in consumed) == 100
+    s = p.stats()
+    # the first pull times out; a late reply matched to a later pull would read as ~0 ms
+    assert s["timeouts"] >= 1 and s["srtt_ms"] >= latency * 1e3
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import time
+
+from nrf_metrics import registry
+from nrf_metrics.registry import BackgroundScanner, DeviceRegistry, connect_cached
+from nrf_metrics.sim import SimPeripheral, simulate
+
+def test_persist_and_merge(tmp_path):
+    path = str(tmp_path / "devices.json")
+    a, b = DeviceRegistry(path), DeviceRegistry(path)
+    a.observe("Insole_L", "AA", -60)
+    a.connected("Insole_L", "AA", "left")
+    b.observe("SmartBall", "BB", -70, save=True)      # merges a's entry instead of clobbering it
+    devices = json.loads((tmp_path / "devices.json").read_text())["devices"]
+    assert set(devices) == {"AA", "BB"} and devices["AA"]["role"] == "left"
+    assert DeviceRegistry(path).lookup("Insole_L")["rssi"] == -60
+    assert DeviceRegistry(None).path is None and not list(tmp_path.glob("*.tmp"))
+
+def test_forget_survives_save(tmp_path):
+    path = str(tmp_path / "devices.json")
+    reg = DeviceRegistry(path)
+    reg.connected("Insole_L", "AA", "left")
+    reg.observe("SmartBall", "BB", -70, save=True)
+    reg.forget("AA")
+    assert "AA" not in reg.devices and set(DeviceRegistry(path).devices) == {"BB"}
+    reg.observe("Insole_L", "AA", -60, save=True)       # seen again: back in the file
+    assert set(DeviceRegistry(path).devices) == {"AA", "BB"}
+
+def test_lookup_prefers_role_then_recent():
+    reg = DeviceRegistry(None)
+    reg.connected("Insole_L", "OLD", "left")
+    reg.observe("Insole_L", "NEW", -40)
+    assert reg.lookup("Insole_L", "left")["address"] == "OLD"
+    assert reg.lookup("Insole_L")["address"] == "NEW"
+    reg.connected("Insole_L", "NEW", "left")            # a role belongs to one address
+    assert reg.lookup(None, "left")["address"] == "NEW" and "role" not in reg.devices["OLD"]
+    reg.devices["NEW"]["seen"] = reg.devices["OLD"]["seen"] = time.time() - 10
+    assert reg.lookup("Insole_L", max_age_s=5) is None and reg.lookup("Ball") is None
+
+def test_connect_cached_falls_back_to_scan():
+    reg = DeviceRegistry(None)
+    calls = []
+
+    async def connect(dev):
+        calls.append(dev)
+        if dev == "STALE":
+            raise OSError("unreachable")
+        return f"client:{getattr(dev, 'address', dev)}"
+
+    async def scan():
+        calls.append("scan")
+        return type("Dev", (), {"name": "SmartBall", "address": "FRESH"})()
+
+    async def run():
+        assert await connect_cached(reg, "SmartBall", "ball", connect, scan) == "client:FRESH"
+        assert await connect_cached(reg, "SmartBall", "ball", connect, scan) == "client:FRESH"
+        reg.connected("SmartBall", "STALE", "ball")
+        assert await connect_cached(reg, "SmartBall", "ball", connect, scan) == "client:FRESH"
+
+    asyncio.run(run())
+    assert calls[:4] == ["scan", calls[1], "FRESH", "STALE"] and calls[4:] == ["scan", calls[5]]
+    assert reg.lookup(None, "ball")["address"] == "FRESH"
+
+def test_timed_out_cached_connect_disconnects(monkeypatch):
+    from nrf_metrics import insole
+    clients = []
+
+    class SlowClient:
+        def __init__(self, dev):
+            self.address = getattr(dev, "address", dev)
+            self.disconnected = False
+            clients.append(self)
+
+        async def connect(self):
+            if self.address == "SLOW":
+                await asyncio.sleep(10)
+
+        async def start_notify(self, char, callback):
+            pass
+
+        async def disconnect(self):
+            self.disconnected = True
+
+    async def scan():
+        return type("Dev", (), {"name": "Insole_L", "address": "FRESH"})()
+
+    monkeypatch.setattr(insole, "BleakClient", SlowClient)
+    reg = DeviceRegistry(None)
+    reg.connected("Insole_L", "SLOW", "left")
+    state = insole.DeviceState("left_insole")
+    client = asyncio.run(connect_cached(reg, "Insole_L", "left",
+                                        lambda dev: insole.connect_device(dev, state, "left"), scan,
+                                        timeout=0.05))
+    assert [c.address for c in clients] == ["SLOW", "FRESH"] and client is clients[1]
+    assert clients[0].disconnected and not clients[1].disconnected
+    assert reg.lookup(None, "left")["address"] == "FRESH"
+
+def test_background_scanner_fills_registry():
+    reg = DeviceRegistry(None)
+
+    async def run():
+        async with BackgroundScanner(reg) as bg:
+            await asyncio.sleep(0.01)
+        return bg.mode
+
+    with simulate(SimPeripheral("SmartBall", "ball")) as (p,):
+        assert asyncio.run(run()) == "passive"
+    assert reg.lookup("SmartBall")["address"] == p.address and reg.devices[p.address]["rssi"] == -50
+
+def test_simulate_uses_memory_registry():
+    before = registry.get_registry()
+    with simulate():
+        assert registry.get_registry() is not before and registry.get_registry().path is None
+    assert registry.get_registry() is before
+
+def test_session_reuses_cache_and_rescans_stale(tmp_path, capsys):
+    from nrf_metrics import session
+    from nrf_metrics.json_writer import JSONLinesWriter
+    reg = DeviceRegistry(str(tmp_path / "devices.json"))
+    devices = {"left": "Insole_L", "ball": "SmartBall"}
+
+    def record():
+        sims = [SimPeripheral("Insole_L", "insole", speed=None, rate_hz=100, duration_s=0.3, seed=1),
+                SimPeripheral("SmartBall", "ball", speed=None, rate_hz=100, duration_s=0.3)]
+
+        async def run():
+            stop = asyncio.Event()
+            stop.set()
+            with simulate(*sims, registry=reg), JSONLinesWriter(str(tmp_path / "s.jsonl")) as w:
+                return await session.run_session(w, stop, devices=devices)
+        res = asyncio.run(run())
+        assert len(res["left"]["t"]) == 30 and res["ball"]["ball_summary"]["samples"] == 30
+        return capsys.readouterr().out
+
+    assert "[SCAN] Looking for Insole_L, SmartBall" in record()
+    stored = json.loads((tmp_path / "devices.json").read_text())["devices"]
+    assert sorted(e.get("role") for e in stored.values()) == ["ball", "left"]
+
+    out = record()
+    assert "[SCAN]" not in out and "[CACHE] left: Insole_L" in out
+
+    reg.connected("Insole_L", "SIM:GONE", "left")
+    out = record()
+    assert "[CACHE] left: cached SIM:GONE failed" in out and "[SCAN] Found left" in out
+    assert reg.lookup(None, "left")["address"] != "SIM:GONE"
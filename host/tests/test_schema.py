@@ -0,0 +1,50 @@
+import numpy as np
+
+from nrf_metrics.schema import session_header, insole_batch_record, ball_batch_record, expand_records
+
+def test_expand_ball_batch():
+    recs = [session_header("ball", ["ax", "ay", "az", "gx", "gy", "gz"]),
+            ball_batch_record(1.5, [[1, 2, 3, 4, 5, 6]])]
+    out = list(expand_records(recs))
+    assert out == [{"timestamp": 1.5, "ball": {"records": [
+        {"ax": 1, "ay": 2, "az": 3, "gx": 4, "gy": 5, "gz": 6}]}}]
+
+def test_expand_insole_batch_with_derived():
+    labels = ["a", "b"]
+    recs = [session_header("left_insole", labels, 1000, ("resistance", "force", "pressure")),
+            insole_batch_record("left_insole", 2.0, [10, 11], [[1, 2], [3, 4]],
+                                resistance=[[0.1, 0.2], [0.3, 0.4]],
+                                force=[[1.0, 2.0], [3.0, 4.0]],
+                                pressure=[[5.0, 6.0], [7.0, 8.0]]),
+            {"timestamp": 3.0, "ball_summary": {}}]
+    out = list(expand_records(recs))
+    assert len(out) == 3
+    assert out[1]["right_insole"] is None
+    assert out[1]["left_insole"]["sensors"][1] == {
+        "label": "b", "analog": 4, "resistance": 0.4, "force": 4.0, "pressure": 8.0}
+    assert out[2] == {"timestamp": 3.0, "ball_summary": {}}
+
+def test_expand_insole_batch_without_header():
+    from nrf_metrics.calibration import get_active_profile
+    labels = get_active_profile().labels
+    n = len(labels)
+    rec = insole_batch_record("right_insole", 4.0, [7], [[100] * n], resistance=[[0.5] * n],
+                              force=[[1.5] * n], pressure=[[2.5] * n])
+    (out,) = expand_records([rec])
+    sensors = out["right_insole"]["sensors"]
+    assert [s["label"] for s in sensors] == list(labels)
+    assert sensors[0] == {"label": labels[0], "analog": 100, "resistance": 0.5, "force": 1.5, "pressure": 2.5}
+
+def test_expand_insole_batch_rebuilds_derived_from_header_calibration():
+    from nrf_metrics.calibration import get_active_profile
+    prof = get_active_profile()
+    n = len(prof.labels)
+    analog = [[0] * n, list(range(500, 500 + 100 * n, 100))]
+    recs = [session_header("left_insole", prof.labels, 1000, (), prof.to_dict()),
+            insole_batch_record("left_insole", 2.0, [10, 11], analog)]
+    out = [r["left_insole"]["sensors"] for r in expand_records(recs)]
+    assert len(out) == 2
+    for i in range(2):
+        for k in ("resistance", "force", "pressure"):
+            want = getattr(prof, k)(np.asarray(analog[i], dtype=np.intp)).tolist()
+            assert [s[k] for s in out[i]] == want
@@ -0,0 +1,62 @@
+import json
+import os
+import time
+
+import pytest
+
+from nrf_metrics.schema import iter_jsonl, read_records
+from nrf_metrics.segments import (RotatingJSONLinesWriter, iter_lines, open_writer, read_manifest,
+                                  segment_files)
+
+def write_log(path, n, **kw):
+    with RotatingJSONLinesWriter(str(path), batch_bytes=1, durability="none", **kw) as w:
+        for i in range(n):
+            w.append({"timestamp": 1000.0 + i, "i": i, "pad": "x" * 40})
+    return w
+
+@pytest.mark.parametrize("compression", [None, "gzip", "lzma", "zlib"])
+def test_rotation_and_streaming_read(tmp_path, compression):
+    path = tmp_path / "day.jsonl"
+    w = write_log(path, 500, max_bytes=4096, compression=compression)
+    assert w.compress_error is None
+    man = read_manifest(str(path))
+    segs = man["segments"]
+    assert man["complete"] and len(segs) > 3
+    assert [s["index"] for s in segs] == list(range(len(segs)))
+    assert sum(s["records"] for s in segs) == 500
+    assert segs[0]["t_first"] == 1000.0 and segs[-1]["t_last"] == 1499.0
+    files = segment_files(str(path))
+    assert len(files) == len(segs)
+    if compression:
+        assert all(s["compression"] == compression and s["stored_bytes"] < s["bytes"] for s in segs)
+        assert not any(f.endswith(".jsonl") for f in os.listdir(tmp_path))
+    assert [r["i"] for r in iter_jsonl(str(path))] == list(range(500))
+    # manifest path works too
+    assert sum(1 for _ in iter_lines(str(path) + ".manifest.json")) == 500
+
+def test_reopen_continues_numbering(tmp_path):
+    path = tmp_path / "day.jsonl"
+    write_log(path, 10, compression="gzip")
+    write_log(path, 10, compression="gzip")
+    segs = read_manifest(str(path))["segments"]
+    assert [s["index"] for s in segs] == [0, 1]
+    assert len(list(iter_jsonl(str(path)))) == 20
+
+def test_duration_rotation(tmp_path):
+    path = tmp_path / "t.jsonl"
+    w = RotatingJSONLinesWriter(str(path), max_seconds=0.05, sync_interval_ms=10)
+    for i in range(5):
+        w.append({"i": i})
+        w.flush(timeout=5.0)
+        time.sleep(0.08)
+    w.close()
+    assert len(read_manifest(str(path))["segments"]) >= 3
+    assert [r["i"] for r in iter_jsonl(str(path))] == list(range(5))
+
+def test_open_writer_plain_and_read_records(tmp_path):
+    path = tmp_path / "plain.jsonl"
+    with open_writer(str(path)) as w:
+        w.append({"timestamp": 1.0, "device": "ball", "frames": [[1, 2, 3, 4, 5, 6]]})
+    assert read_manifest(str(path)) is None
+    assert list(read_records(str(path)))[0]["ball"]["records"][0]["gz"] == 6
+    assert json.loads(path.read_text())["device"] == "ball"
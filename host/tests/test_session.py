@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from nrf_metrics import session
+from nrf_metrics.json_writer import JSONLinesWriter
+from nrf_metrics.sim import SimPeripheral, simulate
+
+DEVICES = {"left": "Insole_L", "right": "Insole_R", "ball": "SmartBall"}
+
+def peripherals():
+    return [SimPeripheral("Insole_L", "insole", speed=None, rate_hz=100, duration_s=0.5, seed=1),
+            SimPeripheral("Insole_R", "insole", speed=None, rate_hz=100, duration_s=0.5, seed=2),
+            SimPeripheral("SmartBall", "ball", speed=None, rate_hz=100, duration_s=0.5)]
+
+def record(tmp_path, devices, sims, **kw):
+    async def run():
+        stop = asyncio.Event()
+        stop.set()
+        with simulate(*sims), JSONLinesWriter(str(tmp_path / "s.jsonl")) as w:
+            return await session.run_session(w, stop, devices=devices, **kw)
+    return asyncio.run(run())
+
+def test_scan_devices_single_scan_assigns_each_role_once():
+    async def run():
+        with simulate(*peripherals()):
+            return await session.scan_devices({"a": "Insole", "b": "Insole", "ball": "Ball"}, 1.0)
+    found = asyncio.run(run())
+    assert {r: d.name for r, d in found.items()} == {"a": "Insole_L", "b": "Insole_R", "ball": "SmartBall"}
+
+def test_session_records_all_devices(tmp_path):
+    res = record(tmp_path, DEVICES, peripherals())
+    assert len(res["left"]["t"]) == 50 and len(res["right"]["t"]) == 50
+    assert res["ball"]["ball_summary"]["samples"] == 50
+    assert {s["device"] for s in res["pull"]} == {"left_insole", "right_insole", "ball"}
+    assert {"scan_s", "connect_s", "setup_s", "drain_s"} <= set(res["timing"])
+
+def test_missing_device(tmp_path):
+    sims = peripherals()[:2]
+    with pytest.raises(RuntimeError, match="ball"):
+        record(tmp_path, DEVICES, sims, scan_timeout=0.05)
+    res = record(tmp_path, DEVICES, peripherals()[:2], scan_timeout=0.05, require_all=False)
+    assert "ball" not in res and len(res["left"]["t"]) == 50
+
+def test_session_timeline_and_merged_session_files(tmp_path):
+    from nrf_metrics.session_file import SessionWriter
+    from nrf_metrics.timeline import Timeline, merge_sessions
+    merged = []
+    tl = Timeline(type("W", (), {"append": staticmethod(merged.append)})(), window_s=0.5)
+    sinks = {r: SessionWriter(str(tmp_path / f"{r}.nrfs"), "ball" if r == "ball" else f"{r}_insole",
+                              units_per_s=1000.0) for r in DEVICES}
+    res = record(tmp_path, DEVICES, peripherals(), raw_sinks=sinks, timeline=tl)
+    for s in sinks.values():
+        s.close()
+    # (as-fast-as-possible replay: device time runs far ahead of host time, so only counts are checked)
+    assert len(merged) == 100 and res["timeline"]["released"] == 100
+    assert set(res["timeline"]["clocks"]) == {"left_insole", "right_insole"}
+    recs = list(merge_sessions([str(tmp_path / f"{r}.nrfs") for r in DEVICES]))
+    assert len(recs) == 150 and {r["device"] for r in recs} == {"left_insole", "right_insole", "ball"}
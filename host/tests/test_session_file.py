@@ -0,0 +1,46 @@
+import numpy as np
+from nrf_metrics.frames import INSOLE_DTYPE
+from nrf_metrics.session_file import SessionWriter, SessionReader, session_to_jsonl, jsonl_to_session
+
+def _insole_frames(n, start=0):
+    arr = np.empty(n, dtype=INSOLE_DTYPE)
+    arr["ts"] = np.arange(start, start + n) * 10
+    arr["ch"] = np.arange(n * 8).reshape(n, 8) % 4096
+    return arr
+
+def test_time_range_is_a_view(tmp_path):
+    path = str(tmp_path / "s.bin")
+    frames = _insole_frames(1000)
+    with SessionWriter(path, "left_insole", units_per_s=1000, chunk_frames=64) as w:
+        w.append(frames[:300])
+        w.append(frames[300:].tobytes())
+    r = SessionReader(path)
+    assert r.n_frames == 1000 and len(r.index) == 16
+    sel = r.between(2000, 2990)
+    assert sel["ts"].tolist() == list(range(2000, 3000, 10))
+    assert not sel.flags.owndata
+    assert np.array_equal(r.frames, frames)
+    del sel
+    r.close()
+
+def test_unclosed_session_rebuilds_index(tmp_path):
+    path = str(tmp_path / "s.bin")
+    w = SessionWriter(path, "ball", chunk_frames=4)
+    w.append(np.arange(60, dtype="<i2").reshape(10, 6))
+    w.flush()
+    with SessionReader(path) as r:
+        assert r.n_frames == 10 and len(r.index) == 3
+        assert r.between(4, 5).tolist() == np.arange(24, 36).reshape(2, 6).tolist()
+    w.close()
+
+def test_jsonl_round_trip(tmp_path):
+    src, log, back = (str(tmp_path / n) for n in ("a.bin", "a.jsonl", "b.bin"))
+    frames = _insole_frames(250)
+    with SessionWriter(src, "left_insole", units_per_s=1000,
+                       calibration={"labels": list("abcdefgh")}) as w:
+        w.append(frames)
+    assert session_to_jsonl(src, log, batch_frames=100) == 250
+    assert jsonl_to_session(log, back, "left_insole") == 250
+    with SessionReader(back) as r:
+        assert np.array_equal(r.frames, frames)
+        assert r.header["units_per_s"] == 1000
@@ -0,0 +1,35 @@
+import asyncio
+from nrf_metrics.frames import decode_insole
+from nrf_metrics.sim import SimPeripheral, SimClient, SimScanner, simulate
+
+def test_pull_protocol_sequence():
+    p = SimPeripheral("Insole_L", "insole", speed=None, rate_hz=100, duration_s=0.25, mtu=23)
+    assert p.on_write(b"start_r") == []
+    p.on_write(b"stop_r")
+    payload, pulls = bytearray(), 0
+    while True:
+        out = p.on_write(b"get_data10_bin")
+        pulls += 1
+        if out == [b"Done"]:
+            break
+        assert out[0].startswith(b"BIN10:") and out[-1] == b"BATCH_DONE"
+        assert all(len(c) <= 20 for c in out[1:-1])
+        payload += b"".join(out[1:-1])
+    frames = decode_insole(bytes(payload))
+    assert len(frames) == 25 and pulls == 4
+    assert frames["ts"].tolist() == [i * 10 for i in range(25)]
+
+def test_client_delivers_notifications_in_order():
+    async def run():
+        with simulate(SimPeripheral("SmartBall", "ball", speed=None, duration_s=1.0, rate_hz=50)):
+            dev = await SimScanner.find_device_by_filter(lambda d, ad: "SmartBall" in d.name)
+            got = []
+            async with SimClient(dev) as client:
+                await client.start_notify("c", lambda _s, data: got.append(bytes(data)))
+                for cmd in (b"start_r", b"stop_r") + (b"get_data10_bin",) * 6:
+                    await client.write_gatt_char("c", cmd)
+                await asyncio.sleep(0.05)
+            return got
+    got = asyncio.run(run())
+    assert len(got[0]) == 8                       # timing packet on stop
+    assert got[1] == b"BIN10:10" and got[-2] == b"BATCH_DONE" and got[-1] == b"Done"
@@ -0,0 +1,55 @@
+import math
+
+import numpy as np
+import pytest
+
+from nrf_metrics.sim import synth_ball
+from nrf_metrics.spin import SpinAnalyzer, rolling_mean
+
+def reference_summary(frames, start_ms, end_ms):
+    # the per-sample accumulation BallState.notify used to do
+    peak, s = 0.0, 0.0
+    for ax, ay, az, gx, gy, gz in frames.tolist():
+        w = math.sqrt(gx * gx + gy * gy + gz * gz)
+        peak = max(peak, w)
+        s += w / 360.0
+    duration = (end_ms - start_ms) / 1000.0
+    avg = s / len(frames)
+    return {"avg_rev_per_sec": avg, "total_revolutions": avg * duration, "omega_deg_s_peak": peak}
+
+def feed(frames, batch=10, **kw):
+    sa = SpinAnalyzer(**kw)
+    for i in range(0, len(frames), batch):
+        sa.add(frames[i:i + batch])
+    return sa
+
+def test_summary_matches_per_sample_reference():
+    frames = synth_ball(0, 1000, 100.0, seed=3)
+    s = feed(frames).summary(0, 10000)
+    ref = reference_summary(frames, 0, 10000)
+    for k, v in ref.items():
+        assert s[k] == pytest.approx(v, rel=1e-12)
+    assert s["samples"] == 1000 and s["duration_s"] == 10.0
+    assert s["spin_rpm_peak"] == pytest.approx(ref["omega_deg_s_peak"] / 6.0)
+
+def test_empty_and_untimed():
+    s = SpinAnalyzer().summary(None, None)
+    assert s["samples"] == 0 and s["total_revolutions"] == 0.0 and s["spin_axis"] is None
+    assert SpinAnalyzer().add(np.empty((0, 6), dtype="<i2")).size == 0
+
+def test_windows_and_axis_for_constant_spin():
+    frames = np.zeros((500, 6), dtype="<i2")
+    frames[:, 3:6] = (0, 0, -720)          # 2 rev/s about -z
+    a = feed(frames, windows_s=(0.1, 1.0)).finish(0, 5000)
+    assert a["revolutions"] == pytest.approx(10.0)
+    assert a["axis"] == pytest.approx([0.0, 0.0, -1.0])
+    for w, n in ((0.1, 10), (1.0, 100)):
+        win = a["windows"][w]
+        assert len(win["t"]) == len(win["rps"])
+        assert np.allclose(win["rps"], 2.0) and win["peak_rps"] == pytest.approx(2.0)
+        assert win["t"][0] == pytest.approx((n - 1) * 0.01)
+
+def test_rolling_mean():
+    x = np.arange(10.0)
+    assert rolling_mean(x, 3).tolist() == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert rolling_mean(x, 20).size == 0
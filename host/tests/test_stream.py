@@ -0,0 +1,108 @@
+import asyncio
+import json
+import random
+import struct
+
+import numpy as np
+
+from nrf_metrics import client
+from nrf_metrics.json_writer import JSONLinesWriter
+from nrf_metrics.parser import batch_to_json, parse_batch, parse_packet, to_json
+from nrf_metrics.sim import SimPeripheral, simulate
+
+def random_packets(n, seed=0):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.6:
+            out.append(bytes([0x10]) + rng.randbytes(12))
+        elif kind < 0.7:
+            n = rng.randrange(1, 15)
+            hdr = struct.pack("<BHBIH", 0x11, rng.randrange(1 << 16), n, rng.randrange(1 << 32), 5000)
+            # occasionally truncated -> falls back to {"op": "0x11", "raw_len"}
+            out.append(hdr + rng.randbytes(12 * n - (rng.random() < 0.1)))
+        elif kind < 0.8:
+            out.append(bytes([0x20, rng.randrange(256)]))
+        elif kind < 0.95:
+            out.append(bytes([rng.randrange(256)]) + rng.randbytes(rng.randrange(20)))
+        else:
+            out.append(b"")
+    return out
+
+def test_batch_decode_matches_per_packet():
+    pkts = random_packets(2000)
+    batch = parse_batch(pkts)
+    expected = [to_json(p) if p else None for p in map(parse_packet, pkts)]
+    assert batch_to_json(batch) == expected
+    assert batch.imu.shape == (len(batch.imu_index), 6)
+    assert (batch.imu_t_us[np.isin(batch.imu_index, batch.packed_index, invert=True)] == -1).all()
+
+def test_packed_rows_timestamps_and_order():
+    a = struct.pack("<BHBIH", 0x11, 7, 3, 1000, 5000) + np.arange(18, dtype="<i2").tobytes()
+    raw = bytes([0x10]) + np.full(6, -1, dtype="<i2").tobytes()
+    batch = parse_batch([a, raw, b"\x20\x01"])
+    assert batch.imu_index.tolist() == [0, 0, 0, 1]
+    assert batch.imu_t_us.tolist() == [1000, 6000, 11000, -1]
+    assert batch.imu[:, 0].tolist() == [0, 6, 12, -1]
+    obj = to_json(parse_packet(a))
+    assert obj["n"] == 3 and obj["seq"] == 7 and obj["samples"][2]["gz"] == 17
+
+def test_notify_stream_counts_and_heartbeat_gaps(tmp_path):
+    path = tmp_path / "s.jsonl"
+    with JSONLinesWriter(str(path)) as sink:
+        st = client.NotifyStream(sink, max_pending=6)
+        for c in (1, 2, 4, 5):                          # 3 missing
+            st.on_notify(None, bytearray([0x20, c]))
+        st.on_notify(None, bytearray([0x10]) + bytes(range(12)))
+        st.flush()
+        for c in (255, 0, 1):                           # 249 missing before 255, then wraps
+            st.on_notify(None, bytearray([0x20, c]))
+        assert st.flush() == 3
+        for _ in range(8):
+            st.on_notify(None, bytearray([0x20, 2]))
+        st.flush()
+    assert st.heartbeat_gaps == 1 + 249 and st.overflow == 2
+    assert st.packets == 14 and st.bytes == 13 + 13 * 2
+    assert st.last_sample["ax"] == 0x0100
+    lines = [json.loads(l) for l in path.read_text().splitlines()]
+    assert len(lines) == 14 and lines[4]["op"] == "imu_raw"
+    assert "pkt/s" in st.status_line()
+
+def test_streaming_run_against_sim(tmp_path):
+    path = tmp_path / "out.jsonl"
+    p = SimPeripheral("NRF-BLE-DEMO", "nrf", heartbeat_s=0.1)
+    with simulate(p):
+        stream = asyncio.run(client.run("NRF-BLE-DEMO", None, str(path), once=True))
+    recs = [json.loads(l) for l in path.read_text().splitlines()]
+    assert recs[0]["op"] == "imu_raw"
+    assert sum(r["op"] == "heartbeat" for r in recs) >= 10
+    assert stream.packets == len(recs) and stream.drops == 0
+
+def test_packed_seq_gaps_count_as_drops():
+    st = client.NotifyStream()
+    for seq in (65534, 65535, 1, 2):                    # 0 missing across the wrap
+        st.on_notify(None, bytearray(struct.pack("<BHBIH", 0x11, seq, 1, 0, 5000) + bytes(12)))
+    st.flush()
+    assert st.seq_gaps == 1 and st.drops == 1 and st.samples == 4
+
+def test_packed_streaming_against_sim(tmp_path):
+    path = tmp_path / "out.jsonl"
+    p = SimPeripheral("NRF-BLE-DEMO", "nrf", heartbeat_s=0, speed=5.0, mtu=183)
+    with simulate(p):
+        stream = asyncio.run(client.run("NRF-BLE-DEMO", None, str(path), once=True, stream_rate=200))
+    recs = [json.loads(l) for l in path.read_text().splitlines()]
+    assert recs and all(r["op"] == "imu_packed" for r in recs)
+    assert [r["seq"] for r in recs] == list(range(len(recs)))
+    assert all(r["n"] == 14 for r in recs[:-1]) and recs[-1]["n"] >= 1   # last one flushed by 0x03
+    assert recs[0]["dt_us"] == 5000 and recs[1]["t0_us"] - recs[0]["t0_us"] == 14 * 5000
+    assert stream.samples == sum(r["n"] for r in recs) == p.cursor
+    assert stream.drops == 0 and p.stream_rate_hz is None
+
+def test_sim_clamps_stream_rate():
+    p = SimPeripheral("NRF-BLE-DEMO", "nrf", heartbeat_s=0)
+    for rate, dt_us in ((5, 62500), (16, 62500), (200, 5000), (5000, 1000)):
+        p.on_write(bytes([0x02]) + rate.to_bytes(2, "little"))
+        pkt = p.stream_poll(p._stream_t0 + 0.1, flush=True)[0]
+        assert struct.unpack_from("<H", pkt, 8)[0] == dt_us
+    p.on_write(b"\x03")
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import urllib.request
+
+import numpy as np
+import pytest
+
+from nrf_metrics import client, telemetry
+from nrf_metrics.framing import BATCH, DONE
+from nrf_metrics.json_writer import JSONLinesWriter
+from nrf_metrics.pull import PullPipeline
+
+@pytest.fixture
+def tm():
+    telemetry.REGISTRY.clear()
+    telemetry.enable()
+    yield telemetry.REGISTRY
+    telemetry.disable()
+    telemetry.REGISTRY.clear()
+
+class FakeClient:
+    def __init__(self, batches, drop=()):
+        self.batches, self.drop, self.writes, self.pipeline = list(batches), set(drop), 0, None
+
+    async def write_gatt_char(self, char, data):
+        self.writes += 1
+        if self.writes in self.drop:
+            return
+        if self.batches:
+            asyncio.get_running_loop().call_soon(self.pipeline.deliver, BATCH, self.batches.pop(0))
+        else:
+            asyncio.get_running_loop().call_soon(self.pipeline.deliver, DONE)
+
+def run_pipeline(c, **kw):
+    async def main():
+        p = PullPipeline("left", c, "char", b"pull", lambda f: None, **kw)
+        c.pipeline = p
+        await asyncio.wait_for(p.start().join(), 10)
+    asyncio.run(main())
+
+def value(snap, name, **labels):
+    return next(r for r in snap[name] if r["labels"] == labels)
+
+def test_disabled_handles_are_none():
+    assert telemetry.device("x") is None and telemetry.writer("x") is None
+    assert PullPipeline("x", None, "c", b"p", print)._tm is None
+
+def test_pull_and_notify_metrics(tm):
+    run_pipeline(FakeClient([np.arange(5)] * 4, drop={2}), batch_timeout=0.05)
+    st = client.NotifyStream()
+    for _ in range(3):
+        st.on_notify(None, bytearray(b"\x20\x01"))
+    snap = tm.snapshot()
+    assert value(snap, "nrf_batches_total", device="left")["value"] == 4
+    assert value(snap, "nrf_frames_total", device="left")["value"] == 20
+    assert value(snap, "nrf_pull_timeouts_total", device="left")["value"] == 1
+    assert value(snap, "nrf_pull_retries_total", device="left")["value"] == 1
+    lat = value(snap, "nrf_pull_latency_seconds", device="left")
+    assert lat["count"] == 4 and sum(lat["buckets"].values()) == 4
+    assert value(snap, "nrf_notify_bytes_total", device="nrf")["value"] == 6
+
+def test_writer_metrics_and_prometheus_text(tm, tmp_path):
+    with JSONLinesWriter(str(tmp_path / "w.jsonl")) as w:
+        for i in range(10):
+            w.append({"i": i})
+        w.flush(timeout=5.0)
+    snap = tm.snapshot()
+    assert value(snap, "nrf_writer_records_total", writer="w.jsonl")["value"] == 10
+    assert value(snap, "nrf_writer_flush_seconds", writer="w.jsonl")["count"] >= 1
+    text = tm.prometheus()
+    assert "# TYPE nrf_writer_flush_seconds histogram" in text
+    assert 'nrf_writer_records_total{writer="w.jsonl"} 10' in text
+    assert 'nrf_writer_flush_seconds_bucket{writer="w.jsonl",le="+Inf"}' in text
+
+def test_http_endpoint_and_jsonl_dump(tm, tmp_path):
+    telemetry.device("ball").notify(100)
+    server = telemetry.serve(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        text = urllib.request.urlopen(url + "/metrics", timeout=5).read().decode()
+        assert 'nrf_notifications_total{device="ball"} 1' in text
+        snap = json.loads(urllib.request.urlopen(url + "/metrics.json", timeout=5).read())
+        assert value(snap, "nrf_notify_bytes_total", device="ball")["value"] == 100
+    finally:
+        server.shutdown()
+    d = telemetry.JSONLDumper(str(tmp_path / "m.jsonl"), interval_s=60)
+    telemetry.device("ball").notify(50)
+    d.close()
+    rec = json.loads((tmp_path / "m.jsonl").read_text().splitlines()[-1])
+    assert value(rec["metrics"], "nrf_notify_bytes_total", device="ball")["value"] == 150
+    assert value(rec["rates"], "nrf_notify_bytes_total", device="ball")["per_s"] > 0
+
+def test_histogram_quantile():
+    h = telemetry.Histogram((0.01, 0.1, 1.0))
+    for v in (0.005, 0.05, 0.05, 0.5, 5.0):
+        h.observe(v)
+    assert h.counts == [1, 2, 1, 1] and h.quantile(0.5) == 0.1 and h.quantile(1.0) == float("inf")
@@ -0,0 +1,88 @@
+import random
+
+import numpy as np
+import pytest
+
+from nrf_metrics.session_file import SessionWriter
+from nrf_metrics.sim import synth_ball, synth_insole
+from nrf_metrics.timeline import ClockAligner, StreamMerger, Timeline, merge_sessions, merge_streams, reorder
+
+def test_clock_aligner_recovers_offset_and_drift():
+    rng = random.Random(1)
+    al = ClockAligner(decay=1.0)
+    for i in range(500):
+        dev = i * 0.05
+        al.observe(dev, 1.7e9 + 12.5 + dev * (1 + 80e-6) + rng.uniform(0, 2e-3))
+    assert al.drift_ppm == pytest.approx(80, abs=5)
+    assert al.offset_s == pytest.approx(1.7e9 + 12.501, abs=2e-3)
+    assert al.to_host(np.array([0.0]))[0] == pytest.approx(al.offset_s)
+    again = ClockAligner.from_dict(al.to_dict())
+    assert again.to_host(10.0) == pytest.approx(al.to_host(10.0))
+
+def test_clock_aligner_single_observation_is_offset_only():
+    al = ClockAligner()
+    al.observe(5.0, 105.0)
+    assert al.to_host(6.0) == 106.0 and al.drift_ppm == 0.0
+
+def test_stream_merger_orders_and_bounds_buffer():
+    m = StreamMerger(window_s=1.0)
+    m.add_source("a")
+    m.add_source("b")
+    out = []
+    for k in range(100):
+        out += m.push_many("a", [k + 0.0, k + 0.5], ["a"] * 2)
+        out += m.push("b", k + 0.25, "b")
+    out += m.flush()
+    ts = [t for t, _, _ in out]
+    assert len(out) == 300 and ts == sorted(ts) and m.late == 0
+    assert m.max_buffered <= 6
+
+def test_stream_merger_window_releases_stalled_source():
+    m = StreamMerger(window_s=2.0)
+    m.add_source("slow")
+    out = []
+    for k in range(50):
+        out += m.push("fast", float(k), k)
+    assert m.max_buffered <= 4 and len(out) >= 46
+    out += m.push("slow", 1.0, "late")
+    assert m.late == 1
+
+def test_merge_streams_and_reorder():
+    a = [(t, "a") for t in np.arange(0, 10, 0.3)]
+    b = [(t, "b") for t in np.arange(0.1, 10, 0.7)]
+    merged = list(merge_streams({"a": a, "b": b}))
+    assert [t for t, _, _ in merged] == sorted(t for t, _ in a + b)
+    shuffled = [(1.0, 1), (0.9, 2), (1.2, 3), (1.1, 4), (2.0, 5)]
+    assert [t for t, _ in reorder(shuffled, 0.5)] == [0.9, 1.0, 1.1, 1.2, 2.0]
+
+def test_timeline_merges_insoles_with_writer():
+    class W(list):
+        append = list.append
+    w = W()
+    tl = Timeline(w, window_s=0.2)
+    for side in ("left_insole", "right_insole"):
+        tl.add_source(side)
+    for k in range(20):
+        dev = [k * 0.1 + i * 0.01 for i in range(10)]
+        tl.add_insole("left_insole", dev, 1000.0 + dev[-1], [[0] * 8] * 10)
+        tl.add_insole("right_insole", [d + 3.0 for d in dev], 1000.0 + dev[-1] + 0.005, [[1] * 8] * 10)
+    tl.close("left_insole")
+    tl.close("right_insole")
+    tl.flush()
+    assert len(w) == 400
+    assert [r["timestamp"] for r in w] == sorted(r["timestamp"] for r in w)
+    assert tl.stats()["late"] == 0
+
+def test_merge_sessions(tmp_path):
+    ins = synth_insole(0, 200, 100.0)                     # dev ts in ms, 2 s
+    with SessionWriter(str(tmp_path / "l.nrfs"), "left_insole", units_per_s=1000.0) as w:
+        w.append(ins)
+        w.meta["clock"] = {"offset_s": 500.0, "scale": 1.0}
+    with SessionWriter(str(tmp_path / "b.nrfs"), "ball") as w:
+        w.append(synth_ball(0, 100, 50.0))
+        w.meta.update(t_start_ms=0, t_end_ms=2000, host_start_ts=500.0, host_stop_ts=502.0)
+    recs = list(merge_sessions([str(tmp_path / "l.nrfs"), str(tmp_path / "b.nrfs")]))
+    assert len(recs) == 300
+    assert [r["timestamp"] for r in recs] == sorted(r["timestamp"] for r in recs)
+    assert recs[0]["timestamp"] == pytest.approx(500.0) and recs[-1]["timestamp"] < 502.0
+    assert {r["device"] for r in recs} == {"left_insole", "ball"}
@@ -1,19 +1,64 @@
-import json, sys
+import argparse, json, os, sys
 import matplotlib.pyplot as plt
 
-xs, ax, ay, az = [], [], [], []
-for line in sys.stdin:
-    try:
-        j = json.loads(line)
-        if j.get("op") == "imu_raw":
-            xs.append(j["ts"]); ax.append(j["ax"]); ay.append(j["ay"]); az.append(j["az"])
-    except: pass
+# usage: plot_log.py [LOG] [--start S] [--end S] [--points N] [--method lttb|minmax]
+#   LOG: .jsonl, .jsonl.gz/.xz/.zz or a segmented log (default: stdin, no index)
+#   --start/--end: seconds from the first record; only that range is read (via the
+#   cached <LOG>.tindex.npz time index), then each line is downsampled to N points.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "host"))
+from nrf_metrics.logindex import LogIndex, downsample, extract_series
 
-plt.plot(xs, ax, label="ax")
-plt.plot(xs, ay, label="ay")
-plt.plot(xs, az, label="az")
-plt.legend()
-plt.title("IMU acc (raw)")
-plt.xlabel("time (s)")
-plt.ylabel("counts")
+p = argparse.ArgumentParser()
+p.add_argument("log", nargs="?")
+p.add_argument("--start", type=float, default=None)
+p.add_argument("--end", type=float, default=None)
+p.add_argument("--points", type=int, default=2000)
+p.add_argument("--method", choices=("lttb", "minmax"), default="lttb")
+p.add_argument("--no-cache", action="store_true", help="Do not read/write the sidecar index")
+args = p.parse_args()
+
+def stdin_records():
+    for line in sys.stdin:
+        try:
+            yield json.loads(line)
+        except ValueError:
+            pass
+
+if args.log:
+    idx = LogIndex.open(args.log, cache=not args.no_cache)
+    t_lo = idx.t_min
+    t0 = t_lo + args.start if args.start is not None else None
+    t1 = t_lo + args.end if args.end is not None else None
+    series = extract_series(idx.records(t0, t1))
+else:
+    series = extract_series(stdin_records())
+
+# stream -> (title, y label, [(label, column or (column, channel)), ...])
+panels = []
+if "imu" in series:
+    panels.append(("imu", "IMU acc (raw)", "counts", [(c, c) for c in ("ax", "ay", "az")]))
+for side in ("left_insole", "right_insole"):
+    if side in series:
+        s = series[side]
+        labels = s.get("labels") or [f"ch{i}" for i in range(s["force"].shape[1])]
+        panels.append((side, side.replace("_", " "), "force (N)",
+                       [(lbl, ("force", i)) for i, lbl in enumerate(labels)]))
+if "ball" in series:
+    panels.append(("ball", "Ball gyro (raw)", "counts", [(c, c) for c in ("gx", "gy", "gz")]))
+if not panels:
+    sys.exit("no plottable records")
+
+t_ref = min(series[name]["t"][0] for name, *_ in panels)
+fig, axes = plt.subplots(len(panels), 1, sharex=True, squeeze=False)
+for ax, (name, title, ylabel, lines) in zip(axes[:, 0], panels):
+    s = series[name]
+    x = s["t"] - t_ref
+    for label, col in lines:
+        y = s[col[0]][:, col[1]] if isinstance(col, tuple) else s[col]
+        keep = downsample(x, y, args.points, args.method)
+        ax.plot(x[keep], y[keep], label=label)
+    ax.set_title(title)
+    ax.set_ylabel(ylabel)
+    ax.legend(loc="upper right", fontsize="small")
+axes[-1, 0].set_xlabel("time (s)")
 plt.show()